@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""Compare the serving paths for model forward passes: eager autograd, inference_mode and InferenceRuntime.
+
+Usage:
+  PYTHONPATH="." python benchmarks/inference_runtime.py
+  PYTHONPATH="." python benchmarks/inference_runtime.py --concurrency 4 --seconds 5 --output benchmarks/results/inference_runtime.json
+
+Each path is timed for --seconds on random windows, in two shapes:
+- single: one window per call from --concurrency threads at once, as the
+  API's model executor (INFERENCE_THREADS) runs /predict
+- batch: SCORING_BATCH_SIZE windows per call from one thread, as score_stations runs
+
+The paths are
+- eager: a new tensor per call and model(x) with autograd enabled, torch's default thread count
+- inference_mode: a new tensor per call and model(x) under torch.inference_mode(), default thread count
+- runtime: InferenceRuntime.predict with preallocated inputs and threads pinned by serving_threads()
+
+The model is built from the Config hyperparameters with random weights (or loaded
+from models/ with --trained); the weights do not change the cost of a forward
+pass. Windows/s and per-call p50/p99 latency are printed and written as JSON.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+
+from src.config import Config
+from src.inference import InferenceRuntime, pin_threads, serving_threads
+from src.model import build_model
+
+
+def random_windows(n, stations, seed=0):
+    """n (SEQ_LENGTH, 7) windows of scaled features, station_id last."""
+    rng = np.random.default_rng(seed)
+    windows = rng.random((n, Config.SEQ_LENGTH, 7), dtype=np.float32)
+    windows[..., -1] = rng.integers(0, stations, size=(n, 1))
+    return windows
+
+
+def eager_path(model):
+    def predict(x):
+        return model(torch.tensor(x, dtype=torch.float32)).reshape(-1).detach().numpy()
+    return predict
+
+
+def inference_mode_path(model):
+    def predict(x):
+        with torch.inference_mode():
+            return model(torch.tensor(x, dtype=torch.float32)).reshape(-1).numpy()
+    return predict
+
+
+def throughput(predict, windows, batch_size, concurrency, seconds):
+    """Windows/s and call latency (ms) of predict over `seconds`, called from `concurrency` threads."""
+    predict(windows[:batch_size])  # warm-up
+    deadline = time.perf_counter() + seconds
+    latencies = [[] for _ in range(concurrency)]
+
+    def run(samples, offset):
+        i = offset
+        while time.perf_counter() < deadline:
+            start = (i * batch_size) % (len(windows) - batch_size + 1)
+            t0 = time.perf_counter()
+            predict(windows[start:start + batch_size])
+            samples.append(time.perf_counter() - t0)
+            i += concurrency
+
+    t0 = time.perf_counter()
+    threads = [threading.Thread(target=run, args=(latencies[k], k)) for k in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - t0
+    samples = np.concatenate([np.asarray(s) for s in latencies]) * 1000
+    return {
+        'windows_per_sec': round(len(samples) * batch_size / elapsed, 1),
+        'p50_ms': round(float(np.percentile(samples, 50)), 3),
+        'p99_ms': round(float(np.percentile(samples, 99)), 3),
+        'calls': int(len(samples)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark InferenceRuntime against plain model calls')
+    parser.add_argument('--seconds', type=float, default=3, help='Timed seconds per path and shape')
+    parser.add_argument('--concurrency', type=int, default=Config.INFERENCE_THREADS, help='Threads issuing single-window calls')
+    parser.add_argument('--stations', type=int, default=200, help='Station embedding rows of the random model')
+    parser.add_argument('--trained', action='store_true', help='Use the trained model in models/ instead')
+    parser.add_argument('--output', type=str, default='benchmarks/results/inference_runtime.json', help='Where to write JSON results')
+    args = parser.parse_args()
+
+    if args.trained:
+        from src.api.utils import load_inference_artifacts
+        model, _ = load_inference_artifacts()
+    else:
+        torch.manual_seed(0)
+        model = build_model(hidden_dim=Config.HIDDEN_DIM, num_layers=Config.NUM_LAYERS, num_stations=args.stations)
+    model.eval()
+    stations = getattr(getattr(model, 'station_embedding', None), 'num_embeddings', args.stations)
+    windows = random_windows(max(4096, Config.SCORING_BATCH_SIZE * 2), stations)
+    shapes = {'single': (1, args.concurrency), 'batch': (Config.SCORING_BATCH_SIZE, 1)}
+
+    default_threads = torch.get_num_threads()
+    pinned = serving_threads()
+    results = {}
+    for name in ('eager', 'inference_mode', 'runtime'):
+        if name == 'runtime':
+            predict = InferenceRuntime(model, threads=pinned, interop_threads=Config.INFERENCE_INTEROP_THREADS).predict
+        else:
+            pin_threads(default_threads)
+            predict = (eager_path if name == 'eager' else inference_mode_path)(model)
+        results[name] = {}
+        for shape, (batch_size, concurrency) in shapes.items():
+            r = throughput(predict, windows, batch_size, concurrency, args.seconds)
+            results[name][shape] = r
+            print(f"  {name:<15}{shape:<7}{r['windows_per_sec']:>12,.0f} windows/s   "
+                  f"p50 {r['p50_ms']:.3f} ms   p99 {r['p99_ms']:.3f} ms")
+
+    print(f"\n{'path':<16}{'single w/s':>12}{'speedup':>9}{'batch w/s':>12}{'speedup':>9}")
+    for name, r in results.items():
+        for shape in shapes:
+            r[shape]['speedup'] = round(r[shape]['windows_per_sec'] / results['eager'][shape]['windows_per_sec'], 2)
+        print(f"{name:<16}{r['single']['windows_per_sec']:>12,.0f}{r['single']['speedup']:>9}"
+              f"{r['batch']['windows_per_sec']:>12,.0f}{r['batch']['speedup']:>9}")
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(),
+            'arch': type(model).__name__,
+            'trained': args.trained,
+            'seconds': args.seconds,
+            'concurrency': args.concurrency,
+            'batch_size': Config.SCORING_BATCH_SIZE,
+            'default_torch_threads': default_threads,
+            'runtime_torch_threads': pinned,
+            'cpus': os.cpu_count(),
+            'platform': platform.platform(),
+        },
+        'results': results,
+    }
+    out = Path(args.output)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {out}")
+
+
+if __name__ == '__main__':
+    main()
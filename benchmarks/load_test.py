@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""Concurrent load test for the forecasting API with a ramp of simulated users.
+
+Usage:
+  PYTHONPATH="." python benchmarks/load_test.py --levels 1 10 50 100 --duration 20
+  PYTHONPATH="." python benchmarks/load_test.py --prefork 4 --levels 50 200 --output benchmarks/results/load_prefork.json
+  PYTHONPATH="." python benchmarks/load_test.py --url http://staging:8000 --levels 25 --compare benchmarks/results/load_test.json
+
+Unless --url is given, the API is started locally on a free port (uvicorn, or the
+pre-fork server with --prefork) against the configured database and models.
+
+Traffic mix per simulated user (closed loop, with a random think time between actions):
+- dashboard (--dashboard-share of users): GET /stations, then /predict/{id} for every
+  station, up to --browser-connections in parallel, as the dashboard does on each refresh
+- lookup (the rest): GET /predict/{id} for a random station, or /stations/{id}/navigate
+  (--navigate-share of lookups)
+
+Each concurrency level runs for --duration seconds. Throughput, error counts and
+p50/p95/p99 latency are reported per route and overall, and written as JSON.
+Requests shed by the API's admission control (503 with Retry-After) are counted as
+`shed` rather than errors and left out of the latency percentiles, which therefore
+describe the admitted requests; `degraded` counts stale forecasts served instead.
+"""
+
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+import numpy as np
+
+
+class Recorder:
+    """Latency samples and error counts per route template."""
+
+    def __init__(self):
+        self.samples = {}
+        self.errors = {}
+        self.shed = {}
+        self.degraded = {}
+
+    def record(self, route, seconds, ok, shed=False, degraded=False):
+        if shed:
+            self.shed[route] = self.shed.get(route, 0) + 1
+            return
+        self.samples.setdefault(route, []).append(seconds)
+        if not ok:
+            self.errors[route] = self.errors.get(route, 0) + 1
+        if degraded:
+            self.degraded[route] = self.degraded.get(route, 0) + 1
+
+    def report(self, elapsed):
+        routes = {}
+        everything = []
+        for route in sorted(set(self.samples) | set(self.shed)):
+            samples = self.samples.get(route, [])
+            everything.extend(samples)
+            routes[route] = summarize(samples, self.errors.get(route, 0), elapsed,
+                                      self.shed.get(route, 0), self.degraded.get(route, 0))
+        overall = summarize(everything, sum(self.errors.values()), elapsed,
+                            sum(self.shed.values()), sum(self.degraded.values()))
+        return {'overall': overall, 'routes': routes}
+
+
+def summarize(samples, errors, elapsed, shed=0, degraded=0):
+    if not samples:
+        return {'requests': 0, 'shed': shed}
+    ms = np.array(samples) * 1000
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'shed': shed,
+        'degraded': degraded,
+        'throughput_rps': round(len(samples) / elapsed, 1),
+        'p50_ms': round(float(np.percentile(ms, 50)), 2),
+        'p95_ms': round(float(np.percentile(ms, 95)), 2),
+        'p99_ms': round(float(np.percentile(ms, 99)), 2),
+        'max_ms': round(float(ms.max()), 2),
+    }
+
+
+async def timed_get(client, recorder, url, route):
+    t0 = time.perf_counter()
+    shed = degraded = False
+    try:
+        resp = await client.get(url)
+        ok = resp.status_code < 500
+        shed = resp.status_code == 503 and 'retry-after' in resp.headers
+        degraded = resp.headers.get('x-forecast-source') == 'stale'
+    except httpx.HTTPError:
+        ok = False
+    recorder.record(route, time.perf_counter() - t0, ok, shed, degraded)
+
+
+async def dashboard_user(client, recorder, station_ids, args, deadline):
+    sem = asyncio.Semaphore(args.browser_connections)
+
+    async def predict(sid):
+        async with sem:
+            await timed_get(client, recorder, f"/predict/{sid}", "/predict/{station_id}")
+
+    while time.perf_counter() < deadline:
+        await timed_get(client, recorder, "/stations", "/stations")
+        await asyncio.gather(*(predict(sid) for sid in station_ids))
+        await asyncio.sleep(random.uniform(0, args.think))
+
+
+async def lookup_user(client, recorder, station_ids, args, deadline):
+    while time.perf_counter() < deadline:
+        sid = random.choice(station_ids)
+        if random.random() < args.navigate_share:
+            await timed_get(client, recorder, f"/stations/{sid}/navigate", "/stations/{station_id}/navigate")
+        else:
+            await timed_get(client, recorder, f"/predict/{sid}", "/predict/{station_id}")
+        await asyncio.sleep(random.uniform(0, args.think))
+
+
+async def run_level(base_url, users, station_ids, args):
+    limits = httpx.Limits(max_connections=users * args.browser_connections, max_keepalive_connections=users * args.browser_connections)
+    recorder = Recorder()
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=args.timeout) as client:
+        n_dashboards = round(users * args.dashboard_share)
+        start = time.perf_counter()
+        deadline = start + args.duration
+        tasks = [dashboard_user(client, recorder, station_ids, args, deadline) for _ in range(n_dashboards)]
+        tasks += [lookup_user(client, recorder, station_ids, args, deadline) for _ in range(users - n_dashboards)]
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - start
+    result = recorder.report(elapsed)
+    result.update({'users': users, 'dashboards': n_dashboards, 'elapsed_s': round(elapsed, 2)})
+    return result
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(args):
+    port = free_port()
+    if args.prefork:
+        cmd = [sys.executable, '-m', 'src.api.prefork', '--workers', str(args.prefork), '--port', str(port), '--log-level', 'warning']
+    else:
+        cmd = [sys.executable, '-m', 'uvicorn', 'src.api.main:app', '--port', str(port), '--log-level', 'warning']
+    env = dict(os.environ, PYTHONPATH=os.environ.get('PYTHONPATH', '.'))
+    proc = subprocess.Popen(cmd, env=env)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(120):
+        try:
+            if httpx.get(url + "/", timeout=1).status_code == 200:
+                return proc, url
+        except httpx.HTTPError:
+            pass
+        if proc.poll() is not None:
+            raise RuntimeError(f"API server exited with code {proc.returncode}")
+        time.sleep(0.5)
+    proc.terminate()
+    raise RuntimeError("API server did not become ready within 60s")
+
+
+def compare(current, baseline_path):
+    """Print throughput and p95 per level and route against a previous run."""
+    with open(baseline_path) as f:
+        baseline = {lvl['users']: lvl for lvl in json.load(f)['levels']}
+    print(f"\nComparison against {baseline_path} (ratio = current / baseline):")
+    for level in current['levels']:
+        base = baseline.get(level['users'])
+        if base is None:
+            continue
+        for route, stats in [('overall', level['overall'])] + list(level['routes'].items()):
+            old = base['overall'] if route == 'overall' else base['routes'].get(route)
+            if not old or not old.get('requests') or not stats.get('requests'):
+                continue
+            print(f"  users={level['users']:<5} {route:<35} "
+                  f"rps {old['throughput_rps']:>9} -> {stats['throughput_rps']:>9} ({stats['throughput_rps'] / old['throughput_rps']:.2f}x)  "
+                  f"p95 {old['p95_ms']:>8} -> {stats['p95_ms']:>8} ({stats['p95_ms'] / old['p95_ms']:.2f}x)")
+
+
+def print_level(level):
+    o = level['overall']
+    print(f"users={level['users']:<5} {o.get('throughput_rps', 0):>8} req/s  p50 {o.get('p50_ms')} ms  "
+          f"p95 {o.get('p95_ms')} ms  p99 {o.get('p99_ms')} ms  errors {o.get('errors', 0)}  "
+          f"shed {o.get('shed', 0)}  degraded {o.get('degraded', 0)}")
+    for route, stats in level['routes'].items():
+        if not stats['requests']:
+            print(f"    {route:<35} all {stats['shed']} requests shed")
+            continue
+        print(f"    {route:<35} {stats['throughput_rps']:>8} req/s  p50 {stats['p50_ms']:>8}  "
+              f"p95 {stats['p95_ms']:>8}  p99 {stats['p99_ms']:>8}  errors {stats['errors']}  shed {stats['shed']}")
+
+
+async def main_async(args, base_url):
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout) as client:
+        stations = (await client.get("/stations")).json()
+    station_ids = [s['id'] for s in stations]
+    if args.max_stations:
+        station_ids = station_ids[:args.max_stations]
+    if not station_ids:
+        raise RuntimeError("No stations returned by /stations; populate the database first")
+    print(f"Load testing {base_url} with {len(station_ids)} stations")
+
+    levels = []
+    for users in args.levels:
+        level = await run_level(base_url, users, station_ids, args)
+        print_level(level)
+        levels.append(level)
+    return station_ids, levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Ramp simulated dashboards and lookups against the API')
+    parser.add_argument('--url', type=str, help='Existing API to test (default: start one locally)')
+    parser.add_argument('--prefork', type=int, help='Start the pre-fork server with this many workers instead of uvicorn')
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 10, 50, 100], help='Concurrent users per step of the ramp')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds per level')
+    parser.add_argument('--dashboard-share', type=float, default=0.2, help='Share of users that are dashboards')
+    parser.add_argument('--navigate-share', type=float, default=0.2, help='Share of lookups that request navigation')
+    parser.add_argument('--browser-connections', type=int, default=6, help='Parallel requests per dashboard, like a browser')
+    parser.add_argument('--think', type=float, default=0.1, help='Max random think time between user actions (s)')
+    parser.add_argument('--max-stations', type=int, help='Only use the first N stations')
+    parser.add_argument('--timeout', type=float, default=30, help='Per-request timeout (s)')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for the traffic mix')
+    parser.add_argument('--output', type=str, default='benchmarks/results/load_test.json', help='Where to write JSON results')
+    parser.add_argument('--compare', type=str, help='Previous results JSON to compare against')
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    proc = None
+    base_url = args.url
+    if not base_url:
+        proc, base_url = start_server(args)
+    try:
+        station_ids, levels = asyncio.run(main_async(args, base_url))
+    finally:
+        if proc is not None:
+            proc.terminate()
+            proc.wait(timeout=30)
+
+    results = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(),
+            'url': args.url or 'local',
+            'server': f"prefork x{args.prefork}" if args.prefork else ('external' if args.url else 'uvicorn'),
+            'stations': len(station_ids),
+            'duration_s': args.duration,
+            'dashboard_share': args.dashboard_share,
+            'navigate_share': args.navigate_share,
+            'think_s': args.think,
+            'cpus': os.cpu_count(),
+        },
+        'levels': levels,
+    }
+    out = Path(args.output)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""Compare the model architectures (MODEL_ARCH) on accuracy and inference latency.
+
+Usage:
+  PYTHONPATH="." python benchmarks/model_zoo.py --epochs 3 --workers 4
+  PYTHONPATH="." python benchmarks/model_zoo.py --archs lstm gru tcn --max-mae 1.2 --output benchmarks/results/zoo_small.json
+
+Every architecture in src/model.py MODEL_ARCHS is trained as a global model with
+the Config hyperparameters for --epochs epochs on the same sampled windows of the
+configured database (through the feature cache, as src/tune.py does), in parallel
+worker processes. Validation MSE and MAE in ports come from the same last-20%
+windows. Single-window and SCORING_BATCH_SIZE-window inference latency (p50/p99)
+is then measured one model at a time in this process, so the timings do not
+compete with training. models/ is not touched.
+
+The report lists the fastest architecture whose MAE is within --max-mae ports
+(default: no worse than the LSTM).
+"""
+
+import argparse
+import concurrent.futures
+import datetime
+import json
+import os
+import platform
+import shutil
+import tempfile
+from pathlib import Path
+
+import torch
+
+from src.config import Config
+from src.model import MODEL_ARCHS
+from src.tune import (_init_worker, _run_trial, measure_latency, prepare_features, shared_features, trial_model,
+                      worker_settings)
+
+
+def arch_params(arch):
+    return {
+        'arch': arch,
+        'hidden_dim': Config.HIDDEN_DIM,
+        'num_layers': Config.NUM_LAYERS,
+        'dropout': Config.DROPOUT,
+        'learning_rate': Config.LEARNING_RATE,
+        'batch_size': Config.BATCH_SIZE,
+        'station_embed_dim': Config.STATION_EMBED_DIM,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark model architectures on MAE and inference latency')
+    parser.add_argument('--archs', nargs='+', choices=list(MODEL_ARCHS), default=list(MODEL_ARCHS), help='Architectures to compare')
+    parser.add_argument('--epochs', type=int, default=3, help='Training epochs per architecture')
+    parser.add_argument('--train-windows', type=int, default=50000, help='Training windows sampled per epoch (0 = all)')
+    parser.add_argument('--val-windows', type=int, default=20000, help='Validation windows (0 = all)')
+    parser.add_argument('--workers', type=int, help='Training processes (default: all cores)')
+    parser.add_argument('--latency-repeats', type=int, default=200, help='Timed single-window calls per model')
+    parser.add_argument('--max-mae', type=float, help='Accuracy bar in ports (default: the LSTM MAE)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', type=str, default='benchmarks/results/model_zoo.json', help='Where to write JSON results')
+    args = parser.parse_args()
+
+    workers = min(len(args.archs), args.workers or os.cpu_count() or 1)
+    features, starts, preprocessor = prepare_features()
+    trial_dir = tempfile.mkdtemp(prefix='model_zoo_')
+    settings = worker_settings(preprocessor, trial_dir, workers, args.train_windows, args.val_windows, args.seed)
+    tasks = [(i, arch_params(arch), 0, 0, args.epochs) for i, arch in enumerate(args.archs)]
+    print(f"Training {', '.join(args.archs)} for {args.epochs} epochs on {len(starts):,} windows with {workers} workers")
+
+    results = {}
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                    initargs=(*shared_features(features, starts), settings)) as pool:
+            for result in pool.map(_run_trial, tasks):
+                arch = args.archs[result['trial']]
+                print(f"  {arch:<7} val loss {result['val_loss']:.5f}  MAE {result.get('mae_ports', float('nan')):.3f} ports  [{result['train_s']}s]")
+                results[arch] = result
+
+        # Time each model alone, after training has finished
+        for i, arch in enumerate(args.archs):
+            model = trial_model(arch_params(arch), settings['num_stations'])
+            model.load_state_dict(torch.load(os.path.join(trial_dir, f"trial_{i}.pt"))['model'])
+            results[arch].update(measure_latency(model, features, starts[-Config.SCORING_BATCH_SIZE:], Config.SEQ_LENGTH,
+                                                 Config.SCORING_BATCH_SIZE, repeats=args.latency_repeats))
+    finally:
+        shutil.rmtree(trial_dir, ignore_errors=True)
+
+    rows = []
+    for arch, r in results.items():
+        rows.append({
+            'arch': arch,
+            'n_params': r['n_params'],
+            'val_mse': round(r['val_loss'], 6),
+            'mae_ports': r.get('mae_ports'),
+            'single_p50_ms': r['latency_ms'],
+            'single_p99_ms': r['latency_p99_ms'],
+            'batch_p50_ms': r['batch_latency_ms'],
+            'batch_p99_ms': r['batch_latency_p99_ms'],
+            'train_s': r['train_s'],
+        })
+
+    bar = args.max_mae
+    if bar is None and 'lstm' in results:
+        bar = results['lstm'].get('mae_ports')
+    eligible = [row for row in rows if bar is None or (row['mae_ports'] is not None and row['mae_ports'] <= bar)]
+    choice = min(eligible, key=lambda row: row['single_p50_ms'])['arch'] if eligible else None
+
+    print(f"\n{'arch':<8}{'params':>10}{'MAE':>8}{'MSE':>10}{'1x p50':>10}{'1x p99':>10}"
+          f"{f'{Config.SCORING_BATCH_SIZE}x p50':>12}{f'{Config.SCORING_BATCH_SIZE}x p99':>12}")
+    for row in sorted(rows, key=lambda row: row['single_p50_ms']):
+        print(f"{row['arch']:<8}{row['n_params']:>10,}{row['mae_ports'] or float('nan'):>8.3f}{row['val_mse']:>10.5f}"
+              f"{row['single_p50_ms']:>10.3f}{row['single_p99_ms']:>10.3f}{row['batch_p50_ms']:>12.2f}{row['batch_p99_ms']:>12.2f}")
+    if bar is not None:
+        print(f"\nFastest model within MAE {bar:.3f} ports: {choice or 'none'}"
+              + (f" (MODEL_ARCH={choice})" if choice else ""))
+
+    report = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(),
+            'epochs': args.epochs,
+            'train_windows': args.train_windows,
+            'val_windows': args.val_windows,
+            'windows': len(starts),
+            'batch_size': Config.SCORING_BATCH_SIZE,
+            'hidden_dim': Config.HIDDEN_DIM,
+            'num_layers': Config.NUM_LAYERS,
+            'torch_threads': torch.get_num_threads(),
+            'cpus': os.cpu_count(),
+            'platform': platform.platform(),
+        },
+        'max_mae_ports': bar,
+        'fastest_within_bar': choice,
+        'models': rows,
+    }
+    out = Path(args.output)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {out}")
+
+
+if __name__ == '__main__':
+    main()
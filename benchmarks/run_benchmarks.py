@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""Time the hot paths of the forecasting pipeline on deterministic synthetic data.
+
+Usage:
+  PYTHONPATH="." python benchmarks/run_benchmarks.py --stations 30 --days 7 --output benchmarks/results/run.json
+  PYTHONPATH="." python benchmarks/run_benchmarks.py --compare benchmarks/results/baseline.json
+
+Covers:
+- Ingest (save_records) and history reads (load_history, all stations and one station)
+- Preprocessing (DataPreprocessor.transform, create_sequences)
+- Training epoch throughput (samples/sec)
+- Single and batched EVChargingLSTM inference
+- End-to-end GET /predict/{id} through FastAPI's TestClient
+
+Everything runs against a throwaway database and model directory, so the real
+ev_charging.db and models/ are never touched. Results are written as JSON so
+two runs can be compared with --compare.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader
+
+from src.config import Config
+
+
+def timeit(fn, repeats=5, warmup=1):
+    """Run fn repeatedly and return timing stats in milliseconds plus the last result."""
+    result = None
+    for _ in range(warmup):
+        result = fn()
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    stats = {
+        'min_ms': round(samples[0], 3),
+        'median_ms': round(statistics.median(samples), 3),
+        'mean_ms': round(statistics.mean(samples), 3),
+        'p95_ms': round(samples[min(len(samples) - 1, int(len(samples) * 0.95))], 3),
+        'repeats': repeats,
+    }
+    return stats, result
+
+
+def use_database(path):
+    """Point the DB layer at a scratch SQLite file."""
+    Config.DB_URL = f"sqlite:///{path}"
+
+
+def generate_data(workdir, stations, days, interval, seed):
+    """Populate a scratch DB with the synthetic generator from scripts/."""
+    from scripts.generate_large_dataset import generate
+
+    random.seed(seed)
+    use_database(os.path.join(workdir, 'bench.db'))
+    generate(num_stations=stations, days=days, interval_minutes=interval)
+
+
+def bench_ingest(workdir, records, repeats):
+    from src.db import init_db, save_records
+
+    counter = {'n': 0}
+
+    def run():
+        # A fresh DB per run so every repeat measures the same amount of work
+        counter['n'] += 1
+        use_database(os.path.join(workdir, f"ingest_{counter['n']}.db"))
+        init_db()
+        save_records(records)
+
+    stats, _ = timeit(run, repeats=repeats, warmup=0)
+    stats['records'] = len(records)
+    stats['records_per_sec'] = round(len(records) / (stats['median_ms'] / 1000), 1)
+    return stats
+
+
+def bench_training_epoch(X, y, num_stations, batch_size):
+    from src.dataset import TimeSeriesDataset
+    from src.model import EVChargingLSTM
+
+    loader = DataLoader(TimeSeriesDataset(X, y), batch_size=batch_size, shuffle=True)
+    model = EVChargingLSTM(
+        hidden_dim=Config.HIDDEN_DIM,
+        num_layers=Config.NUM_LAYERS,
+        station_emb_dim=Config.STATION_EMBED_DIM,
+        num_stations=num_stations
+    )
+    criterion = nn.MSELoss()
+    optimizer = optim.Adam(model.parameters(), lr=Config.LEARNING_RATE)
+
+    model.train()
+    t0 = time.perf_counter()
+    for seq, target in loader:
+        optimizer.zero_grad()
+        loss = criterion(model(seq).squeeze(), target)
+        loss.backward()
+        optimizer.step()
+    elapsed = time.perf_counter() - t0
+    return model, {
+        'samples': len(X),
+        'batch_size': batch_size,
+        'epoch_s': round(elapsed, 3),
+        'samples_per_sec': round(len(X) / elapsed, 1),
+    }
+
+
+def bench_inference(model, X, batch_size, repeats):
+    model.eval()
+    single = torch.tensor(X[:1], dtype=torch.float32)
+    batch = torch.tensor(X[:batch_size], dtype=torch.float32)
+
+    with torch.no_grad():
+        single_stats, _ = timeit(lambda: model(single), repeats=repeats * 20, warmup=5)
+        batch_stats, _ = timeit(lambda: model(batch), repeats=repeats, warmup=2)
+    batch_stats['batch_size'] = len(batch)
+    batch_stats['samples_per_sec'] = round(len(batch) / (batch_stats['median_ms'] / 1000), 1)
+    return {'single': single_stats, 'batched': batch_stats}
+
+
+def bench_predict_endpoint(model_dir, station_ids, repeats):
+    from fastapi.testclient import TestClient
+    from src.api import main
+    from src.api.utils import load_inference_artifacts
+    from src.inference import InferenceRuntime
+
+    Config.MODEL_PATH = os.path.join(model_dir, 'model.pt')
+    Config.SCALER_PATH = os.path.join(model_dir, 'scaler.joblib')
+    Config.VOCAB_PATH = os.path.join(model_dir, 'station_vocab.json')
+    # Load artifacts directly rather than through the startup event so the
+    # background prediction stream does not compete with the measurement
+    main.model, main.preprocessor = load_inference_artifacts()
+    main.runtime = InferenceRuntime(main.model)
+    client = TestClient(main.app)
+
+    ids = iter(station_ids * (repeats * 10 + 10))
+
+    def run():
+        resp = client.get(f"/predict/{next(ids)}")
+        resp.raise_for_status()
+
+    stats, _ = timeit(run, repeats=repeats * 10, warmup=3)
+    return stats
+
+
+def run(args):
+    from src.db import load_history
+    from src.preprocessing import DataPreprocessor, create_sequences
+    from src.vocab import StationVocab
+
+    torch.manual_seed(args.seed)
+    np.random.seed(args.seed)
+
+    results = {
+        'meta': {
+            'timestamp': datetime.datetime.now().isoformat(),
+            'python': sys.version.split()[0],
+            'torch': torch.__version__,
+            'platform': platform.platform(),
+            'torch_threads': torch.get_num_threads(),
+            'stations': args.stations,
+            'days': args.days,
+            'interval_minutes': args.interval,
+            'seed': args.seed,
+        },
+        'benchmarks': {},
+    }
+    bench = results['benchmarks']
+
+    with tempfile.TemporaryDirectory() as workdir:
+        print(f"Generating {args.stations} stations x {args.days} days of data...")
+        generate_data(workdir, args.stations, args.days, args.interval, args.seed)
+        source_db = Config.DB_URL
+
+        stats, df = timeit(load_history, repeats=args.repeats)
+        stats['rows'] = len(df)
+        bench['load_history_all'] = stats
+        station_ids = sorted(int(s) for s in df['station_id'].unique())
+        stats, _ = timeit(lambda: load_history(station_id=station_ids[0]), repeats=args.repeats)
+        bench['load_history_station'] = stats
+
+        records = df.drop(columns=['id'], errors='ignore').to_dict('records')
+        bench['save_records'] = bench_ingest(workdir, records, args.repeats)
+        Config.DB_URL = source_db
+
+        preprocessor = DataPreprocessor()
+        preprocessor.fit(df)
+        preprocessor.vocab = StationVocab(station_ids)
+        stats, df_processed = timeit(lambda: preprocessor.transform(df.copy()), repeats=args.repeats)
+        stats['rows'] = len(df)
+        bench['preprocess_transform'] = stats
+
+        stats, (X, y) = timeit(lambda: create_sequences(df_processed, Config.SEQ_LENGTH), repeats=args.repeats)
+        stats['sequences'] = len(X)
+        bench['create_sequences'] = stats
+
+        model, bench['train_epoch'] = bench_training_epoch(X, y, len(preprocessor.vocab), args.batch_size)
+        bench['inference'] = bench_inference(model, X, args.inference_batch, args.repeats)
+
+        model_dir = os.path.join(workdir, 'models')
+        os.makedirs(model_dir)
+        torch.save(model.state_dict(), os.path.join(model_dir, 'model.pt'))
+        preprocessor.save(os.path.join(model_dir, 'scaler.joblib'), os.path.join(model_dir, 'station_vocab.json'))
+        bench['predict_endpoint'] = bench_predict_endpoint(model_dir, station_ids, args.repeats)
+
+    return results
+
+
+def flatten(d, prefix=''):
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}{k}"
+        if isinstance(v, dict):
+            out.update(flatten(v, key + '.'))
+        else:
+            out[key] = v
+    return out
+
+
+def compare(current, baseline_path):
+    """Print the ratio of every timing/throughput metric against a previous run."""
+    with open(baseline_path) as f:
+        baseline = flatten(json.load(f)['benchmarks'])
+    print(f"\nComparison against {baseline_path} (ratio = current / baseline):")
+    for key, value in flatten(current['benchmarks']).items():
+        if not key.endswith(('median_ms', 'samples_per_sec', 'records_per_sec', 'epoch_s')):
+            continue
+        base = baseline.get(key)
+        if not base:
+            continue
+        print(f"  {key:<45} {base:>12} -> {value:>12}  ({value / base:.2f}x)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark ingest, preprocessing, training, inference and API latency')
+    parser.add_argument('--stations', type=int, default=30, help='Number of synthetic stations')
+    parser.add_argument('--days', type=int, default=7, help='Days of synthetic history per station')
+    parser.add_argument('--interval', type=int, default=15, help='Interval minutes between records')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed for data generation and model init')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed repetitions per benchmark')
+    parser.add_argument('--batch-size', type=int, default=Config.BATCH_SIZE, help='Training batch size')
+    parser.add_argument('--inference-batch', type=int, default=256, help='Batch size for batched inference')
+    parser.add_argument('--output', type=str, default='benchmarks/results/latest.json', help='Where to write JSON results')
+    parser.add_argument('--compare', type=str, help='Previous results JSON to compare against')
+    args = parser.parse_args()
+
+    results = run(args)
+
+    out = Path(args.output)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    print(json.dumps(results['benchmarks'], indent=2))
+    print(f"\nResults written to {out}")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == '__main__':
+    main()
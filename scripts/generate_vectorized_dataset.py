@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""Vectorized synthetic dataset generator that streams chunks to the DB or to Parquet.
+
+Usage:
+  PYTHONPATH="." python scripts/generate_vectorized_dataset.py --num-stations 1000 --days 30
+  PYTHONPATH="." python scripts/generate_vectorized_dataset.py --num-stations 10000 --days 365 --workers 8 --parquet data/synthetic
+  PYTHONPATH="." python scripts/generate_vectorized_dataset.py --profile india --db data/loadtest.db --seed 7
+
+Produces the same kind of data as generate_enhanced_dataset.py / generate_indian_dataset.py
+(station types with peak hours, weekend effects, gaussian noise, at most 30% of ports
+changing per interval, 1% maintenance outages), but:
+- each chunk of stations is generated as (time x station) NumPy arrays; only the
+  30% smoothing recurrence steps through time, one vector operation per timestep
+- chunks are written as they are produced (save_records, or one Parquet part file
+  per chunk), so memory is bounded by --chunk-stations rather than the dataset size
+- --workers generates chunks in parallel processes; the DB is still written by one process
+- --seed makes the output reproducible, independently of --workers and --chunk-stations
+"""
+
+import argparse
+import datetime
+import math
+import multiprocessing
+import os
+import random
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.config import Config
+
+# Maximum share of a station's ports whose availability may change between two intervals
+MAX_CHANGE_SHARE = 0.3
+MAINTENANCE_PROB = 0.01
+
+# Weekend usage multiplier relative to base usage, by station type
+WEEKEND_FACTORS = {'commercial': 0.5, 'residential': 1.2}
+
+
+def load_profile(name):
+    """Station types, locations and address helper from the matching per-record generator."""
+    if name == 'india':
+        from scripts import generate_indian_dataset as mod
+        return mod.STATION_TYPES, mod.INDIAN_LOCATIONS, mod.generate_realistic_address, {'commercial': 0.4, 'residential': 1.3}
+    from scripts import generate_enhanced_dataset as mod
+    return mod.STATION_TYPES, mod.BAY_AREA_LOCATIONS, mod.generate_realistic_address, WEEKEND_FACTORS
+
+
+def make_stations(num_stations, profile, seed, start_id=1):
+    """Station metadata as a DataFrame plus the station type index of every row."""
+    station_types, locations, make_address, _ = profile
+    type_names = list(station_types)
+    rng = np.random.default_rng(seed)
+    random.seed(seed)
+
+    # Roughly even share per location first, the remainder spread at random
+    per_location = max(1, num_stations // len(locations))
+    loc_idx = np.repeat(np.arange(len(locations)), per_location)[:num_stations]
+    loc_idx = np.concatenate([loc_idx, rng.integers(0, len(locations), num_stations - len(loc_idx))])
+
+    type_idx = rng.choice(len(type_names), size=num_stations, p=[0.35, 0.25, 0.20, 0.20])
+    angle = rng.uniform(0, 2 * math.pi, num_stations)
+    radius = np.array([loc['radius'] for loc in locations])[loc_idx]
+    distance = rng.uniform(0, 1, num_stations) * radius
+    lat = np.array([loc['lat'] for loc in locations])[loc_idx] + distance * np.cos(angle)
+    lon = np.array([loc['lon'] for loc in locations])[loc_idx] + distance * np.sin(angle)
+    lo = np.array([station_types[t]['ports_range'][0] for t in type_names])[type_idx]
+    hi = np.array([station_types[t]['ports_range'][1] for t in type_names])[type_idx]
+    total_ports = rng.integers(lo, hi + 1)
+
+    ids = np.arange(start_id, start_id + num_stations)
+    names = [locations[l]['name'] for l in loc_idx]
+    types = [type_names[t] for t in type_idx]
+    stations = pd.DataFrame({
+        'id': ids,
+        'name': [f"{n} {t.title()} Station {i}" for n, t, i in zip(names, types, ids)],
+        'latitude': lat,
+        'longitude': lon,
+        'address': [make_address(t, n, i) for t, n, i in zip(types, names, ids)],
+        'type': types,
+        'total_ports': total_ports,
+    })
+    return stations, type_idx
+
+
+def usage_tables(profile):
+    """(weekday usage by type and hour, weekend usage by type) lookup arrays."""
+    station_types, _, _, weekend_factors = profile
+    weekday = np.zeros((len(station_types), 24))
+    weekend = np.zeros(len(station_types))
+    for k, (name, cfg) in enumerate(station_types.items()):
+        for hour in range(24):
+            is_peak = any(start <= hour < end for start, end in cfg['peak_hours'])
+            weekday[k, hour] = cfg['peak_usage'] if is_peak else cfg['base_usage']
+        weekend[k] = cfg['base_usage'] * weekend_factors.get(name, 1.0)
+    return weekday, weekend
+
+
+def generate_chunk(task):
+    """
+    Generate logs for one chunk of stations. Returns a DataFrame with the station_logs
+    columns, or writes it to Parquet and returns the row count when task['parquet'] is set.
+    """
+    stations = task['stations']
+    weekday, weekend = task['usage_tables']
+
+    timestamps = task['start'] + np.arange(task['periods']) * np.timedelta64(task['interval_minutes'], 'm')
+    epoch_s = timestamps.astype('datetime64[s]').astype('int64')
+    hours = (epoch_s // 3600) % 24
+    is_weekend = ((epoch_s // 86400 + 3) % 7) >= 5  # 1970-01-01 was a Thursday; Monday = 0
+
+    type_idx = task['type_idx']
+    total = stations['total_ports'].to_numpy()
+    n_t, n_s = len(timestamps), len(total)
+
+    # One random stream per station, so the output does not depend on chunking or workers
+    factor = np.empty((n_s, n_t))
+    noise = np.empty((n_s, n_t))
+    outage = np.empty((n_s, n_t), dtype=bool)
+    first_noise = np.empty(n_s)
+    for j, sid in enumerate(stations['id'].to_numpy()):
+        rng = np.random.default_rng([task['seed'], int(sid)])
+        factor[j] = rng.normal(1.0, 0.15, n_t)
+        noise[j] = rng.normal(0.0, 0.1, n_t)
+        outage[j] = rng.random(n_t) < MAINTENANCE_PROB
+        first_noise[j] = rng.normal(0.0, 1.5)
+    factor, noise, outage = factor.T, noise.T, outage.T
+
+    # Usage per (time, station): peak/base level with multiplicative and additive noise on
+    # weekdays, a flat type-dependent level on weekends
+    level = weekday[type_idx][:, hours].T
+    usage = np.clip(level * factor + noise, 0.0, 1.0)
+    usage = np.where(is_weekend[:, None], weekend[type_idx][None, :], usage)
+
+    target = total - np.floor(total * usage).astype(np.int64)
+    max_change = np.maximum(1, (total * MAX_CHANGE_SHARE).astype(np.int64))
+
+    available = np.empty((n_t, n_s), dtype=np.int64)
+    first_occupied = np.clip((total * usage[0] + first_noise).astype(np.int64), 0, total)
+    prev = np.where(outage[0], 0, total - first_occupied)
+    available[0] = prev
+    # Smoothing depends on the previous value, so only this step walks through time
+    for t in range(1, n_t):
+        cur = np.minimum(np.maximum(target[t], prev - max_change), prev + max_change)
+        np.maximum(cur, 0, out=cur)
+        cur[outage[t]] = 0
+        available[t] = cur
+        prev = cur
+
+    # Station-major order, matching the clustering key of the v2 station_logs table
+    df = pd.DataFrame({
+        'station_id': np.repeat(stations['id'].to_numpy(), n_t),
+        'timestamp': np.tile(timestamps, n_s),
+        'latitude': np.repeat(stations['latitude'].to_numpy(), n_t),
+        'longitude': np.repeat(stations['longitude'].to_numpy(), n_t),
+        'total_ports': np.repeat(total, n_t),
+        'available_ports': available.T.ravel(),
+        'is_operational': (~outage).T.ravel().astype(np.int64),
+    })
+
+    if task['parquet']:
+        df.to_parquet(os.path.join(task['parquet'], f"part-{task['chunk']:05d}.parquet"), index=False)
+        return len(df)
+    return df
+
+
+def generate(num_stations=1000, days=30, interval_minutes=15, profile='bay_area', seed=42,
+             chunk_stations=128, workers=1, parquet=None, start_id=1):
+    t0 = time.time()
+    prof = load_profile(profile)
+    stations, type_idx = make_stations(num_stations, prof, seed, start_id=start_id)
+    periods = int(days * 24 * 60 / interval_minutes)
+    start = np.datetime64(datetime.datetime.utcnow() - datetime.timedelta(days=days), 'us')
+    print(f"Generating {num_stations:,} stations x {periods:,} intervals "
+          f"({num_stations * periods:,} rows) in chunks of {chunk_stations} stations, {workers} worker(s)")
+
+    if parquet:
+        os.makedirs(parquet, exist_ok=True)
+        stations.to_parquet(os.path.join(parquet, 'stations.parquet'), index=False)
+    else:
+        from src.db import init_db, save_stations
+        init_db()
+        save_stations(stations.to_dict('records'))
+
+    tables = usage_tables(prof)
+    tasks = [
+        {
+            'chunk': i,
+            'stations': stations.iloc[lo:lo + chunk_stations],
+            'type_idx': type_idx[lo:lo + chunk_stations],
+            'usage_tables': tables,
+            'start': start,
+            'periods': periods,
+            'interval_minutes': interval_minutes,
+            'seed': seed,
+            'parquet': parquet,
+        }
+        for i, lo in enumerate(range(0, num_stations, chunk_stations))
+    ]
+
+    rows = 0
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        results = pool.imap(generate_chunk, tasks) if pool else map(generate_chunk, tasks)
+        for i, result in enumerate(results, 1):
+            if parquet:
+                rows += result
+            else:
+                from src.db import save_records
+                save_records(result)
+                rows += len(result)
+            print(f"  chunk {i}/{len(tasks)}: {rows:,} rows ({rows / (time.time() - t0):,.0f} rows/s)")
+    finally:
+        if pool:
+            pool.close()
+            pool.join()
+
+    target = parquet or Config.DB_URL
+    print(f"Generated {num_stations:,} stations and {rows:,} log records into {target} in {time.time() - t0:.1f}s")
+    return rows
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Generate a large synthetic station dataset with NumPy')
+    parser.add_argument('--num-stations', type=int, default=1000, help='Number of stations to generate')
+    parser.add_argument('--days', type=float, default=30, help='Number of days of history')
+    parser.add_argument('--interval', type=int, default=15, help='Interval minutes between records')
+    parser.add_argument('--profile', choices=['bay_area', 'india'], default='bay_area', help='Station types and cities to use')
+    parser.add_argument('--seed', type=int, default=42, help='Random seed (output does not depend on workers or chunk size)')
+    parser.add_argument('--chunk-stations', type=int, default=128, help='Stations generated and written per chunk')
+    parser.add_argument('--workers', type=int, default=1, help='Processes generating chunks in parallel')
+    parser.add_argument('--parquet', type=str, help='Write Parquet part files to this directory instead of the DB (needs pyarrow)')
+    parser.add_argument('--db', type=str, help='SQLite file to write (defaults to Config.DB_URL)')
+    parser.add_argument('--start-id', type=int, default=1, help='First station id')
+    args = parser.parse_args()
+
+    if args.db:
+        Config.DB_URL = f"sqlite:///{args.db}"
+
+    generate(
+        num_stations=args.num_stations,
+        days=args.days,
+        interval_minutes=args.interval,
+        profile=args.profile,
+        seed=args.seed,
+        chunk_stations=args.chunk_stations,
+        workers=args.workers,
+        parquet=args.parquet,
+        start_id=args.start_id,
+    )
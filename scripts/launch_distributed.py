@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""Launch data-parallel global-model training (src/train.py --distributed) on one or more nodes.
+
+Usage:
+  # 4 local processes
+  PYTHONPATH="." python scripts/launch_distributed.py --nproc 4 -- --epochs 10
+
+  # 2 nodes x 8 processes; run on every node with its --node-rank
+  PYTHONPATH="." python scripts/launch_distributed.py --nproc 8 --nnodes 2 --node-rank 0 --master-addr 10.0.0.1 -- --epochs 10
+  PYTHONPATH="." python scripts/launch_distributed.py --nproc 8 --nnodes 2 --node-rank 1 --master-addr 10.0.0.1 -- --epochs 10
+
+  # Scaling report: 1, 2 and 4 local processes, 2 epochs each
+  PYTHONPATH="." python scripts/launch_distributed.py --scaling 1 2 4 -- --epochs 2
+
+Arguments after `--` are passed to src/train.py. Each process gets RANK, WORLD_SIZE,
+LOCAL_RANK, MASTER_ADDR and MASTER_PORT (the torchrun contract, so
+`torchrun --nproc-per-node 4 src/train.py --distributed` works too) and, unless
+TORCH_THREADS is set, an equal share of this node's cores. If one process fails,
+the others on this node are stopped.
+
+Every node needs the database (DB_URL, e.g. a shared PostgreSQL) and the same code.
+Rank 0 writes models/ and the run log. With --scaling, each world size trains
+with a run log and writes its model to a temporary directory, so models/ is not
+touched. Global samples/s (after the first epoch when there are several),
+speedup, efficiency and the marginal efficiency of each added worker are printed
+and written to --output.
+"""
+
+import argparse
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+
+def launch(nproc, train_args, nnodes=1, node_rank=0, master_addr='127.0.0.1', master_port=29500):
+    """Start this node's ranks and wait for them; returns the first non-zero exit code, or 0."""
+    world_size = nproc * nnodes
+    threads = max(1, (os.cpu_count() or 1) // nproc)
+    procs = []
+    for local_rank in range(nproc):
+        env = dict(os.environ,
+                   RANK=str(node_rank * nproc + local_rank),
+                   WORLD_SIZE=str(world_size),
+                   LOCAL_RANK=str(local_rank),
+                   LOCAL_WORLD_SIZE=str(nproc),
+                   MASTER_ADDR=master_addr,
+                   MASTER_PORT=str(master_port),
+                   PYTHONPATH=os.environ.get('PYTHONPATH', '.'))
+        env.setdefault('TORCH_THREADS', str(threads))
+        cmd = [sys.executable, 'src/train.py', '--distributed'] + train_args
+        procs.append(subprocess.Popen(cmd, env=env))
+
+    code = 0
+    try:
+        while procs:
+            for proc in list(procs):
+                rc = proc.poll()
+                if rc is None:
+                    continue
+                procs.remove(proc)
+                if rc != 0 and code == 0:
+                    code = rc
+                    print(f"Rank process {proc.pid} exited with code {rc}; stopping the others")
+                    for other in procs:
+                        other.send_signal(signal.SIGTERM)
+            time.sleep(0.2)
+    except KeyboardInterrupt:
+        for proc in procs:
+            proc.send_signal(signal.SIGTERM)
+        code = 130
+    return code
+
+
+def epoch_throughput(run_log):
+    """Mean global samples/s of the epochs in a run log, skipping the first when there are several."""
+    with open(run_log) as f:
+        epochs = [json.loads(line) for line in f]
+    rates = [e['global_samples_per_sec'] for e in epochs if e['event'] == 'epoch']
+    if len(rates) > 1:
+        rates = rates[1:]
+    return sum(rates) / len(rates) if rates else 0.0
+
+
+def scaling_report(sizes, train_args, master_port):
+    results = []
+    for nproc in sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            run_log = os.path.join(tmp, 'run.jsonl')
+            print(f"\n=== {nproc} process(es) ===")
+            t0 = time.time()
+            code = launch(nproc, train_args + ['--run-log', run_log, '--model-dir', tmp], master_port=master_port)
+            if code != 0:
+                raise SystemExit(f"Training with {nproc} processes failed (exit code {code})")
+            results.append({'processes': nproc, 'wall_s': round(time.time() - t0, 1),
+                            'samples_per_sec': round(epoch_throughput(run_log), 1)})
+
+    base = results[0]
+    previous = None
+    for row in results:
+        per_worker = base['samples_per_sec'] / base['processes']
+        row['speedup'] = round(row['samples_per_sec'] / base['samples_per_sec'], 3)
+        row['efficiency'] = round(row['samples_per_sec'] / (per_worker * row['processes']), 3)
+        if previous is not None:
+            added = row['processes'] - previous['processes']
+            row['marginal_efficiency'] = round((row['samples_per_sec'] - previous['samples_per_sec']) / (per_worker * added), 3)
+        previous = row
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Launch distributed (gloo) data-parallel training of the global model')
+    parser.add_argument('--nproc', type=int, default=os.cpu_count() or 1, help='Processes on this node')
+    parser.add_argument('--nnodes', type=int, default=1, help='Number of nodes')
+    parser.add_argument('--node-rank', type=int, default=0, help='Index of this node (0 hosts rank 0)')
+    parser.add_argument('--master-addr', type=str, default='127.0.0.1', help='Address of the node with rank 0')
+    parser.add_argument('--master-port', type=int, default=29500, help='Rendezvous port on the master node')
+    parser.add_argument('--scaling', type=int, nargs='+', help='Measure throughput at these local process counts instead')
+    parser.add_argument('--output', type=str, default='logs/ddp_scaling.json', help='Where --scaling writes its JSON report')
+    parser.add_argument('train_args', nargs=argparse.REMAINDER, help='Arguments for src/train.py, after --')
+    args = parser.parse_args()
+    train_args = args.train_args[1:] if args.train_args[:1] == ['--'] else args.train_args
+
+    if not args.scaling:
+        sys.exit(launch(args.nproc, train_args, args.nnodes, args.node_rank, args.master_addr, args.master_port))
+
+    results = scaling_report(sorted(args.scaling), train_args, args.master_port)
+    print(f"\n{'procs':>6}{'samples/s':>12}{'speedup':>9}{'efficiency':>12}{'marginal':>10}")
+    for row in results:
+        print(f"{row['processes']:>6}{row['samples_per_sec']:>12}{row['speedup']:>9}{row['efficiency']:>12}"
+              f"{row.get('marginal_efficiency', ''):>10}")
+    out = Path(args.output)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump({'cpus': os.cpu_count(), 'train_args': train_args, 'results': results}, f, indent=2)
+    print(f"\nScaling report written to {out}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Migrate station_logs from the v1 layout to the compact v2 layout.
+
+Usage:
+  PYTHONPATH="." python scripts/migrate_station_logs_v2.py            # migrates Config.DB_URL
+  PYTHONPATH="." python scripts/migrate_station_logs_v2.py --db data/other.db --keep-old
+
+v1: rowid table, TEXT timestamps, latitude/longitude/total_ports repeated on every row.
+v2: WITHOUT ROWID table clustered on (station_id, ts_epoch) holding only
+    available_ports and is_operational; static attributes live in `stations`.
+
+Steps:
+- Rebuild `stations` with its primary key (pandas may have replaced it without one)
+- Fill missing station latitude/longitude/total_ports from each station's newest log row
+- Copy logs into the v2 table in clustering-key order, converting timestamps to epoch seconds
+- Build station_log_heads, set PRAGMA user_version = 2, drop the v1 table and VACUUM
+"""
+
+import argparse
+import os
+import time
+
+from src.config import Config
+from src.db import STATION_COLUMNS, create_v2_tables, schema_version
+
+
+def file_size(path):
+    return os.path.getsize(path) if os.path.exists(path) else 0
+
+
+def migrate(db_path, keep_old=False, vacuum=True):
+    import sqlite3
+
+    conn = sqlite3.connect(db_path)
+    if schema_version(conn) == 2:
+        print(f"{db_path} already uses the v2 layout; nothing to do.")
+        conn.close()
+        return
+
+    tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    if 'station_logs' not in tables:
+        print(f"{db_path} has no station_logs table; nothing to migrate.")
+        conn.close()
+        return
+
+    size_before = file_size(db_path)
+    t0 = time.time()
+    rows_before = conn.execute("SELECT COUNT(*) FROM station_logs").fetchone()[0]
+    print(f"Migrating {rows_before:,} rows in {db_path} ({size_before / 1e6:.1f} MB)...")
+
+    cur = conn.cursor()
+    cur.execute("BEGIN")
+
+    # 1. stations with a real primary key
+    old_cols = set()
+    if 'stations' in tables:
+        old_cols = {r[1] for r in conn.execute("PRAGMA table_info(stations)")}
+        cur.execute("ALTER TABLE stations RENAME TO stations_v1")
+    cur.execute("""
+    CREATE TABLE stations (
+        id INTEGER PRIMARY KEY,
+        name TEXT,
+        latitude REAL,
+        longitude REAL,
+        address TEXT,
+        type TEXT,
+        total_ports INTEGER
+    )
+    """)
+    if old_cols:
+        select = ", ".join(c if c in old_cols else "NULL" for c in STATION_COLUMNS)
+        cur.execute(f"INSERT OR REPLACE INTO stations ({', '.join(STATION_COLUMNS)}) SELECT {select} FROM stations_v1 WHERE id IS NOT NULL")
+        cur.execute("DROP TABLE stations_v1")
+
+    # 2. static attributes from the newest log row of each station
+    cur.execute("ALTER TABLE station_logs RENAME TO station_logs_v1")
+    cur.execute("""
+    INSERT INTO stations (id, latitude, longitude, total_ports)
+    SELECT l.station_id, l.latitude, l.longitude, l.total_ports
+    FROM station_logs_v1 l
+    WHERE l.rowid IN (SELECT MAX(rowid) FROM station_logs_v1 GROUP BY station_id)
+    ON CONFLICT(id) DO UPDATE SET
+        latitude = COALESCE(stations.latitude, excluded.latitude),
+        longitude = COALESCE(stations.longitude, excluded.longitude),
+        total_ports = COALESCE(stations.total_ports, excluded.total_ports)
+    """)
+
+    # 3. logs in clustering-key order
+    cur.execute("DROP INDEX IF EXISTS idx_station_logs_station_ts")
+    create_v2_tables(cur)
+    cur.execute("""
+    INSERT OR REPLACE INTO station_logs (station_id, ts_epoch, available_ports, is_operational)
+    SELECT station_id, ts, available_ports, is_operational FROM (
+        SELECT station_id,
+               CAST(strftime('%s', timestamp) AS INTEGER) AS ts,
+               COALESCE(available_ports, 0) AS available_ports,
+               COALESCE(is_operational, 1) AS is_operational,
+               rowid AS rid
+        FROM station_logs_v1
+        WHERE station_id IS NOT NULL AND timestamp IS NOT NULL
+    )
+    ORDER BY station_id, ts, rid
+    """)
+    cur.execute("""
+    INSERT OR REPLACE INTO station_log_heads (station_id, last_ts_epoch, version)
+    SELECT station_id, MAX(ts_epoch), 1 FROM station_logs GROUP BY station_id
+    """)
+
+    rows_after = conn.execute("SELECT COUNT(*) FROM station_logs").fetchone()[0]
+    if not keep_old:
+        cur.execute("DROP TABLE station_logs_v1")
+    conn.commit()
+
+    if vacuum:
+        conn.execute("VACUUM")
+    conn.close()
+
+    size_after = file_size(db_path)
+    print(f"Done in {time.time() - t0:.1f}s: {rows_after:,} rows "
+          f"({rows_before - rows_after:,} duplicate (station, second) rows merged).")
+    if keep_old:
+        print("Old rows kept in station_logs_v1; drop it and VACUUM once you are satisfied.")
+    else:
+        print(f"Size: {size_before / 1e6:.1f} MB -> {size_after / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Migrate station_logs to the compact v2 schema')
+    parser.add_argument('--db', type=str, help='SQLite file to migrate (defaults to Config.DB_URL)')
+    parser.add_argument('--keep-old', action='store_true', help='Keep the v1 rows in station_logs_v1')
+    parser.add_argument('--no-vacuum', action='store_true', help='Skip VACUUM after migrating')
+    args = parser.parse_args()
+
+    migrate(args.db or Config.DB_URL.replace("sqlite:///", ""), keep_old=args.keep_old, vacuum=not args.no_vacuum)
@@ -3,7 +3,7 @@ import sqlite3
 import pandas as pd
 from datetime import datetime, timedelta
 import random
-from src.db import get_connection, init_db
+from src.db import init_db, save_records
 from src.config import Config
 
 # Initialize DB
@@ -11,7 +11,6 @@ init_db()
 
 # Generate sample data for training
 print("Generating sample training data...")
-conn = get_connection()
 records = []
 
 # Create 100 data points across different stations and times
@@ -29,7 +28,5 @@ for station_id in range(1, 6):  # 5 stations
             'is_operational': 1
         })
 
-df = pd.DataFrame(records)
-df.to_sql('station_logs', conn, if_exists='append', index=False)
-conn.close()
-print(f"✓ Generated {len(df)} sample records")
+save_records(records)
+print(f"✓ Generated {len(records)} sample records")
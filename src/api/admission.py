@@ -0,0 +1,76 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from src import metrics
+
+
+class Overloaded(Exception):
+    """Raised by AdmissionController.admit() when a request is shed; reason is queue_full or queue_timeout."""
+
+    def __init__(self, pool, reason):
+        super().__init__(f"{pool} is saturated ({reason})")
+        self.pool = pool
+        self.reason = reason
+
+
+class AdmissionController:
+    """
+    Admission control for one kind of expensive request, per worker process.
+
+    At most `max_inflight` requests run at once. Up to `max_queue` more wait for a
+    slot, each for at most `queue_timeout` seconds; a request arriving to a full
+    queue, or still waiting when its time is up, raises Overloaded at once instead
+    of queueing behind work it cannot finish in time. Admitted requests therefore
+    wait no longer than queue_timeout, however large the spike.
+    """
+
+    def __init__(self, name, max_inflight, max_queue, queue_timeout):
+        self.name = name
+        self.max_inflight = max_inflight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.inflight = 0
+        self.waiting = 0
+        self._slots = None
+
+    @asynccontextmanager
+    async def admit(self):
+        if self._slots is None:
+            # Created on first use so it binds to the worker's event loop (see src/api/prefork.py)
+            self._slots = asyncio.Semaphore(self.max_inflight)
+        if self._slots.locked() or self.waiting:
+            if self.waiting >= self.max_queue:
+                self._shed('queue_full')
+            self.waiting += 1
+            self._report()
+            start = time.perf_counter()
+            timed_out = False
+            try:
+                await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            except asyncio.TimeoutError:
+                timed_out = True
+            finally:
+                self.waiting -= 1
+                metrics.ADMISSION_WAIT.observe(time.perf_counter() - start, pool=self.name)
+                self._report()
+            if timed_out:
+                self._shed('queue_timeout')
+        else:
+            await self._slots.acquire()
+        self.inflight += 1
+        self._report()
+        try:
+            yield
+        finally:
+            self.inflight -= 1
+            self._slots.release()
+            self._report()
+
+    def _shed(self, reason):
+        self._report()
+        raise Overloaded(self.name, reason)
+
+    def _report(self):
+        metrics.ADMISSION_INFLIGHT.set(self.inflight, pool=self.name)
+        metrics.ADMISSION_QUEUED.set(self.waiting, pool=self.name)
@@ -0,0 +1,63 @@
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from src.config import Config
+
+
+class BoundedExecutor:
+    """
+    Thread pool for blocking work called from async handlers.
+
+    At most `max_workers` calls run at once and at most `max_pending` more wait for a
+    thread; callers beyond that await a semaphore on the event loop, which costs no
+    thread. Unlike Starlette's shared threadpool, a burst of slow DB reads cannot
+    starve model inference, or the other way round.
+    """
+
+    def __init__(self, name, max_workers, max_pending=None):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_pending = max_pending if max_pending is not None else max_workers * 4
+        self._pool = None
+        self._slots = None
+
+    async def run(self, fn, *args, **kwargs):
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=self.name)
+            self._slots = asyncio.Semaphore(self.max_workers + self.max_pending)
+        async with self._slots:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._pool, functools.partial(fn, *args, **kwargs))
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+            self._slots = None
+
+
+# SQLite I/O and pandas work on query results
+db_executor = BoundedExecutor("db", Config.DB_THREADS)
+# CPU-bound preprocessing and model forward passes
+model_executor = BoundedExecutor("inference", Config.INFERENCE_THREADS)
+# DB reads for the cheap routes, so they never queue behind /predict's DB work
+light_db_executor = BoundedExecutor("db-light", Config.LIGHT_DB_THREADS)
+
+
+async def run_db(fn, *args, **kwargs):
+    return await db_executor.run(fn, *args, **kwargs)
+
+
+async def run_light_db(fn, *args, **kwargs):
+    return await light_db_executor.run(fn, *args, **kwargs)
+
+
+async def run_model(fn, *args, **kwargs):
+    return await model_executor.run(fn, *args, **kwargs)
+
+
+def shutdown():
+    db_executor.shutdown()
+    model_executor.shutdown()
+    light_db_executor.shutdown()
@@ -1,15 +1,26 @@
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, StreamingResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
-from typing import List
+from typing import List, Optional
 import datetime
 import os
+import time
 
-from src.db import load_history, get_stations, get_station
-from src.api.utils import load_inference_artifacts, format_prediction_input, build_maps_directions_url
+from src.db import init_db, load_recent_history, get_station, get_forecast, save_forecasts, to_epoch_seconds
+from src.api.utils import (load_inference_artifacts, prediction_features, build_maps_directions_url,
+                           get_model_version, denormalize_ports)
+from src.api.streaming import PredictionBroadcaster
+from src.api.admission import AdmissionController, Overloaded
+from src.api.executors import run_db, run_light_db, run_model
+from src.api.responses import CachedBody, json_response
+from src.api.station_cache import StationCache
+from src.api import executors
+from src.streaming_inference import StatefulPredictor
+from src.inference import InferenceRuntime, serving_threads
 from src.config import Config
+from src import metrics, rollups
 
 app = FastAPI(title="EV Charging Forecaster API", version="1.0")
 
@@ -24,17 +35,101 @@ app.add_middleware(
 
 # Global variables for model artifacts
 model = None
+# InferenceRuntime owning `model`; every windowed forward pass goes through runtime.predict
+runtime = None
 preprocessor = None
+model_version = None
+stateful_predictor = None
+# Station metadata for /stations, /predict and /navigate, reloaded when save_stations changes it
+station_cache = StationCache()
+# Bounds concurrent /predict work; the rest get a fast 503 (or, with DEGRADED_MODE, the last forecast served)
+predict_admission = AdmissionController("predict", Config.PREDICT_MAX_INFLIGHT, Config.PREDICT_QUEUE_DEPTH,
+                                        Config.PREDICT_QUEUE_TIMEOUT)
+# Last prediction this worker served per station, the first choice for degraded responses while /predict is shed
+last_predictions = {}
+# Shared-memory window of recent observations, set by the pre-fork server (src/api/prefork.py)
+observation_store = None
+
+class RequestMetricsMiddleware:
+    """
+    Request count and latency per route, as plain ASGI middleware: no extra task or
+    stream per request as with @app.middleware("http"). Latency runs to the response
+    start, so a long-lived SSE stream counts only until its headers are sent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        recorded = False
+
+        def record(status):
+            nonlocal recorded
+            recorded = True
+            route = route_template(scope)
+            metrics.HTTP_REQUESTS.inc(route=route, method=scope['method'], status=status)
+            metrics.HTTP_LATENCY.observe(time.perf_counter() - start, route=route, method=scope['method'])
+
+        async def send_with_metrics(message):
+            if message['type'] == 'http.response.start' and not recorded:
+                record(message['status'])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_metrics)
+        except Exception:
+            if not recorded:
+                record(500)
+            raise
+
+app.add_middleware(RequestMetricsMiddleware)
+
+def route_template(scope):
+    """
+    Label requests by route pattern (/predict/{station_id}) so metric cardinality stays bounded.
+    The router stores the matched APIRoute in the scope; other matched routes (the docs) have a fixed path.
+    """
+    route = scope.get('route')
+    if route is not None:
+        return route.path
+    return scope['path'] if 'endpoint' in scope else "unmatched"
 
 @app.on_event("startup")
 async def startup_event():
-    global model, preprocessor
+    # Creates table_versions on databases from before the station cache
+    await run_db(init_db)
+    # Pre-forked workers inherit artifacts already loaded by the parent
+    if model is None:
+        load_artifacts()
+    broadcaster.start()
+
+def load_artifacts(threads=None):
+    """Load the model and scaler; threads pins torch's intra-op pool (default: serving_threads())."""
+    global model, runtime, preprocessor, model_version, stateful_predictor
     try:
         model, preprocessor = load_inference_artifacts()
+        runtime = InferenceRuntime(model, threads=threads or serving_threads(),
+                                   interop_threads=Config.INFERENCE_INTEROP_THREADS)
+        model_version = get_model_version()
+        if Config.STATEFUL_INFERENCE and not model.recurrent:
+            print(f"STATEFUL_INFERENCE needs a recurrent MODEL_ARCH (lstm, gru); serving {type(model).__name__} windowed")
+        elif Config.STATEFUL_INFERENCE:
+            stateful_predictor = StatefulPredictor(model, preprocessor)
+        metrics.MODEL_INFO.clear()
+        metrics.MODEL_INFO.set(1, version=model_version)
         print("Model and artifacts loaded successfully.")
     except Exception as e:
         print(f"Warning: Could not load model. Ensure training is done. Error: {e}")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    await broadcaster.stop()
+    executors.shutdown()
+
 class PredictionResponse(BaseModel):
     station_id: int
     station_name: str
@@ -50,9 +145,14 @@ class PredictionResponse(BaseModel):
     navigation_available: bool
 
 @app.get("/", tags=["Health"])
-def health_check():
+async def health_check():
     return {"status": "active", "system": "EV Forecasting System"}
 
+@app.get("/metrics", tags=["Health"])
+async def get_metrics():
+    """Prometheus text exposition of request, prediction-stage, DB and cache metrics."""
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
 @app.get("/dashboard", tags=["UI"])
 async def get_dashboard():
     """Serve the dashboard HTML UI"""
@@ -63,57 +163,215 @@ async def get_dashboard():
         raise HTTPException(status_code=404, detail="Dashboard not found")
 
 
+async def station_snapshot():
+    return station_cache.fresh() or await run_light_db(station_cache.refresh)
+
+async def lookup_station(station_id):
+    """Station metadata from the cache, or from the database for a station added since the last reload."""
+    station = (await station_snapshot()).by_id.get(station_id)
+    return station if station is not None else await run_light_db(get_station, station_id)
+
 @app.get("/stations", tags=["Stations"])
-def list_stations():
-    return get_stations()
+async def list_stations(request: Request,
+                        fields: Optional[str] = Query(None, description="Comma-separated columns to return, e.g. id,name,total_ports"),
+                        offset: int = Query(0, ge=0),
+                        limit: Optional[int] = Query(None, ge=1)):
+    """
+    Station metadata ordered by id, served from memory. Responses carry an ETag and
+    Last-Modified, so revalidation with If-None-Match / If-Modified-Since gets an empty
+    304 until the stations change; X-Total-Count is the number of stations before paging.
+    """
+    snapshot = await station_snapshot()
+    projection = None
+    if fields:
+        projection = tuple(field.strip() for field in fields.split(',') if field.strip())
+        unknown = [field for field in projection if snapshot.columns and field not in snapshot.columns]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}; choose from {snapshot.columns}")
+    body = snapshot.body(projection, offset, limit)
+    return json_response(request, body, headers={"X-Total-Count": str(len(snapshot.stations))},
+                         cache_control="no-cache")
 
 
 @app.get("/stations/{station_id}/navigate", tags=["Stations"])
-def navigate_station(station_id: int, mode: str = Query("driving")):
-    station = get_station(station_id)
+async def navigate_station(station_id: int, mode: str = Query("driving")):
+    station = await lookup_station(station_id)
     if not station:
         raise HTTPException(status_code=404, detail="Station not found")
     url = build_maps_directions_url(station['latitude'], station['longitude'], travel_mode=mode)
     return {"station_id": station_id, "maps_url": url}
 
+@app.get("/stations/{station_id}/history", tags=["Stations"])
+async def station_history(request: Request,
+                          station_id: int,
+                          start: Optional[str] = Query(None, alias="from"),
+                          end: Optional[str] = Query(None, alias="to"),
+                          resolution: str = Query("auto")):
+    """
+    Availability history as min/mean/max ports and operational ratio per bucket. `from`/`to`
+    are dates or ISO times (UTC unless they carry an offset). `resolution`
+    is auto (about HISTORY_MAX_POINTS buckets), raw, hour, day or a step such as 15m or 6h;
+    the coarsest rollup table fine enough for it is read.
+    """
+    try:
+        history = await run_db(rollups.station_history, station_id, start, end, resolution)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if history is None:
+        raise HTTPException(status_code=404, detail="Station not found")
+    return json_response(request, history)
+
 @app.get("/predict/{station_id}", response_model=PredictionResponse)
-def predict_availability(station_id: int):
-    global model, preprocessor
-    
+async def predict_availability(request: Request, station_id: int):
+    """
+    The X-Forecast-Source header says where the prediction came from: stored, model or stale (degraded).
+    The weak ETag covers everything but current_time, so If-None-Match gets a 304 until the forecast changes.
+    """
+    prediction, source = await resolve_prediction(station_id)
+    # Validated and serialized as response_model would, since the Response is returned as is
+    payload = PredictionResponse(**prediction).dict()
+    body = CachedBody(payload, validator={k: v for k, v in payload.items() if k != 'current_time'})
+    return json_response(request, body, headers={"X-Forecast-Source": source}, cache_control="no-cache")
+
+
+@app.get("/stream/predictions", tags=["Stream"])
+async def stream_predictions(request: Request):
+    """Server-Sent Events feed of predictions, pushed only for stations with new data."""
+    return StreamingResponse(
+        broadcaster.events(request),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def get_prediction(station_id):
+    """
+    Prediction for the stream broadcaster. Its background refresh is not admission
+    controlled, so a spike of /predict requests cannot drop stations from the stream;
+    the executors still bound how much of it runs at once.
+    """
+    return (await current_prediction(station_id))[0]
+
+
+async def resolve_prediction(station_id):
+    """
+    (prediction, source) under predict_admission. When it is saturated, answer 503
+    with Retry-After or, with DEGRADED_MODE, the last known forecast ("stale", see
+    stale_prediction) without running the model.
+    """
+    try:
+        async with predict_admission.admit():
+            prediction, source = await current_prediction(station_id)
+    except Overloaded as e:
+        previous = await stale_prediction(station_id) if Config.DEGRADED_MODE else None
+        if previous is not None:
+            metrics.SHED_REQUESTS.inc(pool=e.pool, reason=e.reason, outcome="stale_forecast")
+            return previous, "stale"
+        metrics.SHED_REQUESTS.inc(pool=e.pool, reason=e.reason, outcome="rejected")
+        raise HTTPException(status_code=503, detail=f"Prediction capacity saturated ({e.reason}); retry shortly",
+                            headers={"Retry-After": str(Config.SHED_RETRY_AFTER)})
+    last_predictions[station_id] = prediction
+    return prediction, source
+
+
+async def stale_prediction(station_id):
+    """
+    Last known forecast for a shed request: the prediction this worker last served for the
+    station, else its station_forecasts row whatever its age or model version (read on the
+    light DB pool, not the saturated one). current_time stays the time it was made. None if neither exists.
+    """
+    previous = last_predictions.get(station_id)
+    if previous is not None:
+        return previous
+    forecast = await run_light_db(get_forecast, station_id)
+    if forecast is None or forecast['id'] is None:
+        return None
+    return prediction_response(station_id, forecast, forecast['predicted_available_ports'],
+                               generated_at=datetime.datetime.fromtimestamp(forecast['scored_at']))
+
+
+async def current_prediction(station_id):
+    """
+    Serve the stored forecast from station_forecasts (one primary-key read) while it is
+    current: same model version and no newer log rows ("stored"). Otherwise compute on
+    demand ("model").
+    """
+    forecast = await run_db(get_forecast, station_id) if model_version else None
+    if (forecast is not None and forecast['id'] is not None
+            and forecast['model_version'] == model_version
+            and (forecast['latest_ts_epoch'] or 0) <= forecast['input_ts_epoch']):
+        metrics.CACHE_REQUESTS.inc(cache="station_forecasts", result="hit")
+        return prediction_response(station_id, forecast, forecast['predicted_available_ports']), "stored"
+    metrics.CACHE_REQUESTS.inc(cache="station_forecasts", result="miss")
+    return await compute_prediction(station_id), "model"
+
+
+async def compute_prediction(station_id):
+    """
+    Run the model for one station and store the result as its forecast.
+    DB work runs on the DB executor and inference on the model executor, so the
+    event loop never blocks.
+    """
     if model is None:
         raise HTTPException(status_code=503, detail="Model not loaded. Train model first.")
     
     # Get station metadata
-    station = get_station(station_id)
+    station = await lookup_station(station_id)
     if not station:
         raise HTTPException(status_code=404, detail=f"Station {station_id} not found")
     
-    # 1. Fetch recent history for this station
-    df = load_history(station_id=station_id)
+    # 1. Fetch the last SEQ_LENGTH records for this station
+    with metrics.PREDICT_STAGE_LATENCY.time(stage="history_fetch"):
+        recent_data = observation_store.read(station_id) if observation_store is not None else None
+        if recent_data is None:
+            recent_data = await run_db(load_recent_history, [station_id], Config.SEQ_LENGTH)
     
     # We need at least SEQ_LENGTH records
-    if len(df) < Config.SEQ_LENGTH:
+    if len(recent_data) < Config.SEQ_LENGTH:
         raise HTTPException(status_code=400, detail=f"Insufficient historical data for Station {station_id}. Need {Config.SEQ_LENGTH} records.")
     
-    # Take the last SEQ_LENGTH records
-    recent_data = df.tail(Config.SEQ_LENGTH).copy()
-    
-    # 2. Preprocess
-    input_tensor = format_prediction_input(recent_data.to_dict('records'), preprocessor)
-    
-    # 3. Inference
-    prediction_norm = model(input_tensor).item()
-    
-    # 4. Inverse Transform (Denormalize)
-    # Manual denormalization for efficiency/simplicity
-    avail_min = preprocessor.scaler.data_min_[0]
-    avail_max = preprocessor.scaler.data_max_[0]
-    
-    predicted_ports = prediction_norm * (avail_max - avail_min) + avail_min
-    predicted_ports = max(0, round(predicted_ports)) # Clip to 0
+    # 2-4. Preprocess, run the model and denormalize
+    predicted_ports = await run_model(run_inference, station_id, recent_data)
+
+    if model_version:
+        # Write through so the next request for this station is a table read
+        await run_db(store_forecast, station_id, recent_data, predicted_ports, model_version)
+
+    return prediction_response(station_id, station, predicted_ports)
+
+
+def store_forecast(station_id, recent_data, predicted_ports, version):
+    save_forecasts([{
+        'station_id': station_id,
+        'predicted_available_ports': predicted_ports,
+        'input_ts_epoch': int(to_epoch_seconds(recent_data['timestamp']).iloc[-1]),
+        'model_version': version,
+        'scored_at': int(time.time()),
+    }])
+
+
+def run_inference(station_id, recent_data):
+    """Predicted port count for the row after recent_data (blocking; runs on the model executor)."""
+    if stateful_predictor is not None:
+        # Advance the station's carried LSTM state by the rows it has not seen yet
+        with metrics.PREDICT_STAGE_LATENCY.time(stage="stateful_step"):
+            prediction_norm = stateful_predictor.predict(station_id, recent_data)
+    else:
+        with metrics.PREDICT_STAGE_LATENCY.time(stage="transform"):
+            features = prediction_features(recent_data.to_dict('records'), preprocessor)
+        
+        with metrics.PREDICT_STAGE_LATENCY.time(stage="forward"):
+            prediction_norm = runtime.predict(features)[0]
     
+    # Inverse Transform (Denormalize)
+    with metrics.PREDICT_STAGE_LATENCY.time(stage="denormalize"):
+        return float(denormalize_ports(prediction_norm, preprocessor))
+
+
+def prediction_response(station_id, station, predicted_ports, generated_at=None):
+    """Build the /predict payload from station metadata and a predicted port count (made at generated_at, default now)."""
     # Calculate availability percentage
-    total_ports = station.get('total_ports', 10)  # Default to 10 if not specified
+    total_ports = station.get('total_ports') or 10  # Default to 10 if not specified
     availability_percentage = (predicted_ports / total_ports) * 100 if total_ports > 0 else 0
     
     # Determine status and navigation availability
@@ -123,15 +381,18 @@ def predict_availability(station_id: int):
     
     return {
         "station_id": station_id,
-        "station_name": station.get('name', f"Station {station_id}"),
-        "station_type": station.get('type', 'unknown'),
+        "station_name": station.get('name') or f"Station {station_id}",
+        "station_type": station.get('type') or 'unknown',
         "total_ports": total_ports,
-        "address": station.get('address', ''),
-        "latitude": station.get('latitude', 0.0),
-        "longitude": station.get('longitude', 0.0),
-        "current_time": datetime.datetime.now(),
+        "address": station.get('address') or '',
+        "latitude": station.get('latitude') or 0.0,
+        "longitude": station.get('longitude') or 0.0,
+        "current_time": generated_at or datetime.datetime.now(),
         "predicted_available_ports": predicted_ports,
         "availability_percentage": round(availability_percentage, 1),
         "status": status,
         "navigation_available": navigation_available
-    }
\ No newline at end of file
+    }
+
+
+broadcaster = PredictionBroadcaster(get_prediction)
\ No newline at end of file
@@ -0,0 +1,127 @@
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from src.config import Config
+from src.db import HISTORY_COLUMNS, get_log_markers, load_recent_history, to_epoch_seconds
+
+# Per-observation fields kept in the store (timestamps as epoch seconds)
+FIELDS = ['ts_epoch', 'latitude', 'longitude', 'total_ports', 'available_ports', 'is_operational']
+
+
+class ObservationStore:
+    """
+    The last SEQ_LENGTH observations of every station in one shared memory block.
+
+    Created in the pre-fork parent (src/api/prefork.py) and inherited by every worker,
+    so /predict can build its input window without touching SQLite. A single writer
+    process calls refresh(); each slot carries a version counter that is odd while
+    the slot is being written, and readers retry until they see the same even version
+    before and after copying (a seqlock), so no lock is shared between processes.
+
+    Layout: header[0] = slots in use; then per slot a version, a station id, a row
+    count and a (seq_length, len(FIELDS)) float64 block, oldest row first.
+    """
+
+    def __init__(self, capacity, seq_length=None):
+        self.capacity = capacity
+        self.seq_length = seq_length or Config.SEQ_LENGTH
+        sizes = [8, capacity * 8, capacity * 8, capacity * 8, capacity * self.seq_length * len(FIELDS) * 8]
+        self._shm = shared_memory.SharedMemory(create=True, size=sum(sizes))
+        buf, offset = self._shm.buf, 0
+        arrays = []
+        for size, shape, dtype in zip(sizes, [(1,), (capacity,), (capacity,), (capacity,),
+                                              (capacity, self.seq_length, len(FIELDS))],
+                                      [np.int64, np.int64, np.int64, np.int64, np.float64]):
+            arrays.append(np.ndarray(shape, dtype=dtype, buffer=buf, offset=offset))
+            offset += size
+        self.header, self.versions, self.station_ids, self.counts, self.rows = arrays
+        self.header[:] = 0
+        self.versions[:] = 0
+        self.station_ids[:] = -1
+        self._slots = {}        # station_id -> slot; per-process cache of station_ids
+        self._markers = {}      # writer only: station_id -> change marker last loaded
+
+    def _slot(self, station_id, create=False):
+        slot = self._slots.get(station_id)
+        if slot is None:
+            # Slots are assigned by the writer after fork; rescan the shared ids
+            used = int(self.header[0])
+            found = np.flatnonzero(self.station_ids[:used] == station_id)
+            if len(found):
+                slot = int(found[0])
+            elif create and used < self.capacity:
+                slot = used
+                self.station_ids[slot] = station_id
+                self.header[0] = used + 1
+            else:
+                return None
+            self._slots[station_id] = slot
+        return slot
+
+    def write(self, station_id, rows):
+        """Store a station's latest rows (a DataFrame with HISTORY_COLUMNS, oldest first)."""
+        slot = self._slot(int(station_id), create=True)
+        if slot is None:
+            return False
+        rows = rows.tail(self.seq_length)
+        values = rows.assign(ts_epoch=to_epoch_seconds(rows['timestamp']))[FIELDS].to_numpy(dtype=np.float64)
+        self.versions[slot] += 1
+        self.rows[slot, :len(values)] = values
+        self.counts[slot] = len(values)
+        self.versions[slot] += 1
+        return True
+
+    def read(self, station_id):
+        """The station's latest rows as a load_history-style DataFrame, or None if not stored."""
+        slot = self._slot(int(station_id))
+        if slot is None:
+            return None
+        while True:
+            before = int(self.versions[slot])
+            if before % 2:
+                continue
+            count = int(self.counts[slot])
+            values = self.rows[slot, :count].copy()
+            if int(self.versions[slot]) == before:
+                break
+        if count == 0:
+            return None
+        df = pd.DataFrame(values, columns=FIELDS)
+        df['station_id'] = int(station_id)
+        df['timestamp'] = pd.to_datetime(df.pop('ts_epoch').astype(np.int64), unit='s')
+        for col in ('total_ports', 'available_ports', 'is_operational'):
+            # Missing values (e.g. total_ports of a station with no stations row) stay NaN floats,
+            # as load_recent_history returns them
+            if not df[col].isna().any():
+                df[col] = df[col].astype(np.int64)
+        return df[HISTORY_COLUMNS]
+
+    def refresh(self):
+        """Load the latest rows of stations with new data. Call from a single writer process."""
+        markers = get_log_markers()
+        changed = [sid for sid, marker in markers.items() if self._markers.get(sid) != marker]
+        if changed:
+            recent = load_recent_history(changed, self.seq_length)
+            for sid, rows in recent.groupby('station_id', sort=False):
+                self.write(sid, rows)
+        self._markers = markers
+        return len(changed)
+
+    def run_refresher(self, interval=None):
+        """Writer loop for the dedicated refresher process."""
+        interval = interval or Config.STREAM_POLL_INTERVAL
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Warning: observation store refresh failed: {e}")
+            time.sleep(interval)
+
+    def close(self, unlink=False):
+        self.header = self.versions = self.station_ids = self.counts = self.rows = None
+        self._shm.close()
+        if unlink:
+            self._shm.unlink()
@@ -0,0 +1,168 @@
+"""
+Pre-fork multi-worker server.
+
+`uvicorn --workers N` starts N fresh interpreters that each import torch and run
+startup_event, so every worker holds its own copy of the model and scaler and
+pays its own cold start. This server instead loads the artifacts once, moves the
+model parameters into shared memory (requires_grad off, Tensor.share_memory_();
+weights memory-mapped from a checkpoint bundle are already shared and stay mapped)
+and freezes the garbage collector's view of the loaded objects (gc.freeze), so
+forked workers read the same pages rather than copy-on-write duplicates. Workers
+are then plain os.fork() calls of a warm process and start immediately.
+
+The parent also fills an ObservationStore (src/api/observation_store.py) with
+each station's last SEQ_LENGTH rows. A dedicated refresher process keeps it up
+to date, and /predict in every worker reads its input window from it instead of
+querying SQLite.
+
+  PYTHONPATH="." python -m src.api.prefork --workers 4 --port 8000
+
+The parent only supervises: it restarts workers that exit and stops all of them
+on SIGINT/SIGTERM. Each worker keeps its own /metrics registry and SSE broadcaster,
+and its own stateful LSTM state when STATEFUL_INFERENCE is on.
+"""
+
+import argparse
+import gc
+import itertools
+import os
+import signal
+import socket
+
+import uvicorn
+
+from src.config import Config
+from src.inference import pin_threads, serving_threads
+
+
+def freeze_model(model):
+    """
+    Make parameters read-only and back them with shared memory so forks never copy them.
+    Tensors memory-mapped from a checkpoint bundle already share the page cache and are left in place.
+    """
+    mapped = getattr(model, 'mapped_storages', set())
+    for param in model.parameters():
+        param.requires_grad_(False)
+    for tensor in itertools.chain(model.parameters(), model.buffers()):
+        if tensor.untyped_storage().data_ptr() not in mapped:
+            tensor.share_memory_()
+    return model
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock, log_level):
+    from src.api import main
+    config = uvicorn.Config(main.app, log_level=log_level, timeout_keep_alive=30)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def serve(host="0.0.0.0", port=8000, workers=2, use_store=True, store_capacity=None, log_level="info"):
+    # Size each worker's thread pools before torch does any parallel work: forking after
+    # OpenMP threads exist is unsafe, so the parent never runs inference itself
+    threads = serving_threads(workers)
+    pin_threads(threads, Config.INFERENCE_INTEROP_THREADS)
+
+    from src.db import init_db, get_log_markers
+    from src.api import main
+    from src.api.observation_store import ObservationStore
+
+    init_db()
+    main.load_artifacts(threads=threads)
+    if main.model is not None:
+        freeze_model(main.model)
+
+    store = None
+    if use_store:
+        capacity = store_capacity or max(64, int(len(get_log_markers()) * 1.5))
+        store = ObservationStore(capacity)
+        print(f"Observation store: {store.refresh()} stations loaded, capacity {capacity}")
+        main.observation_store = store
+
+    gc.collect()
+    gc.freeze()
+    sock = bind_socket(host, port)
+
+    children = {}
+
+    def spawn(kind):
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            code = 0
+            try:
+                if kind == "refresher":
+                    store.run_refresher()
+                else:
+                    run_worker(sock, log_level)
+            except BaseException as e:
+                print(f"{kind} {os.getpid()} exiting: {e!r}")
+                code = 1
+            finally:
+                os._exit(code)
+        children[pid] = kind
+
+    def stop(signum, frame):
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    stopping = False
+    try:
+        if store is not None:
+            spawn("refresher")
+        for _ in range(workers):
+            spawn("worker")
+        print(f"Serving on http://{host}:{port} with {workers} pre-forked workers (parent pid {os.getpid()})")
+        while True:
+            pid, status = os.wait()
+            kind = children.pop(pid, None)
+            if kind is not None:
+                print(f"{kind} {pid} exited (status {status}); restarting")
+                spawn(kind)
+    except (KeyboardInterrupt, SystemExit):
+        stopping = True
+    finally:
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        for pid in list(children):
+            try:
+                os.waitpid(pid, 0)
+            except ChildProcessError:
+                pass
+        sock.close()
+        if store is not None:
+            store.close(unlink=True)
+        if stopping:
+            print("Stopped all workers.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Serve the API from pre-forked workers sharing one loaded model')
+    parser.add_argument('--host', type=str, default="0.0.0.0")
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Worker processes')
+    parser.add_argument('--no-observation-store', action='store_true',
+                        help='Read input windows from SQLite instead of the shared observation store')
+    parser.add_argument('--store-capacity', type=int, help='Station slots in the observation store')
+    parser.add_argument('--log-level', type=str, default="info")
+    args = parser.parse_args()
+
+    serve(
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        use_store=not args.no_observation_store,
+        store_capacity=args.store_capacity,
+        log_level=args.log_level,
+    )
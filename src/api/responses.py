@@ -0,0 +1,142 @@
+"""
+JSON responses with validators and compression for the larger API payloads.
+
+Bodies are serialized with orjson when it is installed (several times faster than
+the json module for lists of station dicts), otherwise with json. Bodies of at
+least COMPRESS_MIN_BYTES are brotli- (when the brotli package is installed) or
+gzip-compressed for clients that accept it. A CachedBody keeps its serialized
+and compressed forms, so an unchanged /stations payload is encoded once rather
+than on every request, and carries a weak ETag for If-None-Match revalidation.
+"""
+
+import datetime
+import email.utils
+import gzip
+import hashlib
+import json
+
+from fastapi import Request, Response
+
+from src.config import Config
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if hasattr(value, 'tolist'):  # numpy scalars and arrays
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    """Compact JSON bytes; datetimes as ISO 8601 and numpy values as Python numbers."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_default, separators=(',', ':')).encode()
+
+
+def accepted_encoding(request):
+    """'br', 'gzip' or None for the request's Accept-Encoding (entries with q=0 are refused)."""
+    accepted = set()
+    for part in request.headers.get('accept-encoding', '').split(','):
+        name, *params = [item.strip() for item in part.split(';')]
+        q = 1.0
+        for param in params:
+            key, _, value = param.partition('=')
+            if key.strip() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        if name and q > 0:
+            accepted.add(name.lower())
+    if brotli is not None and ('br' in accepted or '*' in accepted):
+        return 'br'
+    if 'gzip' in accepted or '*' in accepted:
+        return 'gzip'
+    return None
+
+
+def compress(body, encoding):
+    if encoding == 'br':
+        return brotli.compress(body, quality=5)
+    return gzip.compress(body, compresslevel=6)
+
+
+class CachedBody:
+    """
+    A serialized JSON payload with its weak ETag and compressed variants, built on first use.
+    The ETag hashes the body, or `validator` when given (e.g. the payload without a per-request timestamp).
+    """
+
+    def __init__(self, payload, last_modified=None, validator=None):
+        self.body = dumps(payload)
+        tag_source = self.body if validator is None else dumps(validator)
+        self.etag = 'W/"' + hashlib.blake2b(tag_source, digest_size=8).hexdigest() + '"'
+        self.last_modified = last_modified
+        self._encoded = {}
+
+    def encoded(self, encoding):
+        if encoding not in self._encoded:
+            self._encoded[encoding] = compress(self.body, encoding)
+        return self._encoded[encoding]
+
+
+def _etag_matches(if_none_match, etag):
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    return any(tag.strip().removeprefix('W/') == opaque for tag in if_none_match.split(','))
+
+
+def not_modified(request, etag=None, last_modified=None):
+    """True when the request's If-None-Match (or, without one, If-Modified-Since) matches."""
+    if_none_match = request.headers.get('if-none-match')
+    if if_none_match is not None:
+        return etag is not None and _etag_matches(if_none_match, etag)
+    if_modified_since = request.headers.get('if-modified-since')
+    if if_modified_since and last_modified is not None:
+        try:
+            since = email.utils.parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(last_modified) <= since
+    return False
+
+
+def json_response(request: Request, payload, headers=None, cache_control=None):
+    """
+    JSON Response for payload (a dict/list or a CachedBody), compressed when large enough.
+    With a CachedBody, ETag and Last-Modified are set and a matching conditional
+    request gets an empty 304.
+    """
+    cached = payload if isinstance(payload, CachedBody) else None
+    body = cached.body if cached is not None else dumps(payload)
+    headers = dict(headers or {})
+    if cache_control:
+        headers['Cache-Control'] = cache_control
+    compressible = len(body) >= Config.COMPRESS_MIN_BYTES
+    if compressible:
+        headers['Vary'] = 'Accept-Encoding'
+    if cached is not None:
+        headers['ETag'] = cached.etag
+        if cached.last_modified:
+            headers['Last-Modified'] = email.utils.formatdate(cached.last_modified, usegmt=True)
+        if not_modified(request, cached.etag, cached.last_modified):
+            return Response(status_code=304, headers=headers)
+
+    encoding = accepted_encoding(request) if compressible else None
+    if encoding is not None:
+        body = cached.encoded(encoding) if cached is not None else compress(body, encoding)
+        headers['Content-Encoding'] = encoding
+    return Response(content=body, media_type='application/json', headers=headers)
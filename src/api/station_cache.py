@@ -0,0 +1,75 @@
+import threading
+import time
+
+from src import metrics
+from src.api.responses import CachedBody
+from src.config import Config
+from src.db import get_stations, get_table_version
+
+# Serialized /stations bodies kept per snapshot (one per fields/offset/limit combination)
+MAX_BODIES = 64
+
+
+class StationSnapshot:
+    """One version of the stations table: the rows, an id index and their serialized /stations bodies."""
+
+    def __init__(self, version, updated_at, stations):
+        self.version = version
+        self.updated_at = updated_at
+        self.stations = stations
+        self.by_id = {station['id']: station for station in stations}
+        self.columns = list(stations[0]) if stations else []
+        self._bodies = {}
+
+    def body(self, fields=None, offset=0, limit=None):
+        """CachedBody of the rows in [offset, offset + limit), keeping only `fields` when given."""
+        key = (fields, offset, limit)
+        cached = self._bodies.get(key)
+        if cached is None:
+            rows = self.stations[offset:None if limit is None else offset + limit]
+            if fields:
+                rows = [{field: station.get(field) for field in fields} for station in rows]
+            if len(self._bodies) >= MAX_BODIES:
+                self._bodies.clear()
+            cached = self._bodies[key] = CachedBody(rows, last_modified=self.updated_at or None)
+        return cached
+
+
+class StationCache:
+    """
+    In-memory copy of the stations table for the API.
+
+    save_stations bumps the table's counter in table_versions. The cache re-reads
+    that counter (one primary-key read) at most every STATION_CACHE_TTL seconds
+    and reloads the table only when it changed, so an update from the collector,
+    a seeding script or another API worker shows up within that interval.
+    """
+
+    def __init__(self, ttl=None):
+        self.ttl = Config.STATION_CACHE_TTL if ttl is None else ttl
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+
+    def fresh(self):
+        """The snapshot when it was validated within the TTL, else None (then call refresh())."""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._checked_at < self.ttl:
+            metrics.CACHE_REQUESTS.inc(cache="stations", result="hit")
+            return snapshot
+        return None
+
+    def refresh(self):
+        """Check the table version and reload the stations if it changed (blocking; runs on the DB executor)."""
+        with self._lock:
+            snapshot = self.fresh()
+            if snapshot is not None:
+                return snapshot
+            version, updated_at = get_table_version('stations')
+            if self._snapshot is None or self._snapshot.version != version:
+                self._snapshot = StationSnapshot(version, updated_at, get_stations())
+                metrics.CACHE_REQUESTS.inc(cache="stations", result="miss")
+            else:
+                metrics.CACHE_REQUESTS.inc(cache="stations", result="hit")
+            self._checked_at = time.monotonic()
+            return self._snapshot
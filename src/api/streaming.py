@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+
+from src.config import Config
+from src.metrics import CACHE_REQUESTS
+from src.db import get_latest_log_id, get_log_markers
+from src.api.executors import run_db
+
+
+class PredictionBroadcaster:
+    """
+    Pushes fresh predictions to every connected dashboard.
+
+    A single background task watches station_logs for new rows. When the collector
+    writes a batch, predictions are recomputed once for the stations that changed
+    and the encoded event is fanned out to all subscriber queues, so server work
+    follows the data change rate rather than the number of viewers.
+    """
+
+    def __init__(self, predict_fn, poll_interval=None, queue_size=256):
+        # Coroutine function: station_id -> prediction dict (raises HTTPException when unavailable)
+        self.predict_fn = predict_fn
+        self.poll_interval = poll_interval or Config.STREAM_POLL_INTERVAL
+        self.queue_size = queue_size
+        self.subscribers = set()
+        self.latest = {}        # station_id -> last encoded SSE event
+        self.markers = {}       # station_id -> latest log id already scored
+        self.last_log_id = None
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_event_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception as e:
+                print(f"Warning: prediction stream refresh failed: {e}")
+            await asyncio.sleep(self.poll_interval)
+
+    async def refresh(self):
+        """Recompute predictions for stations whose inputs changed and publish them."""
+        log_id = await run_db(get_latest_log_id)
+        if log_id == self.last_log_id:
+            return
+
+        markers = await run_db(get_log_markers)
+        changed = [sid for sid, marker in markers.items() if self.markers.get(sid) != marker]
+        # Stations whose inputs are unchanged keep their cached prediction
+        CACHE_REQUESTS.inc(len(markers) - len(changed), cache="stream_predictions", result="hit")
+        CACHE_REQUESTS.inc(len(changed), cache="stream_predictions", result="miss")
+        if changed:
+            events = await self._compute(changed)
+            for sid, event in events.items():
+                self.latest[sid] = event
+                self._publish(event)
+
+        self.markers = markers
+        self.last_log_id = log_id
+
+    async def _compute(self, station_ids):
+        async def one(sid):
+            try:
+                return sid, await self.predict_fn(sid)
+            except HTTPException:
+                # No model yet, unknown station or not enough history: nothing to push
+                return sid, None
+
+        # The executors behind predict_fn bound how many of these actually run at once
+        results = await asyncio.gather(*(one(sid) for sid in station_ids))
+        return {sid: encode_event("prediction", jsonable_encoder(prediction))
+                for sid, prediction in results if prediction is not None}
+
+    def _publish(self, event):
+        for queue in list(self.subscribers):
+            if queue.full():
+                # Slow consumer: drop its oldest pending update rather than block everyone
+                queue.get_nowait()
+            queue.put_nowait(event)
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+
+    async def events(self, request):
+        """Async generator of SSE frames for one client; ends when the client disconnects."""
+        queue = self.subscribe()
+        try:
+            yield f"retry: {int(self.poll_interval * 1000)}\n\n"
+            # Start every client from the last computed snapshot
+            for event in list(self.latest.values()):
+                yield event
+            while not await request.is_disconnected():
+                try:
+                    yield await asyncio.wait_for(queue.get(), timeout=Config.STREAM_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(queue)
+
+
+def encode_event(event, data):
+    """Format a Server-Sent Events frame."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
@@ -1,41 +1,104 @@
+import hashlib
+import os
 import torch
 import pandas as pd
 import numpy as np
+from src.checkpoint import bundle_path, load_bundle
 from src.config import Config
-from src.model import EVChargingLSTM
+from src.model import build_model
 from src.preprocessing import DataPreprocessor
 
+def model_file(path=None):
+    """The weights file inference reads: the checkpoint bundle next to path (default Config.MODEL_PATH) when one exists."""
+    path = path or Config.MODEL_PATH
+    bundle = bundle_path(path)
+    return bundle if os.path.exists(bundle) else path
+
+def load_model_bundle(path):
+    """
+    Model, scaler and hyperparameters from a .safetensors checkpoint bundle (see src/checkpoint.py).
+    The architecture and sizes come from the bundle; the weights stay memory-mapped (assign=True).
+    """
+    state, scaler, params = load_bundle(path)
+    if params.get('seq_length', Config.SEQ_LENGTH) != Config.SEQ_LENGTH:
+        raise ValueError(f"{path} was trained with SEQ_LENGTH={params['seq_length']}, not {Config.SEQ_LENGTH}")
+    if params['arch'] != Config.MODEL_ARCH.lower():
+        print(f"{path} holds a {params['arch']} model; using it instead of MODEL_ARCH={Config.MODEL_ARCH}")
+    model = build_model(
+        params['arch'],
+        hidden_dim=params['hidden_dim'],
+        num_layers=params['num_layers'],
+        station_emb_dim=params['station_emb_dim'],
+        num_stations=state['station_embedding.weight'].shape[0] if 'station_embedding.weight' in state else 1
+    )
+    model.load_state_dict(state, assign=True)
+    # Storages backed by the mapped file, which freeze_model (src/api/prefork.py) must not copy into shm
+    model.mapped_storages = {tensor.untyped_storage().data_ptr() for tensor in state.values()}
+    model.eval()
+    return model, scaler, params
+
 def load_inference_artifacts():
+    preprocessor = DataPreprocessor()
+    path = model_file()
+    if path.endswith('.safetensors'):
+        # Weights, scaler and hyperparameters in one memory-mapped file
+        model, preprocessor.scaler, _ = load_model_bundle(path)
+        preprocessor.load_vocab()
+    else:
+        model = _load_torch_checkpoint(preprocessor)
+    if preprocessor.vocab is not None and hasattr(model, 'station_embedding'):
+        # The vocabulary may have grown since these weights were saved
+        model.grow_station_embedding(len(preprocessor.vocab))
+    model.eval()
+    
+    return model, preprocessor
+
+def _load_torch_checkpoint(preprocessor):
+    """Older layout: pickled state dict in Config.MODEL_PATH and scaler in Config.SCALER_PATH, sized from Config."""
+    # Load Scaler (and the station vocabulary saved with it)
+    preprocessor.load()
+
     # Load Model
-    # Try to infer number of stations from DB to create correct embedding size
-    try:
-        from src.db import get_stations
-        stations = get_stations()
-        num_stations = max([s['id'] for s in stations]) + 1 if stations else 100
-    except Exception:
+    # Size the station embedding from the checkpoint itself; without one (older
+    # state dicts) fall back to the vocabulary, or 100 rows for raw-id models
+    state = torch.load(Config.MODEL_PATH, map_location=torch.device('cpu'))
+    if 'station_embedding.weight' in state:
+        num_stations = state['station_embedding.weight'].shape[0]
+    elif preprocessor.vocab is not None:
+        num_stations = len(preprocessor.vocab)
+    else:
         num_stations = 100
 
-    model = EVChargingLSTM(
+    model = build_model(
         hidden_dim=Config.HIDDEN_DIM,
         num_layers=Config.NUM_LAYERS,
         station_emb_dim=Config.STATION_EMBED_DIM,
         num_stations=num_stations
     )
     # Load with strict=False to allow loading older state dicts without station embedding weights
-    state = torch.load(Config.MODEL_PATH, map_location=torch.device('cpu'))
-    model.load_state_dict(state, strict=False)
-    model.eval()
-    
-    # Load Scaler
-    preprocessor = DataPreprocessor()
-    preprocessor.load()
-    
-    return model, preprocessor
+    result = model.load_state_dict(state, strict=False)
+    missing = [key for key in result.missing_keys if not key.startswith('station_embedding.')]
+    if missing or result.unexpected_keys:
+        raise ValueError(f"{Config.MODEL_PATH} was not trained with MODEL_ARCH={Config.MODEL_ARCH} "
+                         f"(missing {missing[:3]}, unexpected {result.unexpected_keys[:3]})")
+    return model
 
-def format_prediction_input(records, preprocessor):
+def get_model_version(path=None):
+    """Short content hash of the weights file inference reads, used to tag metrics and stored forecasts."""
+    path = path or model_file()
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()[:12]
+
+# Model input columns; station_id is last and is used as an embedding index
+FEATURE_COLUMNS = ['available_ports', 'total_ports', 'latitude', 'longitude', 'hour', 'day_of_week', 'station_id']
+
+def prediction_features(records, preprocessor):
     """
     Takes raw dictionary records (last 12 steps), processes them,
-    and returns tensor for model.
+    and returns the (seq_len, 7) float32 feature window for the model.
     """
     df = pd.DataFrame(records)
     df = preprocessor.transform(df)
@@ -45,11 +108,28 @@ def format_prediction_input(records, preprocessor):
     if 'station_id' not in df.columns:
         df = df.copy()
         df['station_id'] = 0
-    features = df[['available_ports', 'total_ports', 'latitude', 'longitude', 'hour', 'day_of_week', 'station_id']].values
-    
-    # Add batch dimension: (1, seq_len, features)
-    tensor_input = torch.tensor(features, dtype=torch.float32).unsqueeze(0)
-    return tensor_input
+    return df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+
+def format_prediction_input(records, preprocessor):
+    """prediction_features as a (1, seq_len, 7) tensor, for calling the model directly."""
+    return torch.from_numpy(prediction_features(records, preprocessor)).unsqueeze(0)
+
+def batch_features(history, preprocessor, seq_length):
+    """
+    Batch version of prediction_features for many stations at once.
+
+    history: exactly seq_length rows per station, grouped by station and oldest first
+    (as returned by load_recent_history). Returns a (n_stations, seq_length, 7) float32 array.
+    """
+    df = preprocessor.transform(history.copy())
+    features = df[FEATURE_COLUMNS].to_numpy(dtype=np.float32)
+    return features.reshape(-1, seq_length, len(FEATURE_COLUMNS))
+
+def denormalize_ports(prediction_norm, preprocessor):
+    """Map normalized model output back to a port count, rounded and clipped at 0 (works on arrays too)."""
+    avail_min = preprocessor.scaler.data_min_[0]
+    avail_max = preprocessor.scaler.data_max_[0]
+    return np.maximum(0, np.round(np.asarray(prediction_norm) * (avail_max - avail_min) + avail_min))
 
 
 def build_maps_directions_url(lat, lon, travel_mode='driving'):
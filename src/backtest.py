@@ -0,0 +1,352 @@
+"""
+Rolling-origin backtesting of the global, per-station and persistence models.
+
+The last `folds * fold_days` days of history are split into consecutive folds.
+Every row inside a fold (every `stride`-th row per station) is a forecast origin:
+the model sees the SEQ_LENGTH rows ending there and forecasts 1..`horizons`
+steps ahead recursively, feeding each predicted availability back into the
+window while the known features of later rows (ports, location, hour, day) are
+taken from the data. Errors are measured in ports, on the rounded and clipped
+value /predict would serve, and reported per model, fold, horizon, station and
+target hour.
+
+  PYTHONPATH="." python src/backtest.py --folds 4 --fold-days 7 --horizons 12 --workers 4
+
+History is loaded once and placed in shared memory; worker processes attach to
+it instead of receiving copies. Work is split into (fold, station block) tasks,
+and each worker keeps its models loaded across tasks and scores windows in
+large batches. Models are evaluated as saved: folds that overlap the training
+period are in-sample.
+"""
+
+import argparse
+import concurrent.futures
+import os
+import time
+from multiprocessing import shared_memory
+
+import joblib
+import numpy as np
+import pandas as pd
+import torch
+
+from src.checkpoint import bundle_path
+from src.config import Config
+from src.db import init_db, load_history, to_epoch_seconds
+from src.model import build_model
+
+# Raw feature columns kept in shared memory; the first four are MinMax-scaled per model
+RAW_COLUMNS = ['available_ports', 'total_ports', 'latitude', 'longitude', 'hour', 'day_of_week', 'station_idx']
+MODELS = ['global', 'per_station', 'persistence']
+
+
+class SharedArrays:
+    """A dict of NumPy arrays backed by shared memory blocks, attachable by name from other processes."""
+
+    def __init__(self, arrays=None, spec=None):
+        self.blocks = {}
+        self.arrays = {}
+        if arrays is not None:
+            for name, arr in arrays.items():
+                arr = np.ascontiguousarray(arr)
+                block = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+                view = np.ndarray(arr.shape, dtype=arr.dtype, buffer=block.buf)
+                view[...] = arr
+                self.blocks[name], self.arrays[name] = block, view
+        else:
+            for name, (block_name, shape, dtype) in spec.items():
+                block = shared_memory.SharedMemory(name=block_name)
+                self.blocks[name] = block
+                self.arrays[name] = np.ndarray(shape, dtype=dtype, buffer=block.buf)
+
+    @property
+    def spec(self):
+        return {name: (self.blocks[name].name, arr.shape, arr.dtype.str) for name, arr in self.arrays.items()}
+
+    def __getitem__(self, name):
+        return self.arrays[name]
+
+    def close(self, unlink=False):
+        self.arrays.clear()
+        for block in self.blocks.values():
+            block.close()
+            if unlink:
+                block.unlink()
+
+
+def prepare_history(df, vocab=None):
+    """Sort history by station and time and lay it out as flat arrays for SharedArrays."""
+    df = df.sort_values(['station_id', 'timestamp'], kind='stable').reset_index(drop=True)
+    ts = pd.to_datetime(df['timestamp'])
+    station_ids = df['station_id'].to_numpy(dtype=np.int64)
+    raw = pd.DataFrame({
+        'available_ports': df['available_ports'],
+        'total_ports': df['total_ports'],
+        'latitude': df['latitude'],
+        'longitude': df['longitude'],
+        'hour': ts.dt.hour,
+        'day_of_week': ts.dt.dayofweek,
+        'station_idx': vocab.map(station_ids) if vocab is not None else station_ids,
+    }).fillna(0).to_numpy(dtype=np.float32)
+
+    starts = np.flatnonzero(np.r_[True, station_ids[1:] != station_ids[:-1]])
+    lengths = np.diff(np.r_[starts, len(station_ids)])
+    station_pos = np.repeat(np.arange(len(starts)), lengths)
+    return {
+        'raw': raw,
+        'ts': to_epoch_seconds(ts).to_numpy(dtype=np.int64),
+        'station_id': station_ids,
+        'station_pos': station_pos,
+        # Position of each row within its station's series, and that series' length
+        'row_in_station': np.arange(len(station_ids)) - starts[station_pos],
+        'station_len': lengths[station_pos],
+        'stations': station_ids[starts],
+    }
+
+
+# --- worker side -------------------------------------------------------------
+
+_worker = {}
+
+
+def _init_worker(spec, settings):
+    torch.set_num_threads(settings['threads'])
+    _worker['data'] = SharedArrays(spec=spec)
+    _worker['settings'] = settings
+    _worker['per_station'] = {}
+    _worker['global'] = None
+    if 'global' in settings['models']:
+        from src.api.utils import load_inference_artifacts
+        model, preprocessor = load_inference_artifacts()
+        _worker['global'] = (model, preprocessor.scaler)
+
+
+def _load_station_model(sid):
+    """Per-station model and scaler from models/, or None when that station has none."""
+    if sid not in _worker['per_station']:
+        path = f"models/model_station_{sid}.pt"
+        scaler_path = f"models/scaler_station_{sid}.joblib"
+        entry = None
+        if os.path.exists(bundle_path(path)):
+            from src.api.utils import load_model_bundle
+            model, scaler, _ = load_model_bundle(bundle_path(path))
+            entry = (model, scaler)
+        elif os.path.exists(path) and os.path.exists(scaler_path):
+            model = build_model(
+                hidden_dim=Config.HIDDEN_DIM,
+                num_layers=Config.NUM_LAYERS,
+                station_emb_dim=0,
+                num_stations=1
+            )
+            model.load_state_dict(torch.load(path, map_location=torch.device('cpu')))
+            model.eval()
+            entry = (model, joblib.load(scaler_path))
+        _worker['per_station'][sid] = entry
+    return _worker['per_station'][sid]
+
+
+def _scale(rows, scaler, n_features):
+    """MinMax-scale the numeric columns of raw rows (..., 7) and keep the first n_features columns."""
+    out = rows[..., :n_features].copy()
+    out[..., :4] = out[..., :4] * scaler.scale_.astype(np.float32) + scaler.min_.astype(np.float32)
+    return out
+
+
+def _forecast(model, scaler, origins, n_features, horizons, batch_size):
+    """Recursive 1..horizons step forecasts (in ports) for windows ending at each origin row."""
+    raw = _worker['data']['raw']
+    seq_length = Config.SEQ_LENGTH
+    lo, span = scaler.data_min_[0], scaler.data_max_[0] - scaler.data_min_[0]
+    offsets = np.arange(-seq_length + 1, 1)
+    out = np.empty((len(origins), horizons), dtype=np.float32)
+
+    for start in range(0, len(origins), batch_size):
+        batch = origins[start:start + batch_size]
+        x = _scale(raw[batch[:, None] + offsets], scaler, n_features)
+        for h in range(horizons):
+            with torch.inference_mode():
+                p = model(torch.from_numpy(x)).squeeze(-1).numpy()
+            out[start:start + len(batch), h] = p
+            if h + 1 < horizons:
+                # Next row's known features, with the forecast in place of the observed availability
+                nxt = _scale(raw[batch + h + 1], scaler, n_features)
+                nxt[:, 0] = p
+                x = np.concatenate([x[:, 1:], nxt[:, None]], axis=1)
+    return np.maximum(0, np.round(out * span + lo))
+
+
+def _run_task(task):
+    """Score one (fold, station block); returns per (model, station, hour, horizon) error sums."""
+    data = _worker['data']
+    settings = _worker['settings']
+    horizons, seq_length = settings['horizons'], Config.SEQ_LENGTH
+
+    ts = data['ts']
+    rows = slice(task['row_lo'], task['row_hi'])
+    in_station = data['row_in_station'][rows]
+    mask = ((ts[rows] >= task['t_lo']) & (ts[rows] < task['t_hi'])
+            & (in_station >= seq_length - 1)
+            & (in_station + horizons < data['station_len'][rows])
+            & (in_station % settings['stride'] == 0))
+    origins = np.flatnonzero(mask) + task['row_lo']
+    if len(origins) == 0:
+        return None
+
+    actual = data['raw'][origins[:, None] + np.arange(1, horizons + 1), 0]
+    forecasts = []
+    if 'persistence' in settings['models']:
+        forecasts.append(('persistence', origins, np.repeat(data['raw'][origins, 0][:, None], horizons, axis=1)))
+    if _worker['global'] is not None:
+        model, scaler = _worker['global']
+        forecasts.append(('global', origins, _forecast(model, scaler, origins, 7, horizons, settings['batch_size'])))
+    if 'per_station' in settings['models']:
+        station_of = data['station_id'][origins]
+        for sid in np.unique(station_of):
+            entry = _load_station_model(int(sid))
+            if entry is None:
+                continue
+            sel = origins[station_of == sid]
+            forecasts.append(('per_station', sel, _forecast(entry[0], entry[1], sel, 6, horizons, settings['batch_size'])))
+
+    n_hz = horizons
+    frames = []
+    for name, sel, pred in forecasts:
+        idx = np.searchsorted(origins, sel)
+        err = pred - actual[idx]
+        pos = data['station_pos'][sel]
+        hours = data['raw'][sel[:, None] + np.arange(1, horizons + 1), 4].astype(np.int64)
+        key = ((pos[:, None] - task['pos_lo']) * 24 + hours) * n_hz + np.arange(n_hz)
+        n_bins = (task['pos_hi'] - task['pos_lo']) * 24 * n_hz
+        count = np.bincount(key.ravel(), minlength=n_bins)
+        abs_sum = np.bincount(key.ravel(), weights=np.abs(err).ravel(), minlength=n_bins)
+        sq_sum = np.bincount(key.ravel(), weights=(err.astype(np.float64) ** 2).ravel(), minlength=n_bins)
+        nz = np.flatnonzero(count)
+        frames.append(pd.DataFrame({
+            'model': name,
+            'fold': task['fold'],
+            'station_id': data['stations'][task['pos_lo'] + nz // (24 * n_hz)],
+            'hour': (nz // n_hz) % 24,
+            'horizon': nz % n_hz + 1,
+            'n': count[nz],
+            'abs_err': abs_sum[nz],
+            'sq_err': sq_sum[nz],
+        }))
+    return pd.concat(frames, ignore_index=True) if frames else None
+
+
+# --- driver ------------------------------------------------------------------
+
+def make_tasks(history, folds, fold_days, blocks):
+    """Split the last folds*fold_days days into folds, and stations into `blocks` contiguous blocks."""
+    end = int(history['ts'].max()) + 1
+    fold_len = int(fold_days * 86400)
+    n_stations = len(history['stations'])
+    station_start = np.flatnonzero(history['row_in_station'] == 0)
+    bounds = np.linspace(0, n_stations, min(blocks, n_stations) + 1).astype(int)
+
+    tasks = []
+    for k in range(folds):
+        t_lo = end - (folds - k) * fold_len
+        for b in range(len(bounds) - 1):
+            pos_lo, pos_hi = bounds[b], bounds[b + 1]
+            if pos_lo == pos_hi:
+                continue
+            tasks.append({
+                'fold': k,
+                't_lo': t_lo,
+                't_hi': t_lo + fold_len,
+                'pos_lo': int(pos_lo),
+                'pos_hi': int(pos_hi),
+                'row_lo': int(station_start[pos_lo]),
+                'row_hi': int(station_start[pos_hi]) if pos_hi < n_stations else len(history['ts']),
+            })
+    return tasks
+
+
+def summarize(results, by):
+    grouped = results.groupby(by, as_index=False)[['n', 'abs_err', 'sq_err']].sum()
+    grouped['mae'] = grouped['abs_err'] / grouped['n']
+    grouped['rmse'] = np.sqrt(grouped['sq_err'] / grouped['n'])
+    return grouped.drop(columns=['abs_err', 'sq_err'])
+
+
+def run_backtest(folds=4, fold_days=7, horizons=12, models=None, workers=None, stride=1, batch_size=8192):
+    """Run the backtest and return per (model, fold, station, hour, horizon) metrics in ports."""
+    models = list(models or MODELS)
+    workers = workers or os.cpu_count() or 1
+    if 'global' in models and not os.path.exists(Config.MODEL_PATH):
+        print(f"No global model at {Config.MODEL_PATH}; skipping it.")
+        models.remove('global')
+
+    init_db()
+    t0 = time.time()
+    df = load_history()
+    vocab = None
+    if 'global' in models:
+        from src.preprocessing import DataPreprocessor
+        preprocessor = DataPreprocessor()
+        preprocessor.load()
+        vocab = preprocessor.vocab
+    history = prepare_history(df, vocab)
+    del df
+    print(f"Loaded {len(history['ts']):,} rows for {len(history['stations']):,} stations in {time.time() - t0:.1f}s")
+
+    shared = SharedArrays(history)
+    settings = {
+        'models': models,
+        'horizons': horizons,
+        'stride': stride,
+        'batch_size': batch_size,
+        'threads': max(1, (os.cpu_count() or 1) // workers),
+    }
+    tasks = make_tasks(history, folds, fold_days, blocks=max(1, -(-workers * 2 // folds)))
+    frames = []
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                    initargs=(shared.spec, settings)) as pool:
+            for i, result in enumerate(pool.map(_run_task, tasks), 1):
+                if result is not None:
+                    frames.append(result)
+                print(f"  task {i}/{len(tasks)} done ({time.time() - t0:.1f}s)")
+    finally:
+        shared.close(unlink=True)
+
+    if not frames:
+        return pd.DataFrame(columns=['model', 'fold', 'station_id', 'hour', 'horizon', 'n', 'mae', 'rmse'])
+    print(f"Backtest finished in {time.time() - t0:.1f}s")
+    return summarize(pd.concat(frames, ignore_index=True), ['model', 'fold', 'station_id', 'hour', 'horizon'])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Rolling-origin backtest of global, per-station and persistence models')
+    parser.add_argument('--folds', type=int, default=4, help='Number of consecutive evaluation folds')
+    parser.add_argument('--fold-days', type=float, default=7, help='Length of each fold in days')
+    parser.add_argument('--horizons', type=int, default=12, help='Evaluate forecasts 1..N steps ahead')
+    parser.add_argument('--models', nargs='+', choices=MODELS, default=MODELS, help='Models to evaluate')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: all cores)')
+    parser.add_argument('--stride', type=int, default=1, help='Use every Nth row of each station as an origin')
+    parser.add_argument('--batch-size', type=int, default=8192, help='Windows per inference batch')
+    parser.add_argument('--output', type=str, default='logs/backtest.csv', help='CSV of per model/fold/station/hour/horizon metrics')
+    args = parser.parse_args()
+
+    results = run_backtest(
+        folds=args.folds,
+        fold_days=args.fold_days,
+        horizons=args.horizons,
+        models=args.models,
+        workers=args.workers,
+        stride=args.stride,
+        batch_size=args.batch_size,
+    )
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    results.to_csv(args.output, index=False)
+
+    if not results.empty:
+        # results holds per-group means; weight them back to totals for the overview
+        results = results.assign(abs_err=results['mae'] * results['n'], sq_err=results['rmse'] ** 2 * results['n'])
+        pd.set_option('display.width', 120)
+        print("\nBy model and horizon (ports):")
+        print(summarize(results, ['model', 'horizon']).pivot(index='horizon', columns='model', values='mae').round(3))
+        print("\nBy model and fold (ports):")
+        print(summarize(results, ['model', 'fold']).round(3).to_string(index=False))
+    print(f"\nDetailed metrics written to {args.output}")
@@ -0,0 +1,221 @@
+"""
+Checkpoint writes for the training loop.
+
+fit() keeps the best weights in memory (snapshot_state) and writes them either
+once after training or, with CHECKPOINT_MODE=async, from a CheckpointWriter
+thread while training continues. Every write goes through atomic_write: the
+file is written next to the target, fsynced and renamed over it, so the API,
+scoring or a backtest reading models/ never sees a half-written file.
+
+Next to each model_*.pt, save_bundle writes a .safetensors bundle with the
+weights, the scaler's data_min_/data_max_ and the model hyperparameters. It uses
+the safetensors layout (8-byte little-endian header length, JSON header, raw
+little-endian tensor bytes) without needing that package, so nothing in it is
+unpickled. load_bundle memory-maps the file: tensors are views of the page cache
+rather than copies, and every process serving the same file shares one copy.
+"""
+
+import json
+import os
+import struct
+import tempfile
+import threading
+import time
+
+import joblib
+import numpy as np
+import torch
+from sklearn.preprocessing import MinMaxScaler
+
+BUNDLE_FORMAT = "voltcast-1"
+
+# safetensors dtype names; bfloat16 has no numpy equivalent and is not supported
+_DTYPES = {
+    "F64": np.float64, "F32": np.float32, "F16": np.float16,
+    "I64": np.int64, "I32": np.int32, "I16": np.int16, "I8": np.int8,
+    "U8": np.uint8, "BOOL": np.bool_,
+}
+_DTYPE_NAMES = {np.dtype(dtype): name for name, dtype in _DTYPES.items()}
+
+# mkstemp creates files as 0600; give checkpoints the mode open() would (read at import, before any writer thread)
+_umask = os.umask(0)
+os.umask(_umask)
+FILE_MODE = 0o666 & ~_umask
+
+
+def atomic_write(path, write):
+    """Call write(f) on a temporary file in path's directory, then rename it over path."""
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=os.path.basename(path) + ".", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            os.fchmod(f.fileno(), FILE_MODE)
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def save_state(state, path):
+    atomic_write(path, lambda f: torch.save(state, f))
+
+
+def save_scaler(scaler, path):
+    atomic_write(path, lambda f: joblib.dump(scaler, f))
+
+
+def bundle_path(model_path):
+    """models/model.pt -> models/model.safetensors"""
+    return os.path.splitext(model_path)[0] + ".safetensors"
+
+
+def save_bundle(path, state, scaler, params):
+    """
+    Write state (a CPU state dict), a fitted MinMaxScaler and params (JSON-able
+    hyperparameters, e.g. arch and hidden_dim) as one safetensors file.
+    """
+    tensors = {name: tensor.detach().cpu().contiguous().numpy() for name, tensor in state.items()}
+    tensors["scaler.data_min_"] = np.asarray(scaler.data_min_, dtype=np.float64)
+    tensors["scaler.data_max_"] = np.asarray(scaler.data_max_, dtype=np.float64)
+    scaler_meta = {
+        "feature_range": list(scaler.feature_range),
+        "n_samples_seen": int(np.max(scaler.n_samples_seen_)),
+        "feature_names": [str(name) for name in getattr(scaler, "feature_names_in_", [])],
+    }
+
+    header = {"__metadata__": {"format": BUNDLE_FORMAT, "params": json.dumps(params), "scaler": json.dumps(scaler_meta)}}
+    # Widest dtypes first keeps every tensor aligned to its item size
+    order = sorted(tensors, key=lambda name: (-tensors[name].dtype.itemsize, name))
+    offset = 0
+    for name in order:
+        array = tensors[name]
+        if array.dtype not in _DTYPE_NAMES:
+            raise ValueError(f"Cannot store {name} with dtype {array.dtype} in a checkpoint bundle")
+        header[name] = {"dtype": _DTYPE_NAMES[array.dtype], "shape": list(array.shape),
+                        "data_offsets": [offset, offset + array.nbytes]}
+        offset += array.nbytes
+    encoded = json.dumps(header, separators=(",", ":")).encode()
+    # Pad so the data section starts 8-byte aligned
+    encoded += b" " * (-(8 + len(encoded)) % 8)
+
+    def write(f):
+        f.write(struct.pack("<Q", len(encoded)))
+        f.write(encoded)
+        for name in order:
+            f.write(tensors[name].astype(tensors[name].dtype.newbyteorder("<"), copy=False).tobytes())
+
+    atomic_write(path, write)
+
+
+def load_bundle(path):
+    """
+    Memory-map a bundle written by save_bundle. Returns (state, scaler, params);
+    the state's tensors share the mapped pages (copy-on-write, so the file is never modified).
+    """
+    buffer = np.memmap(path, dtype=np.uint8, mode="c")
+    if len(buffer) < 8:
+        raise ValueError(f"{path} is not a checkpoint bundle")
+    header_len = struct.unpack("<Q", buffer[:8].tobytes())[0]
+    if 8 + header_len > len(buffer):
+        raise ValueError(f"{path} is not a checkpoint bundle (header length {header_len})")
+    header = json.loads(buffer[8:8 + header_len].tobytes())
+    meta = header.pop("__metadata__", {})
+    if meta.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"{path} is not a {BUNDLE_FORMAT} checkpoint bundle")
+
+    data = buffer[8 + header_len:]
+    arrays = {}
+    for name, info in header.items():
+        if info.get("dtype") not in _DTYPES:
+            raise ValueError(f"{path}: unsupported dtype {info.get('dtype')} for {name}")
+        dtype = np.dtype(_DTYPES[info["dtype"]]).newbyteorder("<")
+        start, end = info["data_offsets"]
+        if not 0 <= start <= end <= len(data) or (end - start) != dtype.itemsize * int(np.prod(info["shape"])):
+            raise ValueError(f"{path}: bad offsets for {name}")
+        arrays[name] = data[start:end].view(dtype).reshape(info["shape"])
+
+    scaler_meta = json.loads(meta["scaler"])
+    scaler = minmax_scaler(arrays.pop("scaler.data_min_"), arrays.pop("scaler.data_max_"), **scaler_meta)
+    state = {name: torch.from_numpy(array) for name, array in arrays.items()}
+    return state, scaler, json.loads(meta["params"])
+
+
+def minmax_scaler(data_min, data_max, feature_range=(0, 1), n_samples_seen=1, feature_names=()):
+    """A MinMaxScaler with the fitted attributes MinMaxScaler.fit would set for this data range."""
+    scaler = MinMaxScaler(feature_range=tuple(feature_range))
+    data_min = np.array(data_min, dtype=np.float64)
+    data_max = np.array(data_max, dtype=np.float64)
+    data_range = data_max - data_min
+    scaler.n_features_in_ = len(data_min)
+    scaler.n_samples_seen_ = n_samples_seen
+    scaler.data_min_ = data_min
+    scaler.data_max_ = data_max
+    scaler.data_range_ = data_range
+    # Constant features scale by 1, as in sklearn
+    scaler.scale_ = (feature_range[1] - feature_range[0]) / np.where(data_range == 0.0, 1.0, data_range)
+    scaler.min_ = feature_range[0] - data_min * scaler.scale_
+    if feature_names:
+        scaler.feature_names_in_ = np.array(feature_names, dtype=object)
+    return scaler
+
+
+def snapshot_state(model):
+    """CPU copy of a model's state dict (unwrapping DistributedDataParallel) that later training steps cannot change."""
+    model = getattr(model, "module", model)
+    return {name: tensor.detach().to("cpu", copy=True) for name, tensor in model.state_dict().items()}
+
+
+class CheckpointWriter:
+    """
+    Background thread that passes submitted states to save(state). write_s sums the time spent in save.
+
+    Only the most recent pending state is kept: if training improves again before
+    the previous write finished, the intermediate state is skipped. close() waits
+    for the last write and re-raises a write error in the caller.
+    """
+
+    def __init__(self, save):
+        self.save = save
+        self.writes = 0
+        self.write_s = 0.0
+        self.error = None
+        self._pending = None
+        self._closed = False
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name="checkpoint-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, state):
+        with self._cond:
+            self._pending = state
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while self._pending is None and not self._closed:
+                    self._cond.wait()
+                if self._pending is None:
+                    return
+                state, self._pending = self._pending, None
+            t0 = time.perf_counter()
+            try:
+                self.save(state)
+                self.writes += 1
+            except Exception as e:
+                self.error = e
+            finally:
+                self.write_s += time.perf_counter() - t0
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
@@ -4,6 +4,8 @@ import random
 from datetime import datetime
 from src.config import Config
 from src.db import init_db, save_records
+from src.scoring import ForecastScorer
+from src.rollups import apply_retention
 
 def fetch_ocm_data():
     """
@@ -90,12 +92,22 @@ def fetch_ocm_data():
 def run_collector_loop():
     init_db()
     print("Starting Data Collector Service...")
+    scorer = ForecastScorer()
     while True:
         print(f"Polling OCM API at {datetime.now()}...")
         records = fetch_ocm_data()
         if records:
             save_records(records)
             print(f"Saved {len(records)} records.")
+            if Config.SCORE_AFTER_COLLECT:
+                try:
+                    scorer.refresh()
+                except Exception as e:
+                    print(f"Error scoring forecasts: {e}")
+            try:
+                apply_retention()
+            except Exception as e:
+                print(f"Error applying retention: {e}")
         else:
             print("No records found.")
         time.sleep(300)  # Wait 5 minutes before next poll
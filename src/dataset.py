@@ -1,3 +1,4 @@
+import numpy as np
 import torch
 from torch.utils.data import Dataset
 
@@ -10,4 +11,26 @@ class TimeSeriesDataset(Dataset):
         return len(self.sequences)
         
     def __getitem__(self, idx):
-        return self.sequences[idx], self.targets[idx]
\ No newline at end of file
+        return self.sequences[idx], self.targets[idx]
+
+
+class WindowDataset(Dataset):
+    """
+    Windows cut on demand from a (rows, features) matrix instead of materialised up front.
+
+    Sample i is features[starts[i]:starts[i] + window] with target features[starts[i] + window, 0],
+    the same pairs create_sequences returns. The matrix may be a read-only np.memmap (see
+    src/feature_cache.py), so DataLoader workers share its pages rather than copies.
+    """
+    def __init__(self, features, starts, window):
+        self.features = features
+        self.starts = starts
+        self.window = window
+
+    def __len__(self):
+        return len(self.starts)
+
+    def __getitem__(self, idx):
+        start = int(self.starts[idx])
+        seq = np.array(self.features[start:start + self.window])
+        return torch.from_numpy(seq), torch.tensor(self.features[start + self.window, 0])
@@ -0,0 +1,86 @@
+"""
+Helpers for CPU data-parallel training with torch.distributed (gloo backend).
+
+`src/train.py --distributed` joins the process group described by the standard
+environment variables (RANK, WORLD_SIZE, LOCAL_RANK, MASTER_ADDR, MASTER_PORT), as
+set by scripts/launch_distributed.py or torchrun. Every rank holds a full model
+replica wrapped in DistributedDataParallel and trains on its DistributedSampler
+shard of the windows; gradients are averaged with an all-reduce after each
+backward pass. Rank 0 alone fits the scaler, extends the station vocabulary and
+writes checkpoints and run logs.
+
+Without an initialized process group every helper degrades to the single-process
+behaviour, so the training code calls them unconditionally.
+"""
+
+import datetime
+import os
+
+import torch
+import torch.distributed as dist
+
+
+def init(timeout_s=1800):
+    """Join the process group from the environment (gloo, CPU)."""
+    if not dist.is_initialized():
+        dist.init_process_group('gloo', timeout=datetime.timedelta(seconds=timeout_s))
+    return dist.get_rank(), dist.get_world_size()
+
+
+def cleanup():
+    if is_enabled():
+        dist.destroy_process_group()
+
+
+def is_enabled():
+    return dist.is_available() and dist.is_initialized()
+
+
+def rank():
+    return dist.get_rank() if is_enabled() else 0
+
+
+def world_size():
+    return dist.get_world_size() if is_enabled() else 1
+
+
+def local_rank():
+    return int(os.environ.get('LOCAL_RANK', '0'))
+
+
+def is_main():
+    return rank() == 0
+
+
+def print0(*args, **kwargs):
+    """print() on rank 0 only."""
+    if is_main():
+        print(*args, **kwargs)
+
+
+def barrier():
+    if is_enabled():
+        dist.barrier()
+
+
+def broadcast_object(obj):
+    """Rank 0's obj on every rank (any picklable object)."""
+    if not is_enabled():
+        return obj
+    holder = [obj]
+    dist.broadcast_object_list(holder, src=0)
+    return holder[0]
+
+
+def all_reduce_sum(*values):
+    """Element-wise sums of the given numbers over all ranks, as a list."""
+    if not is_enabled():
+        return list(values)
+    tensor = torch.tensor(values, dtype=torch.float64)
+    dist.all_reduce(tensor, op=dist.ReduceOp.SUM)
+    return tensor.tolist()
+
+
+def all_reduce_mean(*values):
+    n = world_size()
+    return [value / n for value in all_reduce_sum(*values)]
@@ -1,45 +1,47 @@
 import torch
 import numpy as np
 from torch.utils.data import DataLoader
-from src.model import EVChargingLSTM
+from src.model import build_model
 from src.config import Config
-from src.db import load_history, init_db
-from src.preprocessing import DataPreprocessor, create_sequences
-from src.dataset import TimeSeriesDataset
+from src.db import get_history_fingerprint, init_db
+from src.preprocessing import DataPreprocessor
+from src.dataset import WindowDataset
+from src.feature_cache import load_features
 from sklearn.metrics import mean_squared_error, mean_absolute_error
 
 def evaluate():
     init_db()
-    df = load_history()
+    fingerprint = get_history_fingerprint()
     
-    if len(df) < Config.SEQ_LENGTH + 20:
+    if sum(rows for rows, _, _ in fingerprint.values()) < Config.SEQ_LENGTH + 20:
         print("Not enough data to evaluate. Run data_collector.py first.")
         return
     
-    # Load preprocessor and preprocess data
+    # Load preprocessor; scaled features come from the cache (src/feature_cache.py)
     preprocessor = DataPreprocessor()
     preprocessor.load()
-    df_processed = preprocessor.transform(df)
+    features, starts = load_features(preprocessor, fit=False, fingerprint=fingerprint)
     
-    # Create sequences
-    X, y = create_sequences(df_processed, Config.SEQ_LENGTH)
+    # Use last 20% of the windows for evaluation
+    split_idx = int(len(starts) * 0.8)
     
-    # Use last 20% for evaluation
-    split_idx = int(len(X) * 0.8)
-    X_val = X[split_idx:]
-    y_val = y[split_idx:]
-    
-    if len(X_val) == 0:
+    if len(starts) - split_idx == 0:
         print("Not enough validation data.")
         return
     
-    val_dataset = TimeSeriesDataset(X_val, y_val)
+    val_dataset = WindowDataset(features, starts[split_idx:], Config.SEQ_LENGTH)
     val_loader = DataLoader(val_dataset, batch_size=Config.BATCH_SIZE)
     
     # Load model
     device = "cuda" if torch.cuda.is_available() else "cpu"
-    model = EVChargingLSTM(hidden_dim=Config.HIDDEN_DIM, num_layers=Config.NUM_LAYERS)
-    model.load_state_dict(torch.load(Config.MODEL_PATH, map_location=device))
+    state = torch.load(Config.MODEL_PATH, map_location=device)
+    model = build_model(
+        hidden_dim=Config.HIDDEN_DIM,
+        num_layers=Config.NUM_LAYERS,
+        station_emb_dim=Config.STATION_EMBED_DIM,
+        num_stations=state['station_embedding.weight'].shape[0] if 'station_embedding.weight' in state else None
+    )
+    model.load_state_dict(state)
     model.to(device)
     model.eval()
     
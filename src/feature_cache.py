@@ -0,0 +1,226 @@
+"""
+On-disk cache of preprocessed training features.
+
+train.py and evaluate.py used to rebuild the same load_history -> transform ->
+create_sequences pipeline on every run. load_features() instead keeps, per data
+scope and preprocessing setup, a directory under FEATURE_CACHE_DIR holding:
+
+  features.npy   scaled float32 (rows, features) matrix in load_history order
+  starts.npy     int64 start row of every training window (the window index)
+  scaler.joblib  the scaler fitted on the rows, when the caller asked for a fit
+  meta.json      per-station (rows, first_ts, last_ts) fingerprint of the source rows
+
+Both arrays are memory-mapped on a hit, and windows are cut from them on demand by
+WindowDataset. The directory name hashes the DB, station scope, feature columns,
+window length and (for a fixed scaler) the scaler. When the fingerprint shows that
+stations only gained rows newer than the cached ones, just those rows are read,
+scaled and appended in place. Anything else (pruned or back-filled rows, a scaler
+whose min/max the new rows widen, a rebuilt vocabulary) rebuilds the entry.
+
+Rows replaced in place with the same timestamp do not change the fingerprint; use
+FEATURE_CACHE=0 or delete the directory after rewriting history.
+"""
+
+import copy
+import fcntl
+import hashlib
+import io
+import json
+import os
+import time
+
+import joblib
+import numpy as np
+
+from src.config import Config
+from src.db import get_history_fingerprint, load_history
+from src.preprocessing import feature_matrix, sequence_columns
+
+
+def load_features(preprocessor, station_id=None, include_station_id=True, window=None, fit=True, fingerprint=None,
+                  key=None):
+    """
+    Scaled feature matrix and window starts for station_id (default all stations).
+
+    fit=True fits preprocessor.scaler on the rows, as training does (restored from the
+    cache when the rows are unchanged); fit=False uses it as given, as evaluation does.
+    preprocessor.vocab, when set, maps station ids. key names the cache entry instead of
+    cache_key(): distributed ranks pass the one rank 0 built with the scaler it fitted
+    and broadcast. Returns (features, starts).
+    """
+    window = window or Config.SEQ_LENGTH
+    if fingerprint is None:
+        fingerprint = get_history_fingerprint(station_id)
+    if not Config.FEATURE_CACHE:
+        features = _transform(preprocessor, load_history(station_id), include_station_id, fit)
+        return features, window_starts(0, len(features), window)
+
+    key = key or cache_key(preprocessor, station_id, include_station_id, window, fit)
+    entry = os.path.join(Config.FEATURE_CACHE_DIR, key)
+    os.makedirs(Config.FEATURE_CACHE_DIR, exist_ok=True)
+    # Concurrent callers (e.g. distributed training ranks) take turns: the first builds, the rest hit
+    with open(entry + '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        return _load_entry(entry, preprocessor, station_id, include_station_id, window, fit, fingerprint)
+
+
+def _load_entry(entry, preprocessor, station_id, include_station_id, window, fit, fingerprint):
+    meta = _read_meta(entry, preprocessor)
+    if meta is not None:
+        cached = {int(sid): tuple(v) for sid, v in meta['stations'].items()}
+        if cached == fingerprint:
+            if fit:
+                preprocessor.scaler = joblib.load(os.path.join(entry, 'scaler.joblib'))
+            print(f"Feature cache hit: {meta['rows']:,} rows ({entry})")
+            return _open(entry)
+        if _append(entry, meta, cached, fingerprint, preprocessor, station_id, include_station_id, window, fit):
+            return _open(entry)
+
+    t0 = time.perf_counter()
+    features = _transform(preprocessor, load_history(station_id), include_station_id, fit)
+    os.makedirs(entry, exist_ok=True)
+    _write_npy(os.path.join(entry, 'features.npy'), features)
+    _write_npy(os.path.join(entry, 'starts.npy'), window_starts(0, len(features), window))
+    if fit:
+        joblib.dump(preprocessor.scaler, os.path.join(entry, 'scaler.joblib'))
+    _write_meta(entry, fingerprint, len(features), preprocessor)
+    print(f"Feature cache built: {len(features):,} rows in {time.perf_counter() - t0:.2f}s ({entry})")
+    return _open(entry)
+
+
+def cache_key(preprocessor, station_id, include_station_id, window, fit):
+    parts = {
+        'db': Config.DB_URL,
+        'station_id': station_id,
+        'columns': sequence_columns(include_station_id),
+        'window': window,
+        'scaler': 'fit' if fit else joblib.hash(preprocessor.scaler),
+    }
+    return hashlib.sha1(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:16]
+
+
+def window_starts(old_rows, rows, window):
+    """Start rows of the windows that become complete when the matrix grows from old_rows to rows."""
+    return np.arange(max(0, old_rows - window), max(0, rows - window), dtype=np.int64)
+
+
+def _transform(preprocessor, df, include_station_id, fit):
+    if fit:
+        preprocessor.fit(df)
+    return feature_matrix(preprocessor.transform(df), include_station_id)
+
+
+def _vocab_ids(preprocessor):
+    vocab = getattr(preprocessor, 'vocab', None)
+    return [] if vocab is None else [int(sid) for sid in vocab.index]
+
+
+def _vocab_hash(ids):
+    return hashlib.sha1(json.dumps(ids).encode()).hexdigest()
+
+
+def _read_meta(entry, preprocessor):
+    """The entry's metadata if its files are complete and its station rows still map the same way."""
+    try:
+        with open(os.path.join(entry, 'meta.json')) as f:
+            meta = json.load(f)
+        shape = np.load(os.path.join(entry, 'features.npy'), mmap_mode='r').shape
+    except (OSError, ValueError):
+        return None
+    if shape[0] != meta['rows']:
+        return None
+    # The vocabulary only ever grows; rows cached with an older prefix of it are still valid
+    ids = _vocab_ids(preprocessor)
+    if len(ids) < meta['vocab_size'] or _vocab_hash(ids[:meta['vocab_size']]) != meta['vocab_hash']:
+        return None
+    return meta
+
+
+def _write_meta(entry, fingerprint, rows, preprocessor):
+    ids = _vocab_ids(preprocessor)
+    meta = {
+        'rows': rows,
+        'last_ts': max((last for _, _, last in fingerprint.values()), default=0),
+        'stations': {str(sid): list(v) for sid, v in fingerprint.items()},
+        'vocab_size': len(ids),
+        'vocab_hash': _vocab_hash(ids),
+        'updated': time.time(),
+    }
+    tmp = os.path.join(entry, 'meta.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(meta, f)
+    os.replace(tmp, os.path.join(entry, 'meta.json'))
+
+
+def _open(entry):
+    return (np.load(os.path.join(entry, 'features.npy'), mmap_mode='r'),
+            np.load(os.path.join(entry, 'starts.npy'), mmap_mode='r'))
+
+
+def _append(entry, meta, cached, fingerprint, preprocessor, station_id, include_station_id, window, fit):
+    """Append rows newer than the cached ones; False if the change is not a pure append."""
+    for sid, (rows, first, last) in cached.items():
+        now = fingerprint.get(sid)
+        if now is None or now[1] != first or now[0] < rows or now[2] < last:
+            return False
+    expected = sum(rows for rows, _, _ in fingerprint.values()) - meta['rows']
+
+    t0 = time.perf_counter()
+    df = load_history(station_id, since=meta['last_ts'])
+    if len(df) != expected:
+        # Some rows landed at or before the cached timestamps
+        return False
+
+    if fit:
+        scaler = joblib.load(os.path.join(entry, 'scaler.joblib'))
+        grown = copy.deepcopy(scaler).partial_fit(df[preprocessor.feature_cols])
+        if not (np.array_equal(grown.data_min_, scaler.data_min_) and np.array_equal(grown.data_max_, scaler.data_max_)):
+            return False
+        preprocessor.scaler = scaler
+    features = _transform(preprocessor, df, include_station_id, fit=False)
+
+    old_rows = meta['rows']
+    new_rows = old_rows + len(features)
+    if not (_append_npy(os.path.join(entry, 'features.npy'), features)
+            and _append_npy(os.path.join(entry, 'starts.npy'), window_starts(old_rows, new_rows, window))):
+        return False
+    _write_meta(entry, fingerprint, new_rows, preprocessor)
+    print(f"Feature cache: appended {len(features):,} new rows to {old_rows:,} in {time.perf_counter() - t0:.2f}s ({entry})")
+    return True
+
+
+def _write_npy(path, array):
+    tmp = path + '.tmp'
+    with open(tmp, 'wb') as f:
+        np.lib.format.write_array(f, np.ascontiguousarray(array))
+    os.replace(tmp, path)
+
+
+def _append_npy(path, rows):
+    """
+    Grow a C-order .npy file along its first axis in place: write the rows at the end,
+    then rewrite the header's shape. NumPy pads headers so the length field can grow
+    without moving the data; False if this header has no room.
+    """
+    with open(path, 'r+b') as f:
+        version = np.lib.format.read_magic(f)
+        read_header = np.lib.format.read_array_header_1_0 if version == (1, 0) else np.lib.format.read_array_header_2_0
+        shape, fortran_order, dtype = read_header(f)
+        header_len = f.tell()
+        if fortran_order or dtype != rows.dtype or shape[1:] != rows.shape[1:]:
+            return False
+        header = io.BytesIO()
+        d = {'descr': np.lib.format.dtype_to_descr(dtype), 'fortran_order': False,
+             'shape': (shape[0] + len(rows),) + shape[1:]}
+        if version == (1, 0):
+            np.lib.format.write_array_header_1_0(header, d)
+        else:
+            np.lib.format.write_array_header_2_0(header, d)
+        if len(header.getvalue()) != header_len:
+            return False
+        f.seek(header_len + int(np.prod(shape)) * dtype.itemsize)
+        f.write(np.ascontiguousarray(rows).tobytes())
+        f.flush()
+        f.seek(0)
+        f.write(header.getvalue())
+    return True
@@ -0,0 +1,95 @@
+"""
+Inference runtime shared by the API and the batch scorer.
+
+InferenceRuntime owns a loaded model and is the one way to run it for serving:
+predict() takes a numpy window array and returns the normalized predictions as a
+numpy array. Every call runs under torch.inference_mode(), so no autograd graph
+or version counters are built, and the input is copied into a float32 tensor
+preallocated for that batch shape instead of allocating a new one per request.
+Buffers are kept per calling thread, so the model executor's threads can run
+forward passes at once without sharing an input tensor.
+
+Thread pools are pinned when the runtime is created. Each API process runs up to
+INFERENCE_THREADS forward passes at once; with torch's default of one intra-op
+thread per core each of them would fan out over every core, and several workers
+would oversubscribe the CPU many times over. serving_threads() gives every
+concurrent forward pass its share of the cores instead.
+"""
+
+import os
+import threading
+
+import numpy as np
+import torch
+
+from src.config import Config
+
+
+def serving_threads(processes=1):
+    """Intra-op threads per forward pass for `processes` API workers (INFERENCE_TORCH_THREADS overrides)."""
+    if Config.INFERENCE_TORCH_THREADS > 0:
+        return Config.INFERENCE_TORCH_THREADS
+    return max(1, (os.cpu_count() or 1) // (processes * Config.INFERENCE_THREADS))
+
+
+def pin_threads(threads=None, interop_threads=None):
+    """Set this process's torch intra-/inter-op thread counts (None keeps the current setting)."""
+    if threads and torch.get_num_threads() != threads:
+        torch.set_num_threads(threads)
+    if interop_threads and torch.get_num_interop_threads() != interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # Can only be set once, before any inter-op parallel work has started
+            pass
+
+
+class InferenceRuntime:
+    """
+    A model ready for serving: predict(windows) -> normalized predictions.
+
+    threads / interop_threads pin the process's torch pools (None leaves them as
+    they are). Inputs larger than max_batch windows (default SCORING_BATCH_SIZE)
+    run in chunks of max_batch. Each thread keeps input buffers for its last
+    max_shapes batch shapes.
+    """
+
+    def __init__(self, model, threads=None, interop_threads=None, max_batch=None, max_shapes=8):
+        pin_threads(threads, interop_threads)
+        model.eval()
+        for param in model.parameters():
+            param.requires_grad_(False)
+        self.model = model
+        self.max_batch = max_batch or Config.SCORING_BATCH_SIZE
+        self.max_shapes = max_shapes
+        self._local = threading.local()
+
+    def _buffer(self, shape):
+        """(tensor, array) pair sharing one float32 buffer of `shape`, reused across this thread's calls."""
+        buffers = getattr(self._local, 'buffers', None)
+        if buffers is None:
+            buffers = self._local.buffers = {}
+        entry = buffers.get(shape)
+        if entry is None:
+            if len(buffers) >= self.max_shapes:
+                buffers.pop(next(iter(buffers)))
+            tensor = torch.empty(shape, dtype=torch.float32)
+            entry = buffers[shape] = (tensor, tensor.numpy())
+        return entry
+
+    def predict(self, x):
+        """
+        Normalized predictions for x, a (batch, seq_len, features) array of windows
+        or a single (seq_len, features) window. Returns a float32 array of length batch.
+        """
+        x = np.asarray(x)
+        if x.ndim == 2:
+            x = x[None]
+        out = np.empty(len(x), dtype=np.float32)
+        with torch.inference_mode():
+            for start in range(0, len(x), self.max_batch):
+                chunk = x[start:start + self.max_batch]
+                tensor, array = self._buffer(chunk.shape)
+                np.copyto(array, chunk, casting='same_kind')
+                out[start:start + len(chunk)] = self.model(tensor).reshape(-1).numpy()
+        return out
@@ -0,0 +1,166 @@
+"""
+Minimal Prometheus-style metrics (stdlib only).
+
+Metrics register themselves in REGISTRY when created; render() produces the text
+exposition format served by GET /metrics. Every update is a dict lookup plus a
+few additions under a lock, so instrumenting hot paths costs microseconds.
+"""
+
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+
+# Latency buckets in seconds: sub-millisecond model steps up to slow DB scans
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REGISTRY = []
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return "{" + body + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, value in items:
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def clear(self):
+        with self._lock:
+            self._values.clear()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket (non-cumulative) counts, sum, count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][idx] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            items = sorted((key, ([*state[0]], state[1], state[2])) for key, state in self._values.items())
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cumulative += n
+                labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+def render():
+    """Return every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Shared metrics used across the API, DB layer and caches
+HTTP_REQUESTS = Counter("voltcast_http_requests_total", "HTTP requests by route, method and status code.", ("route", "method", "status"))
+HTTP_LATENCY = Histogram("voltcast_http_request_duration_seconds", "HTTP request latency by route.", ("route", "method"))
+PREDICT_STAGE_LATENCY = Histogram("voltcast_predict_stage_duration_seconds", "Time spent in each stage of a prediction.", ("stage",))
+DB_QUERIES = Counter("voltcast_db_queries_total", "Database calls by operation.", ("query",))
+DB_QUERY_LATENCY = Histogram("voltcast_db_query_duration_seconds", "Database call latency by operation.", ("query",))
+CACHE_REQUESTS = Counter("voltcast_cache_requests_total", "Cache lookups by cache and result (hit/miss).", ("cache", "result"))
+ADMISSION_INFLIGHT = Gauge("voltcast_admission_inflight", "Requests running under admission control, by pool.", ("pool",))
+ADMISSION_QUEUED = Gauge("voltcast_admission_queued", "Requests waiting for an admission slot, by pool.", ("pool",))
+ADMISSION_WAIT = Histogram("voltcast_admission_wait_seconds", "Time queued requests waited for an admission slot.", ("pool",))
+SHED_REQUESTS = Counter("voltcast_shed_requests_total", "Requests refused by admission control, by pool, reason "
+                        "(queue_full/queue_timeout) and outcome (rejected with 503, or served a stale forecast).",
+                        ("pool", "reason", "outcome"))
+MODEL_INFO = Gauge("voltcast_model_info", "Currently loaded model; the version label is a content hash of the weights file.", ("version",))
+
+
+def timed_query(name):
+    """Decorator counting and timing a DB helper under the given query name."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                DB_QUERIES.inc(query=name)
+                DB_QUERY_LATENCY.observe(time.perf_counter() - start, query=name)
+        return wrapper
+    return decorator
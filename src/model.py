@@ -1,9 +1,27 @@
 import torch
 import torch.nn as nn
+import torch.nn.functional as F
 
-class EVChargingLSTM(nn.Module):
-    def __init__(self, hidden_dim, num_layers, station_emb_dim=8, num_stations=None, dropout=0.2):
-        super(EVChargingLSTM, self).__init__()
+from src.config import Config
+
+
+class StationSequenceModel(nn.Module):
+    """
+    Shared feature interface of the forecasting models.
+
+    Every architecture takes the same (batch, seq_len, features) rows (see
+    SEQUENCE_COLUMNS in src/preprocessing.py), embeds hour, day and (for the global
+    model) station the same way in encode(), and predicts the next normalized
+    available_ports as (batch, 1). Weights are saved as a plain state dict, with the
+    architecture chosen by Config.MODEL_ARCH (see build_model).
+    """
+    # Whether step() can carry state between calls (stateful streaming inference)
+    recurrent = False
+    # False for baselines with nothing to fit; train.py saves them as built
+    trainable = True
+
+    def __init__(self, station_emb_dim=8, num_stations=None, oov_rate=0.0):
+        super().__init__()
 
         # Embeddings
         self.hour_embedding = nn.Embedding(24, 4)      # Map 0-23 to vector of size 4
@@ -15,25 +33,16 @@ class EVChargingLSTM(nn.Module):
             if num_stations is None:
                 num_stations = 100
             self.station_embedding = nn.Embedding(num_stations, station_emb_dim)
+        # While training, route this share of sequences to row 0 (the vocabulary's OOV bucket)
+        self.oov_rate = oov_rate
 
         # Input Dimension Calculation:
         # 4 numeric features (avail, total, lat, lon) + 4 (hour_emb) + 2 (day_emb)
         # If station_emb_dim > 0: + station_emb_dim
-        input_dim = 4 + 4 + 2 + (station_emb_dim if station_emb_dim else 0)
-
-        self.lstm = nn.LSTM(
-            input_size=input_dim,
-            hidden_size=hidden_dim,
-            num_layers=num_layers,
-            batch_first=True,
-            dropout=dropout
-        )
+        self.input_dim = 4 + 4 + 2 + (station_emb_dim if station_emb_dim else 0)
 
-        # Regression Head
-        self.fc = nn.Linear(hidden_dim, 1) # Predicting available_ports (normalized)
-        self.relu = nn.ReLU()
-
-    def forward(self, x):
+    def encode(self, x):
+        """Turn raw feature rows into model inputs: (batch, seq_len, features) -> (batch, seq_len, input_dim)."""
         # x shape: (batch, seq_len, features)
         # Features indices: 0:4 numeric (available, total, lat, lon), 4: hour, 5: day, 6: station_id
 
@@ -48,12 +57,62 @@ class EVChargingLSTM(nn.Module):
         if self.station_emb_dim and hasattr(self, 'station_embedding'):
             # station_idx is the last feature in input when embeddings are used
             station_idx = x[:, :, 6].long()
+            if self.training and self.oov_rate > 0:
+                drop = torch.rand(station_idx.shape[0], 1, device=station_idx.device) < self.oov_rate
+                station_idx = station_idx.masked_fill(drop, 0)
             station_emb = self.station_embedding(station_idx)  # shape: (batch, seq_len, emb_dim)
             # Concatenate: (batch, seq_len, 4+4+2+station_emb_dim)
             combined = torch.cat([numeric, hour_emb, day_emb, station_emb], dim=2)
         else:
             # No station embedding; concatenate only numeric + time embeddings
             combined = torch.cat([numeric, hour_emb, day_emb], dim=2)
+        return combined
+
+    def forward_all(self, x):
+        """Prediction after every timestep: (batch, seq_len, 1). Used to train for stateful serving."""
+        raise NotImplementedError(f"{type(self).__name__} only predicts from a whole window; "
+                                  "train it without --stateful-steps")
+
+    def step(self, x, state=None):
+        raise NotImplementedError(f"{type(self).__name__} has no carried state; use windowed inference")
+
+    def grow_station_embedding(self, num_stations):
+        """
+        Resize the station embedding to num_stations rows in place, keeping learned rows.
+        New rows start as copies of the OOV row, so new stations predict as unseen ones did.
+        """
+        old = self.station_embedding
+        if num_stations <= old.num_embeddings:
+            return
+        grown = nn.Embedding(num_stations, old.embedding_dim).to(old.weight.device)
+        with torch.no_grad():
+            grown.weight[:old.num_embeddings] = old.weight
+            grown.weight[old.num_embeddings:] = old.weight[0]
+        self.station_embedding = grown
+
+
+class EVChargingLSTM(StationSequenceModel):
+    recurrent = True
+    rnn_class = nn.LSTM
+
+    def __init__(self, hidden_dim, num_layers, station_emb_dim=8, num_stations=None, dropout=0.2, oov_rate=0.0):
+        super().__init__(station_emb_dim, num_stations, oov_rate)
+
+        # Named `lstm` for every rnn_class so existing LSTM checkpoints keep their state-dict keys
+        self.lstm = self.rnn_class(
+            input_size=self.input_dim,
+            hidden_size=hidden_dim,
+            num_layers=num_layers,
+            batch_first=True,
+            dropout=dropout if num_layers > 1 else 0.0
+        )
+
+        # Regression Head
+        self.fc = nn.Linear(hidden_dim, 1) # Predicting available_ports (normalized)
+        self.relu = nn.ReLU()
+
+    def forward(self, x):
+        combined = self.encode(x)
 
         # LSTM Pass
         lstm_out, _ = self.lstm(combined)
@@ -63,4 +122,141 @@ class EVChargingLSTM(nn.Module):
 
         # Prediction
         out = self.fc(last_step)
-        return out
\ No newline at end of file
+        return out
+
+    def forward_all(self, x):
+        lstm_out, _ = self.lstm(self.encode(x))
+        return self.fc(lstm_out)
+
+    def step(self, x, state=None):
+        """
+        Advance the recurrent layers from `state` over the rows in x (typically one timestep).
+
+        Returns (prediction, state). Starting from state=None over a full window
+        gives the same prediction as forward(); see src/streaming_inference.py.
+        """
+        lstm_out, state = self.lstm(self.encode(x), state)
+        return self.fc(lstm_out[:, -1, :]), state
+
+
+class EVChargingGRU(EVChargingLSTM):
+    """The LSTM model with GRU cells: three gates instead of four and no cell state."""
+    rnn_class = nn.GRU
+
+
+class CausalConvBlock(nn.Module):
+    """Dilated 1D convolution that only sees current and earlier steps, with a residual connection."""
+
+    def __init__(self, in_channels, out_channels, kernel_size, dilation, dropout):
+        super().__init__()
+        self.pad = (kernel_size - 1) * dilation
+        self.conv = nn.Conv1d(in_channels, out_channels, kernel_size, dilation=dilation)
+        self.dropout = nn.Dropout(dropout)
+        self.residual = nn.Conv1d(in_channels, out_channels, 1) if in_channels != out_channels else nn.Identity()
+
+    def forward(self, x):
+        # x shape: (batch, channels, seq_len)
+        out = self.dropout(torch.relu(self.conv(F.pad(x, (self.pad, 0)))))
+        return torch.relu(out + self.residual(x))
+
+
+class EVChargingTCN(StationSequenceModel):
+    """
+    Temporal convolutional network: stacked causal convolutions with dilations 1, 2, 4, ...
+    All timesteps are processed in parallel, and enough blocks are stacked for the last
+    output to see the whole SEQ_LENGTH window.
+    """
+
+    def __init__(self, hidden_dim, num_layers, station_emb_dim=8, num_stations=None, dropout=0.2, oov_rate=0.0,
+                 kernel_size=3, seq_length=None):
+        super().__init__(station_emb_dim, num_stations, oov_rate)
+        seq_length = seq_length or Config.SEQ_LENGTH
+        levels = max(1, num_layers)
+        while 1 + (kernel_size - 1) * (2 ** levels - 1) < seq_length:
+            levels += 1
+        self.blocks = nn.Sequential(*[
+            CausalConvBlock(self.input_dim if i == 0 else hidden_dim, hidden_dim, kernel_size, 2 ** i, dropout)
+            for i in range(levels)
+        ])
+        self.fc = nn.Linear(hidden_dim, 1)
+
+    def features(self, x):
+        return self.blocks(self.encode(x).transpose(1, 2))
+
+    def forward(self, x):
+        return self.fc(self.features(x)[:, :, -1])
+
+    def forward_all(self, x):
+        return self.fc(self.features(x).transpose(1, 2))
+
+
+class EVChargingMLP(StationSequenceModel):
+    """Feed-forward network over the flattened last SEQ_LENGTH encoded rows."""
+
+    def __init__(self, hidden_dim, num_layers, station_emb_dim=8, num_stations=None, dropout=0.2, oov_rate=0.0,
+                 seq_length=None):
+        super().__init__(station_emb_dim, num_stations, oov_rate)
+        self.seq_length = seq_length or Config.SEQ_LENGTH
+        layers = []
+        width = self.input_dim * self.seq_length
+        for _ in range(max(1, num_layers)):
+            layers += [nn.Linear(width, hidden_dim), nn.ReLU(), nn.Dropout(dropout)]
+            width = hidden_dim
+        layers.append(nn.Linear(width, 1))
+        self.net = nn.Sequential(*layers)
+
+    def forward(self, x):
+        return self.net(self.encode(x[:, -self.seq_length:]).flatten(1))
+
+
+class EVChargingLinear(StationSequenceModel):
+    """
+    Linear baseline: the last observed availability plus a linear correction over the
+    flattened window. The correction starts at zero, so an untrained model is the
+    persistence forecast; the hour/day embeddings let it learn seasonal offsets.
+    """
+
+    def __init__(self, hidden_dim=None, num_layers=None, station_emb_dim=8, num_stations=None, dropout=0.0,
+                 oov_rate=0.0, seq_length=None):
+        super().__init__(station_emb_dim, num_stations, oov_rate)
+        self.seq_length = seq_length or Config.SEQ_LENGTH
+        self.linear = nn.Linear(self.input_dim * self.seq_length, 1)
+        nn.init.zeros_(self.linear.weight)
+        nn.init.zeros_(self.linear.bias)
+
+    def forward(self, x):
+        return x[:, -1, 0:1].float() + self.linear(self.encode(x[:, -self.seq_length:]).flatten(1))
+
+
+class PersistenceModel(StationSequenceModel):
+    """
+    Naive baseline: the next availability equals the last observed one. Windows span
+    SEQ_LENGTH rows (hours, not days), so this is the in-window naive forecast rather
+    than a same-time-yesterday seasonal one.
+    """
+    trainable = False
+
+    def __init__(self, hidden_dim=None, num_layers=None, station_emb_dim=8, num_stations=None, dropout=0.0, oov_rate=0.0):
+        super().__init__(station_emb_dim, num_stations, oov_rate)
+
+    def forward(self, x):
+        return x[:, -1, 0:1].float()
+
+
+# Architectures selectable with MODEL_ARCH; all share the constructor arguments of EVChargingLSTM
+MODEL_ARCHS = {
+    'lstm': EVChargingLSTM,
+    'gru': EVChargingGRU,
+    'tcn': EVChargingTCN,
+    'mlp': EVChargingMLP,
+    'linear': EVChargingLinear,
+    'naive': PersistenceModel,
+}
+
+
+def build_model(arch=None, **kwargs):
+    """Instantiate the architecture named by arch (default Config.MODEL_ARCH)."""
+    arch = (arch or Config.MODEL_ARCH).lower()
+    if arch not in MODEL_ARCHS:
+        raise ValueError(f"Unknown MODEL_ARCH '{arch}'; choose one of {', '.join(MODEL_ARCHS)}")
+    return MODEL_ARCHS[arch](**kwargs)
@@ -2,7 +2,12 @@ import pandas as pd
 import numpy as np
 from sklearn.preprocessing import MinMaxScaler
 import joblib
+import os
 from src.config import Config
+from src.vocab import StationVocab
+
+# Model input columns in order; station_id (last) only for the global model
+SEQUENCE_COLUMNS = ['available_ports', 'total_ports', 'latitude', 'longitude', 'hour', 'day_of_week', 'station_id']
 
 class DataPreprocessor:
     def __init__(self):
@@ -10,6 +15,8 @@ class DataPreprocessor:
         # Features to scale: available_ports, total_ports, lat, lon
         # station_id is NOT scaled; we'll use a learned embedding for station IDs in the model
         self.feature_cols = ['available_ports', 'total_ports', 'latitude', 'longitude']
+        # Raw station id -> embedding row (global model only); None keeps raw ids
+        self.vocab = None
         
     def fit(self, df):
         # Ensure station_id exists and is numeric
@@ -28,21 +35,31 @@ class DataPreprocessor:
         if 'station_id' not in df.columns:
             df = df.copy()
             df['station_id'] = 0
+        elif self.vocab is not None:
+            df['station_id'] = self.vocab.map(df['station_id'])
 
         # 3. Scale Numeric
         df[self.feature_cols] = self.scaler.transform(df[self.feature_cols])
         
         return df
 
-    def save(self, path=None):
-        """Save scaler to disk. If path not provided uses Config.SCALER_PATH"""
+    def save(self, path=None, vocab_path=None):
+        """Save scaler (and station vocabulary, if any) to disk. Defaults to Config.SCALER_PATH / Config.VOCAB_PATH"""
         path = path or Config.SCALER_PATH
         joblib.dump(self.scaler, path)
+        if self.vocab is not None:
+            self.vocab.save(vocab_path or Config.VOCAB_PATH)
         
-    def load(self, path=None):
-        """Load scaler from disk. If path not provided uses Config.SCALER_PATH"""
+    def load(self, path=None, vocab_path=None):
+        """Load scaler from disk, plus the station vocabulary when one was saved. Defaults to Config.SCALER_PATH / Config.VOCAB_PATH"""
         path = path or Config.SCALER_PATH
         self.scaler = joblib.load(path)
+        self.load_vocab(vocab_path)
+
+    def load_vocab(self, vocab_path=None):
+        """Load the station vocabulary when one was saved (the scaler may come from a checkpoint bundle instead)."""
+        vocab_path = vocab_path or Config.VOCAB_PATH
+        self.vocab = StationVocab.load(vocab_path) if os.path.exists(vocab_path) else None
 
 
 def create_sequences(data, seq_length, target_col_idx=0, include_station_id=True):
@@ -57,13 +74,7 @@ def create_sequences(data, seq_length, target_col_idx=0, include_station_id=True
     sequences = []
     targets = []
 
-    if include_station_id:
-        # Order: available_ports, total_ports, latitude, longitude, hour, day_of_week, station_id
-        data_array = data[['available_ports', 'total_ports', 'latitude', 'longitude', 'hour', 'day_of_week', 'station_id']].values
-    else:
-        # Exclude station_id for per-station models
-        # Order: available_ports, total_ports, latitude, longitude, hour, day_of_week
-        data_array = data[['available_ports', 'total_ports', 'latitude', 'longitude', 'hour', 'day_of_week']].values
+    data_array = data[sequence_columns(include_station_id)].values
 
     for i in range(len(data_array) - seq_length):
         seq = data_array[i:i+seq_length]
@@ -71,4 +82,14 @@ def create_sequences(data, seq_length, target_col_idx=0, include_station_id=True
         sequences.append(seq)
         targets.append(target)
         
-    return np.array(sequences), np.array(targets)
\ No newline at end of file
+    return np.array(sequences), np.array(targets)
+
+
+def sequence_columns(include_station_id=True):
+    """SEQUENCE_COLUMNS, without station_id for per-station models."""
+    return SEQUENCE_COLUMNS if include_station_id else SEQUENCE_COLUMNS[:-1]
+
+
+def feature_matrix(data, include_station_id=True):
+    """Transformed rows as the float32 (rows, features) matrix that training windows are cut from."""
+    return data[sequence_columns(include_station_id)].to_numpy(dtype=np.float32)
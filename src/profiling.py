@@ -0,0 +1,90 @@
+import datetime
+import json
+import os
+import time
+from contextlib import contextmanager
+
+
+class RunLog:
+    """
+    Append-only JSON-lines log of a training run.
+
+    Each call to write() appends one object with an `event` name and a timestamp.
+    When no path is given the log is disabled and write() is a no-op.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        if path:
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+
+    @property
+    def enabled(self):
+        return bool(self.path)
+
+    def write(self, event, **fields):
+        if not self.path:
+            return
+        record = {"event": event, "time": datetime.datetime.now().isoformat(), **fields}
+        with open(self.path, "a") as f:
+            f.write(json.dumps(record) + "\n")
+
+
+class EpochTimer:
+    """Accumulates wall time per training-loop section for a single epoch."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.sections = {}
+        self.samples = 0
+
+    @contextmanager
+    def section(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sections[name] = self.sections.get(name, 0.0) + time.perf_counter() - t0
+
+    def iter_batches(self, loader):
+        """Yield batches from loader, charging the time spent waiting on it to `data_wait`."""
+        it = iter(loader)
+        while True:
+            t0 = time.perf_counter()
+            try:
+                batch = next(it)
+            except StopIteration:
+                return
+            finally:
+                self.sections["data_wait"] = self.sections.get("data_wait", 0.0) + time.perf_counter() - t0
+            yield batch
+
+    def throughput(self):
+        """Samples per second since the epoch started."""
+        elapsed = time.perf_counter() - self.start
+        return self.samples / elapsed if elapsed > 0 else 0.0
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.start
+        stats = {f"{name}_s": round(value, 4) for name, value in self.sections.items()}
+        stats["epoch_s"] = round(elapsed, 4)
+        stats["samples"] = self.samples
+        stats["samples_per_sec"] = round(self.samples / elapsed, 1) if elapsed > 0 else 0.0
+        return stats
+
+
+def make_torch_profiler(trace_path, steps):
+    """
+    Build a torch.profiler that records `steps` training steps (after one wait and
+    one warmup step) and writes them as a Chrome trace to trace_path.
+    Call .start() before the loop, .step() after every batch and .stop() at the end.
+    """
+    from torch.profiler import profile, schedule, ProfilerActivity
+
+    os.makedirs(os.path.dirname(trace_path) or ".", exist_ok=True)
+    return profile(
+        activities=[ProfilerActivity.CPU],
+        schedule=schedule(wait=1, warmup=1, active=steps, repeat=1),
+        on_trace_ready=lambda prof: prof.export_chrome_trace(trace_path),
+        record_shapes=True,
+    )
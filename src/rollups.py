@@ -0,0 +1,155 @@
+"""
+Downsampled station history and the raw-data retention policy.
+
+save_records keeps hourly and daily rollups of station_logs up to date in the same
+transaction as the raw rows (see ROLLUP_TABLES in src/db.py), so long ranges can be
+read from a few hundred aggregate rows instead of every 5/15-minute observation.
+station_history() serves GET /stations/{id}/history: it turns the requested range
+and resolution into a bucket step and reads the coarsest table that still has
+buckets no wider than that step, falling back to a coarser one when retention has
+already pruned the finer table for the start of the range.
+
+Retention (RAW_RETENTION_DAYS, HOURLY_RETENTION_DAYS) runs after each collector
+cycle, or by hand:
+
+  PYTHONPATH="." python src/rollups.py --prune                  # apply the configured retention
+  PYTHONPATH="." python src/rollups.py --prune --raw-days 30    # keep 30 days of raw rows
+  PYTHONPATH="." python src/rollups.py --rebuild                # recompute all rollups from raw rows
+
+Training and backtests read raw rows, so raw retention also bounds their history.
+"""
+
+import argparse
+import re
+import time
+
+import pandas as pd
+
+from src.config import Config
+from src.db import init_db, get_station, get_history_start, load_station_history, prune_history, rebuild_rollups
+
+# Bucket widths of the stored levels, coarsest first (0 = raw station_logs rows)
+LEVELS = [86400, 3600, 0]
+
+# Steps chosen for resolution=auto, so buckets land on round times
+AUTO_STEPS = [300, 900, 1800, 3600, 3 * 3600, 6 * 3600, 12 * 3600, 86400, 7 * 86400, 30 * 86400]
+
+UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400, 'w': 7 * 86400}
+NAMED = {'raw': 0, 'hour': 3600, 'hourly': 3600, 'day': 86400, 'daily': 86400}
+
+
+def parse_resolution(value):
+    """Bucket step in seconds from 'raw', 'hour', 'day', '15m', '6h', '1d' or plain seconds. None for 'auto'."""
+    value = (value or 'auto').strip().lower()
+    if value == 'auto':
+        return None
+    if value in NAMED:
+        return NAMED[value]
+    match = re.fullmatch(r'(\d+)\s*([smhdw]?)', value)
+    if not match:
+        raise ValueError(f"Unknown resolution '{value}'; use auto, raw, hour, day or e.g. 15m, 6h, 1d")
+    return int(match.group(1)) * UNITS[match.group(2) or 's']
+
+
+def auto_step(start, end, max_points=None):
+    """Smallest round step that keeps the range within max_points buckets."""
+    max_points = max_points or Config.HISTORY_MAX_POINTS
+    needed = (end - start) / max_points
+    for step in AUTO_STEPS:
+        if step >= needed:
+            return step
+    return AUTO_STEPS[-1]
+
+
+def choose_level(step, start, starts):
+    """
+    Coarsest stored level whose buckets are no wider than `step`. If the range starts
+    before that level's oldest row and a coarser level holds whole buckets older than
+    it (retention pruned the finer level), the finest such coarser level. Only levels
+    in `starts` are considered (v1 databases have no rollup tables, so only raw rows).
+    """
+    levels = [w for w in LEVELS if w in starts]
+    candidates = [w for w in levels if w <= step]
+    width = candidates[0] if candidates else 0
+    oldest = starts.get(width)
+    if oldest is not None and oldest > start:
+        for coarser in reversed([w for w in levels if w > width]):
+            if starts.get(coarser) is not None and starts[coarser] + coarser <= oldest:
+                return coarser
+    return width
+
+
+def to_epoch(value):
+    """Epoch seconds for a datetime or date/ISO string; naive values are taken as UTC, like to_epoch_seconds."""
+    try:
+        ts = pd.Timestamp(value)
+    except (ValueError, TypeError):
+        raise ValueError(f"Invalid date/time '{value}'; use e.g. 2024-05-01 or 2024-05-01T12:00:00Z")
+    if ts.tzinfo is None:
+        ts = ts.tz_localize('UTC')
+    return int(ts.timestamp())
+
+
+def station_history(station_id, start=None, end=None, resolution='auto'):
+    """
+    History for one station as a JSON-ready dict, or None if the station does not exist.
+    start/end are datetimes or date strings (default: the last HISTORY_DEFAULT_DAYS up to now).
+    Raises ValueError for an unparseable or empty range or an unknown resolution.
+    """
+    station = get_station(station_id)
+    if station is None:
+        return None
+    end_ts = to_epoch(end) if end else int(time.time())
+    start_ts = to_epoch(start) if start else end_ts - int(Config.HISTORY_DEFAULT_DAYS * 86400)
+    if start_ts >= end_ts:
+        raise ValueError("'from' must be earlier than 'to'")
+
+    step = parse_resolution(resolution)
+    if step is None:
+        step = auto_step(start_ts, end_ts)
+    width = choose_level(step, start_ts, get_history_start(station_id))
+    step = max(step, width)
+
+    df = load_station_history(station_id, start_ts, end_ts, step, width=width)
+    df['timestamp'] = pd.to_datetime(df.pop('ts_epoch'), unit='s')
+    df['mean_available'] = df['mean_available'].round(2)
+    df['operational_ratio'] = df['operational_ratio'].round(3)
+    return {
+        'station_id': station_id,
+        'from': pd.to_datetime(start_ts, unit='s'),
+        'to': pd.to_datetime(end_ts, unit='s'),
+        'step_seconds': step if step else None,
+        'source': {0: 'station_logs', 3600: 'hourly', 86400: 'daily'}[width],
+        'points': df.to_dict('records'),
+    }
+
+
+def apply_retention(raw_days=None, hourly_days=None):
+    """Prune with the configured (or given) retention; returns {table: rows deleted}."""
+    raw_days = Config.RAW_RETENTION_DAYS if raw_days is None else raw_days
+    hourly_days = Config.HOURLY_RETENTION_DAYS if hourly_days is None else hourly_days
+    if not raw_days and not hourly_days:
+        return {}
+    deleted = prune_history(raw_days, hourly_days)
+    if any(deleted.values()):
+        print("Retention pruned " + ", ".join(f"{n:,} rows from {table}" for table, n in deleted.items()))
+    return deleted
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Maintain station rollups and apply the retention policy')
+    parser.add_argument('--rebuild', action='store_true', help='Recompute hourly/daily rollups from raw rows')
+    parser.add_argument('--prune', action='store_true', help='Delete rows past the retention windows')
+    parser.add_argument('--raw-days', type=float, help='Days of raw rows to keep (default RAW_RETENTION_DAYS)')
+    parser.add_argument('--hourly-days', type=float, help='Days of hourly rollups to keep (default HOURLY_RETENTION_DAYS)')
+    args = parser.parse_args()
+
+    init_db()
+    if args.rebuild:
+        t0 = time.perf_counter()
+        n = rebuild_rollups()
+        print(f"Rebuilt rollups for {n} stations in {time.perf_counter() - t0:.2f}s.")
+    if args.prune:
+        deleted = apply_retention(args.raw_days, args.hourly_days)
+        if not deleted:
+            print("Nothing to prune (retention is off or no rows are old enough).")
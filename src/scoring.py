@@ -0,0 +1,118 @@
+"""
+Batch scoring of all stations into the station_forecasts table.
+
+Model inputs only change when the collector writes a new batch, so rather than
+running the LSTM on every /predict request, score_stations() runs it once per
+data change: it finds stations whose stored forecast is missing, older than
+their newest log row or produced by another model version, reads their last
+SEQ_LENGTH rows and scores them in batches. /predict then serves the stored row
+by primary key and only falls back to on-demand inference when it is stale.
+
+The collector calls ForecastScorer.refresh() after each cycle (Config.SCORE_AFTER_COLLECT).
+It can also run on its own, once or on a schedule:
+
+  PYTHONPATH="." python src/scoring.py            # score stale stations once
+  PYTHONPATH="." python src/scoring.py --all      # rescore every station
+  PYTHONPATH="." python src/scoring.py --loop     # poll for new data every --interval seconds
+
+Stored forecasts come from the windowed model. With STATEFUL_INFERENCE the
+on-demand fallback may differ slightly between re-primes (see src/streaming_inference.py).
+"""
+
+import argparse
+import time
+
+from src.config import Config
+from src.db import (init_db, load_recent_history, save_forecasts, get_stale_forecast_stations,
+                    get_log_markers, get_latest_log_id, to_epoch_seconds)
+from src.api.utils import load_inference_artifacts, get_model_version, batch_features, denormalize_ports, model_file
+from src.inference import InferenceRuntime
+
+
+def score_stations(runtime, preprocessor, model_version, station_ids=None):
+    """
+    Score station_ids with runtime (an InferenceRuntime) (default: every station with a stale forecast) and upsert station_forecasts.
+    Stations with fewer than SEQ_LENGTH rows are skipped. Returns the number of forecasts written.
+    """
+    if station_ids is None:
+        station_ids = get_stale_forecast_stations(model_version)
+    if not station_ids:
+        return 0
+    seq_length = Config.SEQ_LENGTH
+
+    history = load_recent_history(station_ids, seq_length)
+    counts = history.groupby('station_id', sort=False)['timestamp'].transform('size')
+    history = history[counts >= seq_length].reset_index(drop=True)
+    if history.empty:
+        return 0
+
+    last_rows = history.groupby('station_id', sort=False).tail(1)
+    scored_ids = last_rows['station_id'].astype(int).tolist()
+    input_ts = to_epoch_seconds(last_rows['timestamp']).tolist()
+
+    # The runtime runs the windows in SCORING_BATCH_SIZE chunks
+    ports = denormalize_ports(runtime.predict(batch_features(history, preprocessor, seq_length)), preprocessor)
+
+    scored_at = int(time.time())
+    save_forecasts([
+        {
+            'station_id': sid,
+            'predicted_available_ports': float(p),
+            'input_ts_epoch': int(ts),
+            'model_version': model_version,
+            'scored_at': scored_at,
+        }
+        for sid, p, ts in zip(scored_ids, ports, input_ts)
+    ])
+    return len(scored_ids)
+
+
+class ForecastScorer:
+    """Keeps the model loaded between scoring runs and reloads it when the weights file changes."""
+
+    def __init__(self):
+        self.runtime = None
+        self.preprocessor = None
+        self.model_version = None
+
+    def refresh(self, rescore_all=False):
+        try:
+            version = get_model_version()
+        except FileNotFoundError:
+            print(f"No model at {model_file()}; skipping forecast scoring.")
+            return 0
+        if version != self.model_version:
+            model, self.preprocessor = load_inference_artifacts()
+            self.runtime = InferenceRuntime(model)
+            self.model_version = version
+
+        t0 = time.perf_counter()
+        station_ids = sorted(get_log_markers()) if rescore_all else None
+        n = score_stations(self.runtime, self.preprocessor, self.model_version, station_ids=station_ids)
+        if n:
+            print(f"Scored {n} station forecasts in {time.perf_counter() - t0:.2f}s (model {self.model_version}).")
+        return n
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Batch-score station forecasts into station_forecasts')
+    parser.add_argument('--all', action='store_true', help='Rescore every station, not only stale ones')
+    parser.add_argument('--loop', action='store_true', help='Keep running, scoring whenever new data arrives')
+    parser.add_argument('--interval', type=float, default=60, help='Seconds between checks with --loop')
+    args = parser.parse_args()
+
+    init_db()
+    scorer = ForecastScorer()
+    scorer.refresh(rescore_all=args.all)
+    last_marker = get_latest_log_id()
+    while args.loop:
+        time.sleep(args.interval)
+        marker = get_latest_log_id()
+        # Also picks up a retrained model: refresh() compares the weights hash
+        try:
+            retrained = get_model_version() != scorer.model_version
+        except FileNotFoundError:
+            retrained = False
+        if marker != last_marker or retrained:
+            scorer.refresh()
+            last_marker = marker
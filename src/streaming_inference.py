@@ -0,0 +1,158 @@
+"""
+Stateful streaming inference for the recurrent models (MODEL_ARCH lstm or gru).
+
+The windowed model reruns the LSTM over the last SEQ_LENGTH rows on every call,
+even though consecutive calls for a station share SEQ_LENGTH - 1 of them.
+StatefulPredictor keeps each station's (h, c) in memory and advances it by only
+the rows that arrived since the previous call. With one new observation, a
+prediction costs one LSTM step plus the fc head.
+
+Equivalence with the windowed model: priming over a window from a zero state
+gives exactly the windowed prediction. Each later step carries state that has
+seen more than SEQ_LENGTH rows, so a model trained only on fixed windows drifts.
+The state is therefore re-primed from the latest window every `reprime_every`
+steps (Config.STATEFUL_REPRIME_EVERY; 1 reproduces the windowed model exactly),
+and the paired training variant
+
+  PYTHONPATH="." python src/train.py --stateful-steps 12
+
+fits the model on windows of SEQ_LENGTH + 11 rows with a loss after every step
+from SEQ_LENGTH onwards - exactly the context lengths a re-prime interval of 12
+produces at serving time. check_equivalence() replays real history through both
+paths and reports their difference and their MAE against the observed ports:
+
+  PYTHONPATH="." python src/streaming_inference.py --station 1
+
+After a restart there is no state in memory. The first call for each station
+primes from its last window, so no separate recovery step is needed.
+"""
+
+import argparse
+import threading
+
+import numpy as np
+import pandas as pd
+import torch
+
+from src.config import Config
+from src.api.utils import format_prediction_input
+
+
+class StatefulPredictor:
+    def __init__(self, model, preprocessor, seq_length=None, reprime_every=None):
+        self.model = model
+        self.preprocessor = preprocessor
+        self.seq_length = seq_length or Config.SEQ_LENGTH
+        self.reprime_every = reprime_every or Config.STATEFUL_REPRIME_EVERY
+        # station_id -> {'state': (h, c), 'last_ts': Timestamp, 'steps': int, 'prediction': float}
+        self.stations = {}
+        # _lock guards the dicts; a station's lock is held through its model.step, so
+        # calls for one station advance its state in order while other stations run at once
+        self._lock = threading.Lock()
+        self._station_locks = {}
+
+    def reset(self, station_id=None):
+        """Forget one station's state (or all of them); the next call re-primes."""
+        with self._lock:
+            if station_id is None:
+                self.stations.clear()
+            else:
+                self.stations.pop(station_id, None)
+
+    def predict(self, station_id, recent):
+        """
+        Normalized prediction for the row after `recent`.
+
+        recent: DataFrame of the station's latest rows (at least SEQ_LENGTH, oldest first),
+        as returned by load_history. Only rows newer than the last call are fed to the LSTM.
+        """
+        recent = recent.tail(self.seq_length)
+        timestamps = pd.to_datetime(recent['timestamp'])
+        last_ts = timestamps.iloc[-1]
+
+        with self._station_lock(station_id):
+            with self._lock:
+                entry = self.stations.get(station_id)
+            if entry is not None and last_ts == entry['last_ts']:
+                return entry['prediction']
+
+            new_rows = None
+            if entry is not None and entry['steps'] + 1 < self.reprime_every:
+                mask = (timestamps > entry['last_ts']).to_numpy()
+                # A gap as long as the window means the carried state is no longer relevant
+                if mask.any() and mask.sum() < self.seq_length:
+                    new_rows = recent[mask]
+
+            with torch.inference_mode():
+                if new_rows is None:
+                    prediction, state = self.model.step(self._tensor(recent))
+                    steps = 0
+                else:
+                    prediction, state = self.model.step(self._tensor(new_rows), entry['state'])
+                    steps = entry['steps'] + len(new_rows)
+
+            value = prediction.item()
+            with self._lock:
+                self.stations[station_id] = {'state': state, 'last_ts': last_ts, 'steps': steps, 'prediction': value}
+            return value
+
+    def _station_lock(self, station_id):
+        with self._lock:
+            return self._station_locks.setdefault(station_id, threading.Lock())
+
+    def _tensor(self, rows):
+        return format_prediction_input(rows.to_dict('records'), self.preprocessor)
+
+
+def check_equivalence(model, preprocessor, history, reprime_every=None, seq_length=None):
+    """
+    Replay a station's history through both the windowed and the stateful predictor.
+
+    Returns max/mean absolute difference in denormalized ports, the share of steps
+    where the rounded port counts disagree, and each path's MAE against the next
+    observed value.
+    """
+    seq_length = seq_length or Config.SEQ_LENGTH
+    stateful = StatefulPredictor(model, preprocessor, seq_length=seq_length, reprime_every=reprime_every)
+    avail_min = preprocessor.scaler.data_min_[0]
+    avail_max = preprocessor.scaler.data_max_[0]
+
+    windowed_preds, stateful_preds = [], []
+    actual = history['available_ports'].to_numpy(dtype=float)[seq_length:]
+    with torch.inference_mode():
+        for end in range(seq_length, len(history) + 1):
+            window = history.iloc[end - seq_length:end]
+            windowed_preds.append(model(format_prediction_input(window.to_dict('records'), preprocessor)).item())
+            stateful_preds.append(stateful.predict(0, window))
+
+    scale = avail_max - avail_min
+    windowed = np.array(windowed_preds) * scale + avail_min
+    streamed = np.array(stateful_preds) * scale + avail_min
+    diff = np.abs(windowed - streamed)
+    n = len(actual)
+    return {
+        'steps': len(diff),
+        'reprime_every': stateful.reprime_every,
+        'max_abs_diff_ports': float(diff.max()) if len(diff) else 0.0,
+        'mean_abs_diff_ports': float(diff.mean()) if len(diff) else 0.0,
+        'rounded_mismatch_rate': float(np.mean(np.round(windowed) != np.round(streamed))) if len(diff) else 0.0,
+        'windowed_mae_ports': float(np.mean(np.abs(windowed[:n] - actual))) if n else 0.0,
+        'stateful_mae_ports': float(np.mean(np.abs(streamed[:n] - actual))) if n else 0.0,
+    }
+
+
+if __name__ == "__main__":
+    from src.api.utils import load_inference_artifacts
+    from src.db import load_history
+
+    parser = argparse.ArgumentParser(description='Compare stateful streaming inference with the windowed model')
+    parser.add_argument('--station', type=int, required=True, help='Station id to replay')
+    parser.add_argument('--reprime-every', type=int, nargs='+', default=[1, 6, 12, 48, 10**9],
+                        help='Re-prime intervals to compare (a huge value means never re-prime)')
+    args = parser.parse_args()
+
+    model, preprocessor = load_inference_artifacts()
+    history = load_history(station_id=args.station)
+    for n in args.reprime_every:
+        stats = check_equivalence(model, preprocessor, history.copy(), reprime_every=n)
+        print(stats)
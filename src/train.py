@@ -1,28 +1,258 @@
 import torch
 import torch.nn as nn
 import torch.optim as optim
-from torch.utils.data import DataLoader
+from torch.nn.parallel import DistributedDataParallel
+from torch.utils.data import DataLoader, DistributedSampler
 from sklearn.model_selection import train_test_split
+import contextlib
 import os
+import time
 
-from src.db import load_history, init_db
-from src.preprocessing import DataPreprocessor, create_sequences
-from src.dataset import TimeSeriesDataset
-from src.model import EVChargingLSTM
+from src.db import get_history_fingerprint, init_db
+from src.preprocessing import DataPreprocessor
+from src.dataset import WindowDataset
+from src.feature_cache import cache_key, load_features
+from src.model import build_model
 from src.config import Config
+from src.profiling import RunLog, EpochTimer, make_torch_profiler
+from src.vocab import StationVocab
+from src.checkpoint import CheckpointWriter, bundle_path, save_bundle, save_scaler, save_state, snapshot_state
+from src import distributed
 
 import argparse
+import datetime
 
-def train_model(mode='global', station_id=None):
-    # 1. Load Data
+def configure_threads():
+    """Pin torch intra-/inter-op thread pools from Config (0 keeps the torch default)."""
+    if Config.TORCH_THREADS > 0:
+        torch.set_num_threads(Config.TORCH_THREADS)
+    if Config.TORCH_INTEROP_THREADS > 0:
+        try:
+            torch.set_num_interop_threads(Config.TORCH_INTEROP_THREADS)
+        except RuntimeError:
+            # Can only be set once, before any inter-op parallel work has started
+            pass
+
+def make_loader(dataset, shuffle=False):
+    """DataLoader honoring the worker/prefetch settings in Config; sharded per rank when distributed."""
+    kwargs = {}
+    if Config.NUM_WORKERS > 0:
+        kwargs = dict(
+            num_workers=Config.NUM_WORKERS,
+            persistent_workers=True,
+            prefetch_factor=Config.PREFETCH_FACTOR,
+        )
+    if distributed.is_enabled():
+        # Pads the shards to equal length, so every rank runs the same number of batches
+        kwargs['sampler'] = DistributedSampler(dataset, shuffle=shuffle)
+        shuffle = False
+    return DataLoader(dataset, batch_size=Config.BATCH_SIZE, shuffle=shuffle, **kwargs)
+
+def maybe_compile(model):
+    """Return a torch.compile'd view of model when enabled and supported, else model itself."""
+    if not Config.COMPILE_MODEL or not hasattr(torch, 'compile'):
+        return model
+    try:
+        return torch.compile(model)
+    except Exception as e:
+        print(f"torch.compile unavailable, training eagerly: {e}")
+        return model
+
+def window_length():
+    """Rows per training sequence; longer when training for stateful serving."""
+    return Config.SEQ_LENGTH + max(0, Config.STATEFUL_TRAIN_STEPS - 1)
+
+def checkpoint_params(station_emb_dim):
+    """Hyperparameters stored in checkpoint bundles, enough to rebuild the model for inference."""
+    return {
+        'arch': Config.MODEL_ARCH.lower(),
+        'hidden_dim': Config.HIDDEN_DIM,
+        'num_layers': Config.NUM_LAYERS,
+        'station_emb_dim': station_emb_dim,
+        'seq_length': Config.SEQ_LENGTH,
+    }
+
+def split_windows(features, starts, window, train_share=0.8):
+    """Chronological train/validation datasets: the first train_share of the windows, then the rest."""
+    split_idx = int(len(starts) * train_share)
+    return WindowDataset(features, starts[:split_idx], window), WindowDataset(features, starts[split_idx:], window)
+
+def batch_loss(model, criterion, seq, target):
+    """
+    Loss on the final step for the windowed model. With STATEFUL_TRAIN_STEPS the loss
+    covers every step from SEQ_LENGTH onwards, matching the context lengths that
+    src/streaming_inference.py produces between re-primes.
+    """
+    if Config.STATEFUL_TRAIN_STEPS > 1:
+        outputs = model.forward_all(seq)[:, Config.SEQ_LENGTH - 1:, 0]
+        targets = torch.cat([seq[:, 1:, 0], target.unsqueeze(1)], dim=1)[:, Config.SEQ_LENGTH - 1:]
+        return criterion(outputs, targets)
+    output = model(seq)
+    return criterion(output.squeeze(), target)
+
+def make_scheduler(optimizer):
+    """LR scheduler named by Config.LR_SCHEDULER, or None."""
+    name = Config.LR_SCHEDULER.lower()
+    if name == 'plateau':
+        return optim.lr_scheduler.ReduceLROnPlateau(optimizer, factor=Config.LR_PLATEAU_FACTOR,
+                                                    patience=Config.LR_PLATEAU_PATIENCE)
+    if name == 'cosine':
+        return optim.lr_scheduler.CosineAnnealingLR(optimizer, T_max=Config.EPOCHS, eta_min=Config.LEARNING_RATE * 0.01)
+    if name in ('', 'none'):
+        return None
+    raise ValueError(f"Unknown LR_SCHEDULER '{Config.LR_SCHEDULER}'; use plateau, cosine or none")
+
+def fit(model, train_loader, val_loader, save_checkpoint, label, run_log=None, profiler=None, log_prefix=""):
+    """
+    Shared training loop for global and per-station models.
+
+    The best weights are kept in memory and passed to save_checkpoint(state_dict)
+    once after training, or after every improvement from a background writer with
+    CHECKPOINT_MODE=async; the model ends with the best weights loaded. Training
+    stops early after EARLY_STOP_PATIENCE epochs without improvement, and the LR
+    follows LR_SCHEDULER. Per-epoch timings (data-loader wait, forward/backward,
+    optimizer step, validation and checkpoint snapshot) and throughput go to
+    run_log when one is enabled.
+
+    Gradients are accumulated over Config.GRAD_ACCUM_STEPS batches per optimizer
+    step. Checkpoints always receive the original (uncompiled) module.
+
+    When distributed, model is the DistributedDataParallel wrapper: losses and
+    throughput are reduced over all ranks, and only rank 0 saves checkpoints.
+    """
+    run_log = run_log or RunLog()
+    if not getattr(model, 'module', model).trainable:
+        # Baselines such as the persistence model have nothing to fit; save them as built
+        save_checkpoint(snapshot_state(model))
+        run_log.write('fit_end', model=label, best_val_loss=None)
+        return None
+    criterion = nn.MSELoss()
+    optimizer = optim.Adam(model.parameters(), lr=Config.LEARNING_RATE)
+    scheduler = make_scheduler(optimizer)
+    step_model = maybe_compile(model)
+    accum_steps = max(1, Config.GRAD_ACCUM_STEPS)
+    writer = CheckpointWriter(save_checkpoint) if Config.CHECKPOINT_MODE == 'async' and distributed.is_main() else None
+
+    best_loss = float('inf')
+    best_state = None
+    stale_epochs = 0
+    epochs_run = 0
+    logged_write_s = 0.0
+    try:
+        for epoch in range(Config.EPOCHS):
+            timer = EpochTimer()
+            if isinstance(train_loader.sampler, DistributedSampler):
+                train_loader.sampler.set_epoch(epoch)
+            model.train()
+            train_loss = 0
+            optimizer.zero_grad()
+            for i, (seq, target) in enumerate(timer.iter_batches(train_loader)):
+                stepping = (i + 1) % accum_steps == 0 or i + 1 == len(train_loader)
+                # Under DDP, micro-batches that do not step skip the gradient all-reduce
+                ddp = isinstance(model, DistributedDataParallel)
+                sync = model.no_sync() if ddp and not stepping else contextlib.nullcontext()
+                with timer.section('forward_backward'), sync:
+                    loss = batch_loss(step_model, criterion, seq, target)
+                    (loss / accum_steps).backward()
+                if stepping:
+                    with timer.section('optimizer_step'):
+                        optimizer.step()
+                        optimizer.zero_grad()
+                train_loss += loss.item()
+                timer.samples += len(seq)
+                if profiler is not None:
+                    profiler.step()
+
+            epochs_run = epoch + 1
+            model.eval()
+            val_loss = 0
+            with timer.section('validation'), torch.no_grad():
+                for seq, target in val_loader:
+                    loss = batch_loss(step_model, criterion, seq, target)
+                    val_loss += loss.item()
+
+            avg_train, avg_val = distributed.all_reduce_mean(train_loss / len(train_loader), val_loss / len(val_loader))
+            throughput, = distributed.all_reduce_sum(timer.throughput())
+            lr = optimizer.param_groups[0]['lr']
+            if not run_log.enabled:
+                # With a run log the epoch goes there instead of stdout
+                distributed.print0(f"{log_prefix}Epoch {epoch+1}/{Config.EPOCHS} | Train Loss: {avg_train:.4f} | Val Loss: {avg_val:.4f} | "
+                                   f"LR {lr:.2e} | {throughput:.0f} samples/s")
+
+            # Every rank sees the same reduced losses, so they all stop and step the scheduler together
+            improved = avg_val < best_loss - Config.EARLY_STOP_MIN_DELTA
+            if improved:
+                best_loss = avg_val
+                stale_epochs = 0
+                if distributed.is_main():
+                    with timer.section('snapshot'):
+                        best_state = snapshot_state(model)
+                        if writer is not None:
+                            writer.submit(best_state)
+            else:
+                stale_epochs += 1
+            if isinstance(scheduler, optim.lr_scheduler.ReduceLROnPlateau):
+                scheduler.step(avg_val)
+            elif scheduler is not None:
+                scheduler.step()
+
+            if writer is not None:
+                # Background writes that finished during this epoch
+                timer.sections['checkpoint_write'] = writer.write_s - logged_write_s
+                logged_write_s = writer.write_s
+            run_log.write('epoch', model=label, epoch=epoch + 1, train_loss=avg_train, val_loss=avg_val,
+                          improved=improved, lr=lr, world_size=distributed.world_size(),
+                          global_samples_per_sec=round(throughput, 1), **timer.summary())
+
+            if Config.EARLY_STOP_PATIENCE and stale_epochs >= Config.EARLY_STOP_PATIENCE:
+                distributed.print0(f"{log_prefix}Early stopping after epoch {epoch+1}: no improvement for {stale_epochs} epochs")
+                break
+    finally:
+        if writer is not None:
+            writer.close()
+
+    write_s = writer.write_s if writer is not None else 0.0
+    if best_state is not None:
+        # Leave the best weights in the model; without the background writer this is the only write
+        getattr(model, 'module', model).load_state_dict(best_state)
+        if writer is None:
+            t0 = time.perf_counter()
+            save_checkpoint(best_state)
+            write_s = time.perf_counter() - t0
+    run_log.write('fit_end', model=label, best_val_loss=best_loss if epochs_run else None, epochs=epochs_run,
+                  checkpoint_write_s=round(write_s, 4))
+    return best_loss
+
+def train_model(mode='global', station_id=None, run_log=None, profile_steps=0, profile_dir='logs/profiles', warm_start=False):
+    configure_threads()
+
+    # 1. Check the data; features come from the on-disk cache (src/feature_cache.py)
     init_db()
-    df = load_history()
-    
-    if len(df) < Config.SEQ_LENGTH + 20:
-        print("Not enough data to train. Run data_collector.py or scripts/generate_large_dataset.py first.")
+    fingerprint = get_history_fingerprint(station_id if mode == 'per_station' else None)
+    records = sum(rows for rows, _, _ in fingerprint.values())
+
+    if records < Config.SEQ_LENGTH + 20:
+        distributed.print0("Not enough data to train. Run data_collector.py or scripts/generate_large_dataset.py first.")
         return
 
-    print(f"Total records available: {len(df)}")
+    distributed.print0(f"Total records available: {records}")
+    # Only rank 0 writes the run log when training is distributed
+    run_log = run_log if run_log is not None and distributed.is_main() else RunLog()
+    run_log.write('run_start', mode=mode, station_id=station_id, records=records, epochs=Config.EPOCHS,
+                  world_size=distributed.world_size(),
+                  batch_size=Config.BATCH_SIZE, grad_accum_steps=Config.GRAD_ACCUM_STEPS,
+                  learning_rate=Config.LEARNING_RATE, num_workers=Config.NUM_WORKERS,
+                  torch_threads=torch.get_num_threads(), interop_threads=torch.get_num_interop_threads(),
+                  compile=Config.COMPILE_MODEL, stateful_train_steps=Config.STATEFUL_TRAIN_STEPS)
+
+    def start_profiler(label):
+        if not profile_steps:
+            return None
+        trace_path = os.path.join(profile_dir, f"trace_{label}.json")
+        profiler = make_torch_profiler(trace_path, profile_steps)
+        profiler.start()
+        run_log.write('profiler_trace', model=label, path=trace_path, steps=profile_steps)
+        return profiler
 
     if mode == 'per_station':
         # Train a model per station (either specific station_id or iterate all)
@@ -35,133 +265,111 @@ def train_model(mode='global', station_id=None):
 
         for sid in stations:
             print(f"\nTraining model for Station {sid}...")
-            df_s = df[df['station_id'] == sid].copy()
-            if len(df_s) < Config.SEQ_LENGTH + 20:
-                print(f"  - Skipping Station {sid}: insufficient data ({len(df_s)} records)")
+            rows = fingerprint.get(sid, (0, 0, 0))[0]
+            if rows < Config.SEQ_LENGTH + 20:
+                print(f"  - Skipping Station {sid}: insufficient data ({rows} records)")
                 continue
 
-            preprocessor = DataPreprocessor()
-            preprocessor.fit(df_s)
-            df_processed = preprocessor.transform(df_s)
-
             # For per-station models we do NOT include station_id and do not use embeddings
-            X, y = create_sequences(df_processed, Config.SEQ_LENGTH, include_station_id=False)
-            split_idx = int(len(X) * 0.8)
-            X_train, X_val = X[:split_idx], X[split_idx:]
-            y_train, y_val = y[:split_idx], y[split_idx:]
-
-            train_dataset = TimeSeriesDataset(X_train, y_train)
-            val_dataset = TimeSeriesDataset(X_val, y_val)
+            preprocessor = DataPreprocessor()
+            features, starts = load_features(preprocessor, station_id=sid, include_station_id=False,
+                                             window=window_length(), fingerprint={sid: fingerprint[sid]})
+            train_dataset, val_dataset = split_windows(features, starts, window_length())
 
-            train_loader = DataLoader(train_dataset, batch_size=Config.BATCH_SIZE, shuffle=True)
-            val_loader = DataLoader(val_dataset, batch_size=Config.BATCH_SIZE)
+            train_loader = make_loader(train_dataset, shuffle=True)
+            val_loader = make_loader(val_dataset)
 
             # Per-station model: no station embedding (model receives only numeric+time features)
-            model = EVChargingLSTM(
+            model = build_model(
                 hidden_dim=Config.HIDDEN_DIM,
                 num_layers=Config.NUM_LAYERS,
                 station_emb_dim=0,  # disable station embedding
-                num_stations=1
+                num_stations=1,
+                dropout=Config.DROPOUT
             )
-            criterion = nn.MSELoss()
-            optimizer = optim.Adam(model.parameters(), lr=Config.LEARNING_RATE)
-
-            best_loss = float('inf')
-            for epoch in range(Config.EPOCHS):
-                model.train()
-                train_loss = 0
-                for seq, target in train_loader:
-                    optimizer.zero_grad()
-                    output = model(seq)
-                    loss = criterion(output.squeeze(), target)
-                    loss.backward()
-                    optimizer.step()
-                    train_loss += loss.item()
-
-                model.eval()
-                val_loss = 0
-                with torch.no_grad():
-                    for seq, target in val_loader:
-                        output = model(seq)
-                        loss = criterion(output.squeeze(), target)
-                        val_loss += loss.item()
-
-                avg_train = train_loss / len(train_loader)
-                avg_val = val_loss / len(val_loader)
-                print(f"  Epoch {epoch+1}/{Config.EPOCHS} | Train Loss: {avg_train:.4f} | Val Loss: {avg_val:.4f}")
-
-                if avg_val < best_loss:
-                    best_loss = avg_val
-                    path = f"models/model_station_{sid}.pt"
-                    if not os.path.exists("models"): os.makedirs("models")
-                    torch.save(model.state_dict(), path)
-                    # Save scaler for this station
-                    import joblib
-                    scaler_path = f"models/scaler_station_{sid}.joblib"
-                    joblib.dump(preprocessor.scaler, scaler_path)
-                    print(f"    -> Saved {path} and {scaler_path}")
+
+            def save_checkpoint(state, sid=sid, scaler=preprocessor.scaler):
+                path = os.path.join(os.path.dirname(Config.MODEL_PATH), f"model_station_{sid}.pt")
+                save_state(state, path)
+                save_bundle(bundle_path(path), state, scaler, checkpoint_params(0))
+                print(f"    -> Saved {path}")
+
+            profiler = start_profiler(f"station_{sid}")
+            best_loss = fit(model, train_loader, val_loader, save_checkpoint, label=f"station_{sid}",
+                            run_log=run_log, profiler=profiler, log_prefix="  ")
+            if profiler is not None:
+                profiler.stop()
+            if best_loss is None or best_loss < float('inf'):
+                # The scaler does not change during training; write it once next to the weights
+                scaler_path = os.path.join(os.path.dirname(Config.MODEL_PATH), f"scaler_station_{sid}.joblib")
+                save_scaler(preprocessor.scaler, scaler_path)
+                print(f"    -> Saved {scaler_path}")
 
     else:
         # Global model using all data (includes station_id as a feature)
-        print("Training global model on all stations...")
+        distributed.print0(f"Training global model on all stations ({distributed.world_size()} process(es))...")
         preprocessor = DataPreprocessor()
-        preprocessor.fit(df)
-        df_processed = preprocessor.transform(df)
-        preprocessor.save()
+        vocab = known = entry = None
+        if distributed.is_main():
+            # Extend the saved vocabulary rather than rebuilding it, so known stations keep their embedding rows
+            vocab = StationVocab.load(Config.VOCAB_PATH) if os.path.exists(Config.VOCAB_PATH) else StationVocab()
+            known = len(vocab)
+            added = vocab.extend(fingerprint.keys())
+            print(f"Station vocabulary: {len(vocab) - 1} stations ({added} new) + OOV bucket")
+            preprocessor.vocab = vocab
 
-        # Global model: include station_id so model can use learned embeddings
-        X, y = create_sequences(df_processed, Config.SEQ_LENGTH, include_station_id=True)
-        split_idx = int(len(X) * 0.8)
-        X_train, X_val = X[:split_idx], X[split_idx:]
-        y_train, y_val = y[:split_idx], y[split_idx:]
+            # Global model: include station_id so model can use learned embeddings
+            features, starts = load_features(preprocessor, include_station_id=True, window=window_length(),
+                                             fingerprint=fingerprint)
+            entry = cache_key(preprocessor, None, True, window_length(), True)
+            os.makedirs(os.path.dirname(Config.MODEL_PATH), exist_ok=True)
+            preprocessor.save()
 
-        train_dataset = TimeSeriesDataset(X_train, y_train)
-        val_dataset = TimeSeriesDataset(X_val, y_val)
+        # Only rank 0 fits the scaler and extends the vocabulary; the other ranks open the cache entry it wrote
+        known, vocab, preprocessor.scaler, fingerprint, entry = distributed.broadcast_object(
+            (known, vocab, preprocessor.scaler, fingerprint, entry))
+        if not distributed.is_main():
+            preprocessor.vocab = vocab
+            features, starts = load_features(preprocessor, include_station_id=True, window=window_length(),
+                                             fit=False, fingerprint=fingerprint, key=entry)
+        train_dataset, val_dataset = split_windows(features, starts, window_length())
 
-        train_loader = DataLoader(train_dataset, batch_size=Config.BATCH_SIZE, shuffle=True)
-        val_loader = DataLoader(val_dataset, batch_size=Config.BATCH_SIZE)
+        train_loader = make_loader(train_dataset, shuffle=True)
+        val_loader = make_loader(val_dataset)
 
-        # Use global station count so embeddings are correctly sized
-        num_stations = int(df['station_id'].max()) + 1 if 'station_id' in df.columns else 100
-        model = EVChargingLSTM(
+        # One embedding row per known station plus the OOV bucket
+        model = build_model(
             hidden_dim=Config.HIDDEN_DIM,
             num_layers=Config.NUM_LAYERS,
             station_emb_dim=Config.STATION_EMBED_DIM,
-            num_stations=num_stations
+            num_stations=known if warm_start else len(vocab),
+            dropout=Config.DROPOUT,
+            oov_rate=Config.STATION_OOV_RATE
         )
-        criterion = nn.MSELoss()
-        optimizer = optim.Adam(model.parameters(), lr=Config.LEARNING_RATE)
-
-        best_loss = float('inf')
-        for epoch in range(Config.EPOCHS):
-            model.train()
-            train_loss = 0
-            for seq, target in train_loader:
-                optimizer.zero_grad()
-                output = model(seq)
-                loss = criterion(output.squeeze(), target)
-                loss.backward()
-                optimizer.step()
-                train_loss += loss.item()
+        if warm_start:
+            # Continue from the saved weights, growing the embedding for new stations
+            state = torch.load(Config.MODEL_PATH, map_location=torch.device('cpu'))
+            if state.get('station_embedding.weight', torch.empty(0)).shape[:1] != (known,):
+                raise ValueError(f"{Config.MODEL_PATH} was not trained with the vocabulary in {Config.VOCAB_PATH}; "
+                                 "retrain without --warm-start")
+            model.load_state_dict(state)
+            model.grow_station_embedding(len(vocab))
+            distributed.print0(f"Warm-starting from {Config.MODEL_PATH}")
 
-            model.eval()
-            val_loss = 0
-            with torch.no_grad():
-                for seq, target in val_loader:
-                    output = model(seq)
-                    loss = criterion(output.squeeze(), target)
-                    val_loss += loss.item()
-
-            avg_train = train_loss / len(train_loader)
-            avg_val = val_loss / len(val_loader)
+        def save_checkpoint(state):
+            save_state(state, Config.MODEL_PATH)
+            save_bundle(bundle_path(Config.MODEL_PATH), state, preprocessor.scaler,
+                        checkpoint_params(Config.STATION_EMBED_DIM))
+            print("  -> Model Saved")
 
-            print(f"Epoch {epoch+1}/{Config.EPOCHS} | Train Loss: {avg_train:.4f} | Val Loss: {avg_val:.4f}")
+        if distributed.is_enabled() and model.trainable:
+            # Replicas start from rank 0's weights; gradients are averaged across ranks every backward pass
+            model = DistributedDataParallel(model)
 
-            if avg_val < best_loss:
-                best_loss = avg_val
-                if not os.path.exists("models"): os.makedirs("models")
-                torch.save(model.state_dict(), Config.MODEL_PATH)
-                print("  -> Model Saved")
+        profiler = start_profiler("global") if distributed.is_main() else None
+        fit(model, train_loader, val_loader, save_checkpoint, label="global", run_log=run_log, profiler=profiler)
+        if profiler is not None:
+            profiler.stop()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
@@ -171,14 +379,95 @@ if __name__ == "__main__":
     parser.add_argument('--batch-size', type=int, help='Override batch size')
     parser.add_argument('--lr', type=float, help='Override learning rate')
     parser.add_argument('--verbose', action='store_true', help='Enable verbose logging')
+    parser.add_argument('--run-log', type=str, help='Write per-epoch timings and throughput to this JSON-lines file')
+    parser.add_argument('--profile', action='store_true', help='Record a torch.profiler Chrome trace (implies a run log)')
+    parser.add_argument('--profile-steps', type=int, default=20, help='Number of training steps captured by --profile')
+    parser.add_argument('--profile-dir', type=str, default='logs/profiles', help='Directory for --profile traces')
+    parser.add_argument('--throughput', action='store_true',
+                        help='Multi-core preset: large batches with scaled LR, loader workers, pinned threads, torch.compile')
+    parser.add_argument('--num-workers', type=int, help='DataLoader worker processes')
+    parser.add_argument('--threads', type=int, help='torch intra-op threads')
+    parser.add_argument('--interop-threads', type=int, help='torch inter-op threads')
+    parser.add_argument('--grad-accum', type=int, help='Batches to accumulate per optimizer step')
+    parser.add_argument('--compile', action='store_true', help='Train through torch.compile when available')
+    parser.add_argument('--stateful-steps', type=int,
+                        help='Train for stateful serving with this re-prime interval (see src/streaming_inference.py)')
+    parser.add_argument('--scale-lr', action='store_true',
+                        help='Scale the learning rate by sqrt(effective batch / BASE_BATCH_SIZE), the square-root rule suited to Adam')
+    parser.add_argument('--warm-start', action='store_true',
+                        help='Global mode: continue from the saved model, growing the station embedding for new stations')
+    parser.add_argument('--patience', type=int, help='Stop after this many epochs without improvement (0 = run all epochs)')
+    parser.add_argument('--lr-scheduler', choices=['plateau', 'cosine', 'none'], help='Learning-rate schedule')
+    parser.add_argument('--checkpoint-mode', choices=['end', 'async'],
+                        help='Write the best weights once at the end, or also on every improvement from a background thread')
+    parser.add_argument('--distributed', action='store_true',
+                        help='Global mode: data-parallel training across the processes started by scripts/launch_distributed.py or torchrun')
+    parser.add_argument('--model-dir', type=str,
+                        help='Write the model, scaler and station vocabulary here instead of models/')
     args = parser.parse_args()
 
+    if args.distributed:
+        if args.mode != 'global':
+            parser.error('--distributed trains the global model; per-station models run in parallel via scripts/train_all_per_station.py')
+        if args.stateful_steps or Config.STATEFUL_TRAIN_STEPS > 1:
+            parser.error('stateful training (--stateful-steps) is not supported with --distributed')
+        distributed.init()
+
+    if args.throughput:
+        # Keep a few cores feeding batches and give the rest to the intra-op pool
+        cores = os.cpu_count() or 1
+        workers = min(8, max(1, cores // 8))
+        Config.BATCH_SIZE = 512
+        Config.NUM_WORKERS = workers
+        Config.TORCH_THREADS = max(1, cores - workers)
+        Config.TORCH_INTEROP_THREADS = 2
+        Config.COMPILE_MODEL = True
+        args.scale_lr = True
+
     # Allow CLI overrides to Config
-    if args.epochs:
+    if args.epochs is not None:
         Config.EPOCHS = args.epochs
     if args.batch_size:
         Config.BATCH_SIZE = args.batch_size
     if args.lr:
         Config.LEARNING_RATE = args.lr
+    if args.num_workers is not None:
+        Config.NUM_WORKERS = args.num_workers
+    if args.threads:
+        Config.TORCH_THREADS = args.threads
+    if args.interop_threads:
+        Config.TORCH_INTEROP_THREADS = args.interop_threads
+    if args.grad_accum:
+        Config.GRAD_ACCUM_STEPS = args.grad_accum
+    if args.compile:
+        Config.COMPILE_MODEL = True
+    if args.patience is not None:
+        Config.EARLY_STOP_PATIENCE = args.patience
+    if args.lr_scheduler:
+        Config.LR_SCHEDULER = args.lr_scheduler
+    if args.checkpoint_mode:
+        Config.CHECKPOINT_MODE = args.checkpoint_mode
+    if args.model_dir:
+        Config.MODEL_PATH = os.path.join(args.model_dir, "model.pt")
+        Config.SCALER_PATH = os.path.join(args.model_dir, "scaler.joblib")
+        Config.VOCAB_PATH = os.path.join(args.model_dir, "station_vocab.json")
+    if args.stateful_steps:
+        Config.STATEFUL_TRAIN_STEPS = args.stateful_steps
+    if args.scale_lr:
+        effective_batch = Config.BATCH_SIZE * max(1, Config.GRAD_ACCUM_STEPS) * distributed.world_size()
+        Config.LEARNING_RATE *= (effective_batch / Config.BASE_BATCH_SIZE) ** 0.5
+        distributed.print0(f"Scaled learning rate to {Config.LEARNING_RATE:.5f} for effective batch {effective_batch}")
+
+    run_log_path = args.run_log
+    if args.profile and not run_log_path:
+        run_log_path = f"logs/train_run_{datetime.datetime.now():%Y%m%d_%H%M%S}.jsonl"
 
-    train_model(mode=args.mode, station_id=args.station)
\ No newline at end of file
+    train_model(
+        mode=args.mode,
+        station_id=args.station,
+        run_log=RunLog(run_log_path),
+        profile_steps=args.profile_steps if args.profile else 0,
+        profile_dir=args.profile_dir,
+        warm_start=args.warm_start,
+    )
+    distributed.cleanup()
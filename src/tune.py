@@ -0,0 +1,372 @@
+"""
+Parallel hyperparameter search for the global model with asynchronous successive halving (ASHA).
+
+Trials sample HIDDEN_DIM, NUM_LAYERS, DROPOUT, LEARNING_RATE, BATCH_SIZE and
+STATION_EMBED_DIM from SEARCH_SPACE and train in a pool of worker processes.
+Training is split into rungs of min_epochs * eta^k epochs (capped at max_epochs);
+whenever a worker frees up, the driver promotes a trial that finished a rung in
+the top 1/eta of that rung so far, and otherwise starts a new trial. Weak trials
+are never promoted, so most of the budget goes to the promising ones, and no
+worker waits for a rung to fill up.
+
+  PYTHONPATH="." python src/tune.py --trials 32 --workers 4 --max-epochs 9 --budget-minutes 60
+  PYTHONPATH="." python src/tune.py --trials 8 --max-epochs 3 --train-windows 20000   # quick look
+
+The features are prepared once through the feature cache (src/feature_cache.py)
+and every worker memory-maps the same files, so the data is loaded a single time
+and its pages are shared. Each epoch trains on a random sample of --train-windows
+windows and validates on a fixed, evenly spaced --val-windows subset of the last
+20%, which every trial shares. Trial state is checkpointed between rungs.
+
+The leaderboard (leaderboard.csv, best.json in --output-dir) ranks trials by the
+rung they reached and their best validation loss, with MAE in ports, parameter
+count and single-window / SCORING_BATCH_SIZE-window inference latency. Latency is
+measured after the search, one trial at a time from its checkpoint in this process,
+so the timings do not compete with training. The best trial is printed as
+environment overrides for src/train.py; models/ is not touched.
+"""
+
+import argparse
+import concurrent.futures
+import json
+import math
+import os
+import shutil
+import time
+
+import numpy as np
+import pandas as pd
+import torch
+import torch.nn as nn
+import torch.optim as optim
+from torch.utils.data import DataLoader
+
+from src.config import Config
+from src.dataset import WindowDataset
+from src.db import get_history_fingerprint, init_db
+from src.feature_cache import load_features
+from src.model import build_model
+from src.preprocessing import DataPreprocessor
+from src.train import batch_loss, window_length
+from src.vocab import StationVocab
+
+# Choices per hyperparameter; a (low, high) tuple is sampled log-uniformly
+SEARCH_SPACE = {
+    'hidden_dim': [32, 64, 96, 128],
+    'num_layers': [1, 2, 3],
+    'dropout': [0.0, 0.1, 0.2, 0.3],
+    'learning_rate': (1e-4, 1e-2),
+    'batch_size': [32, 64, 128, 256],
+    'station_embed_dim': [4, 8, 16],
+}
+
+# Config attribute (and environment variable) for each hyperparameter
+CONFIG_NAMES = {
+    'hidden_dim': 'HIDDEN_DIM',
+    'num_layers': 'NUM_LAYERS',
+    'dropout': 'DROPOUT',
+    'learning_rate': 'LEARNING_RATE',
+    'batch_size': 'BATCH_SIZE',
+    'station_embed_dim': 'STATION_EMBED_DIM',
+}
+
+
+def sample_params(rng):
+    params = {}
+    for name, space in SEARCH_SPACE.items():
+        if isinstance(space, tuple):
+            params[name] = float(math.exp(rng.uniform(math.log(space[0]), math.log(space[1]))))
+        else:
+            params[name] = space[rng.integers(len(space))]
+    if params['num_layers'] == 1:
+        # nn.LSTM applies dropout only between layers
+        params['dropout'] = 0.0
+    return {k: v.item() if hasattr(v, 'item') else v for k, v in params.items()}
+
+
+def rung_epochs(min_epochs, max_epochs, eta):
+    """Cumulative epochs at the end of each rung, e.g. (1, 9, 3) -> [1, 3, 9]."""
+    rungs = []
+    epochs = max(1, min_epochs)
+    while epochs < max_epochs:
+        rungs.append(epochs)
+        epochs *= eta
+    rungs.append(max_epochs)
+    return rungs
+
+
+class ASHA:
+    """Promotion bookkeeping for asynchronous successive halving."""
+
+    def __init__(self, rungs, eta):
+        self.rungs = rungs
+        self.eta = eta
+        self.losses = [{} for _ in rungs]
+        self.promoted = [set() for _ in rungs]
+
+    def report(self, trial_id, rung, loss):
+        self.losses[rung][trial_id] = loss
+
+    def next_promotion(self):
+        """(trial_id, rung) of a trial to train up to the next rung, or None. Higher rungs first."""
+        for rung in reversed(range(len(self.rungs) - 1)):
+            done = self.losses[rung]
+            for trial_id in sorted(done, key=done.get)[:len(done) // self.eta]:
+                if trial_id not in self.promoted[rung]:
+                    self.promoted[rung].add(trial_id)
+                    return trial_id, rung + 1
+        return None
+
+
+# Worker state, set once per process by _init_worker
+_worker = {}
+
+
+def _init_worker(features, starts, settings):
+    """features/starts are .npy paths to memory-map, or arrays when the feature cache is off."""
+    torch.set_num_threads(settings['threads'])
+    if isinstance(features, str):
+        features, starts = np.load(features, mmap_mode='r'), np.load(starts, mmap_mode='r')
+    _worker['features'] = features
+    split_idx = int(len(starts) * 0.8)
+    val = np.asarray(starts[split_idx:])
+    if settings['val_windows'] and len(val) > settings['val_windows']:
+        val = val[np.linspace(0, len(val) - 1, settings['val_windows']).astype(np.int64)]
+    _worker['train_starts'] = np.asarray(starts[:split_idx])
+    _worker['val_starts'] = val
+    _worker['settings'] = settings
+
+
+def trial_model(params, num_stations):
+    """Model for a trial's hyperparameters; params['arch'] overrides MODEL_ARCH."""
+    return build_model(
+        params.get('arch'),
+        hidden_dim=params['hidden_dim'],
+        num_layers=params['num_layers'],
+        station_emb_dim=params['station_embed_dim'],
+        num_stations=num_stations,
+        dropout=params['dropout'],
+        oov_rate=Config.STATION_OOV_RATE,
+    )
+
+
+def measure_latency(model, features, starts, window, batch_size, repeats=30):
+    """p50/p99 milliseconds of model(x) for one window and for a batch of batch_size windows."""
+    model.eval()
+    idx = np.asarray(starts[:batch_size])[:, None] + np.arange(window)
+    batch = torch.from_numpy(np.asarray(features[idx.ravel()]).reshape(len(idx), window, -1))
+    timings = {}
+    with torch.no_grad():
+        for name, x, n in (('latency_ms', batch[:1], repeats), ('batch_latency_ms', batch, max(3, repeats // 10))):
+            model(x)
+            samples = []
+            for _ in range(n):
+                t0 = time.perf_counter()
+                model(x)
+                samples.append(time.perf_counter() - t0)
+            timings[name] = round(float(np.median(samples)) * 1000, 3)
+            timings[name.replace('_ms', '_p99_ms')] = round(float(np.percentile(samples, 99)) * 1000, 3)
+    return timings
+
+
+def _run_trial(task):
+    """Train one trial from its checkpoint up to the task's epoch budget; returns its results."""
+    trial_id, params, rung, start_epoch, end_epoch = task
+    settings = _worker['settings']
+    features, window = _worker['features'], settings['window']
+    checkpoint = os.path.join(settings['trial_dir'], f"trial_{trial_id}.pt")
+    t0 = time.perf_counter()
+
+    torch.manual_seed(settings['seed'] + trial_id)
+    model = trial_model(params, settings['num_stations'])
+    optimizer = optim.Adam(model.parameters(), lr=params['learning_rate'])
+    val_losses = []
+    if start_epoch > 0:
+        state = torch.load(checkpoint, map_location=torch.device('cpu'))
+        model.load_state_dict(state['model'])
+        optimizer.load_state_dict(state['optimizer'])
+        val_losses = state['val_losses']
+
+    criterion = nn.MSELoss()
+    val_loader = DataLoader(WindowDataset(features, _worker['val_starts'], window), batch_size=1024)
+    best_mae = None
+    for epoch in range(start_epoch, end_epoch):
+        rng = np.random.default_rng((settings['seed'], trial_id, epoch))
+        train_starts = _worker['train_starts']
+        if settings['train_windows'] and len(train_starts) > settings['train_windows']:
+            train_starts = np.sort(rng.choice(train_starts, settings['train_windows'], replace=False))
+        train_loader = DataLoader(WindowDataset(features, train_starts, window),
+                                  batch_size=params['batch_size'], shuffle=True)
+        model.train()
+        for seq, target in (train_loader if model.trainable else ()):
+            optimizer.zero_grad()
+            loss = batch_loss(model, criterion, seq, target)
+            loss.backward()
+            optimizer.step()
+
+        model.eval()
+        sq_err = abs_err = count = 0.0
+        with torch.no_grad():
+            for seq, target in val_loader:
+                err = model(seq).squeeze(-1) - target
+                sq_err += float((err ** 2).sum())
+                abs_err += float(err.abs().sum())
+                count += len(target)
+        val_loss = sq_err / count
+        if not math.isfinite(val_loss):
+            val_loss = float('inf')
+        val_losses.append(val_loss)
+        if val_loss <= min(val_losses):
+            best_mae = abs_err / count * settings['ports_range']
+
+    torch.save({'model': model.state_dict(), 'optimizer': optimizer.state_dict(), 'val_losses': val_losses}, checkpoint)
+    result = {
+        'trial': trial_id,
+        'rung': rung,
+        'epochs': end_epoch,
+        'val_loss': min(val_losses),
+        'train_s': round(time.perf_counter() - t0, 2),
+    }
+    if best_mae is not None:
+        result['mae_ports'] = round(best_mae, 4)
+    if start_epoch == 0:
+        result['n_params'] = sum(p.numel() for p in model.parameters())
+    return result
+
+
+def prepare_features():
+    """Fit the scaler and build (or reuse) the cached feature matrix, as global training does."""
+    init_db()
+    fingerprint = get_history_fingerprint()
+    if sum(rows for rows, _, _ in fingerprint.values()) < Config.SEQ_LENGTH + 20:
+        raise SystemExit("Not enough data to tune. Run data_collector.py or scripts/generate_large_dataset.py first.")
+    preprocessor = DataPreprocessor()
+    vocab = StationVocab.load(Config.VOCAB_PATH) if os.path.exists(Config.VOCAB_PATH) else StationVocab()
+    vocab.extend(fingerprint.keys())
+    preprocessor.vocab = vocab
+    features, starts = load_features(preprocessor, include_station_id=True, window=window_length(),
+                                     fingerprint=fingerprint)
+    return features, starts, preprocessor
+
+
+def worker_settings(preprocessor, trial_dir, workers, train_windows, val_windows, seed):
+    os.makedirs(trial_dir, exist_ok=True)
+    return {
+        'window': window_length(),
+        'num_stations': len(preprocessor.vocab),
+        'ports_range': float(preprocessor.scaler.data_range_[0]),
+        'train_windows': train_windows,
+        'val_windows': val_windows,
+        'threads': max(1, (os.cpu_count() or 1) // workers),
+        'seed': seed,
+        'trial_dir': trial_dir,
+    }
+
+
+def shared_features(features, starts):
+    """Worker initargs for the features: the cache file paths, or the arrays themselves when the cache is off."""
+    if isinstance(features, np.memmap):
+        return features.filename, starts.filename
+    return features, starts
+
+
+def run_search(trials=32, workers=None, min_epochs=1, max_epochs=9, eta=3, train_windows=50000, val_windows=20000,
+               budget_minutes=60, seed=42, output_dir='logs/tune'):
+    """Run the search and return the leaderboard DataFrame (best first)."""
+    workers = workers or os.cpu_count() or 1
+    rungs = rung_epochs(min_epochs, max_epochs, eta)
+    features, starts, preprocessor = prepare_features()
+    print(f"Tuning on {len(starts):,} windows with {workers} workers, {trials} trials, rungs at epochs {rungs}")
+
+    trial_dir = os.path.join(output_dir, 'trials')
+    settings = worker_settings(preprocessor, trial_dir, workers, train_windows, val_windows, seed)
+    shared = shared_features(features, starts)
+
+    rng = np.random.default_rng(seed)
+    asha = ASHA(rungs, eta)
+    params, results = {}, {}
+    t0 = time.time()
+    deadline = t0 + budget_minutes * 60 if budget_minutes else None
+
+    def next_task():
+        promotion = asha.next_promotion()
+        if promotion is not None:
+            trial_id, rung = promotion
+            return trial_id, params[trial_id], rung, rungs[rung - 1], rungs[rung]
+        if len(params) < trials and (deadline is None or time.time() < deadline):
+            trial_id = len(params)
+            params[trial_id] = sample_params(rng)
+            return trial_id, params[trial_id], 0, 0, rungs[0]
+        return None
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                                initargs=(*shared, settings)) as pool:
+        running = set()
+        while True:
+            while len(running) < workers:
+                task = next_task()
+                if task is None:
+                    break
+                running.add(pool.submit(_run_trial, task))
+            if not running:
+                break
+            done, running = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                asha.report(result['trial'], result['rung'], result['val_loss'])
+                results.setdefault(result['trial'], {}).update(result)
+                print(f"  trial {result['trial']:>3} rung {result['rung']} ({result['epochs']} epochs): "
+                      f"val loss {result['val_loss']:.5f}  [{result['train_s']}s, {time.time() - t0:.0f}s elapsed]")
+
+    print(f"Search finished in {(time.time() - t0) / 60:.1f} min")
+
+    # Time each trial alone, after training has finished
+    val_starts = starts[int(len(starts) * 0.8):]
+    for trial_id, result in results.items():
+        model = trial_model(params[trial_id], settings['num_stations'])
+        model.load_state_dict(torch.load(os.path.join(trial_dir, f"trial_{trial_id}.pt"))['model'])
+        result.update(measure_latency(model, features, val_starts, Config.SEQ_LENGTH, Config.SCORING_BATCH_SIZE))
+    shutil.rmtree(trial_dir, ignore_errors=True)
+    rows = [{**params[trial_id], **result} for trial_id, result in results.items()]
+    return pd.DataFrame(rows).sort_values(['rung', 'val_loss'], ascending=[False, True]).reset_index(drop=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Parallel ASHA hyperparameter search for the global model')
+    parser.add_argument('--trials', type=int, default=32, help='Trial configurations to sample')
+    parser.add_argument('--workers', type=int, help='Worker processes (default: all cores)')
+    parser.add_argument('--min-epochs', type=int, default=1, help='Epochs in the first rung')
+    parser.add_argument('--max-epochs', type=int, default=9, help='Epochs for trials that reach the top rung')
+    parser.add_argument('--eta', type=int, default=3, help='Reduction factor: the top 1/eta of a rung is promoted')
+    parser.add_argument('--train-windows', type=int, default=50000, help='Training windows sampled per epoch (0 = all)')
+    parser.add_argument('--val-windows', type=int, default=20000, help='Validation windows shared by all trials (0 = all)')
+    parser.add_argument('--budget-minutes', type=float, default=60, help='Stop starting new trials after this long (0 = no limit)')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output-dir', type=str, default='logs/tune', help='Directory for leaderboard.csv and best.json')
+    args = parser.parse_args()
+
+    leaderboard = run_search(
+        trials=args.trials,
+        workers=args.workers,
+        min_epochs=args.min_epochs,
+        max_epochs=args.max_epochs,
+        eta=args.eta,
+        train_windows=args.train_windows,
+        val_windows=args.val_windows,
+        budget_minutes=args.budget_minutes,
+        seed=args.seed,
+        output_dir=args.output_dir,
+    )
+    leaderboard.to_csv(os.path.join(args.output_dir, 'leaderboard.csv'), index=False)
+    best = leaderboard.iloc[0].to_dict()
+    with open(os.path.join(args.output_dir, 'best.json'), 'w') as f:
+        json.dump(best, f, indent=2, default=float)
+
+    pd.set_option('display.width', 160)
+    columns = ['trial', 'rung', 'epochs', 'val_loss', 'mae_ports', 'latency_ms', 'latency_p99_ms', 'batch_latency_ms', 'n_params'] + list(SEARCH_SPACE)
+    print("\nLeaderboard (top 10):")
+    print(leaderboard[[c for c in columns if c in leaderboard]].head(10).round(5).to_string(index=False))
+    print(f"\nLeaderboard written to {os.path.join(args.output_dir, 'leaderboard.csv')}. Train the best trial with:")
+    print("  " + " ".join(f"{CONFIG_NAMES[name]}={best[name]:.6g}" if isinstance(best[name], float) else
+                          f"{CONFIG_NAMES[name]}={int(best[name])}" for name in SEARCH_SPACE)
+          + ' PYTHONPATH="." python src/train.py --mode global')
@@ -0,0 +1,63 @@
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+
+class StationVocab:
+    """
+    Dense index for station ids, used to size and address the station embedding.
+
+    Raw Open Charge Map ids run into the hundreds of thousands, so the embedding is
+    indexed by position in this vocabulary instead of by raw id. Row 0 is a shared
+    out-of-vocabulary bucket for stations the model has not seen; known stations
+    keep their index when new ones are appended, so the embedding table can grow
+    in place (see EVChargingLSTM.grow_station_embedding).
+    """
+
+    OOV_INDEX = 0
+
+    def __init__(self, station_ids=()):
+        self.index = {}
+        self.extend(station_ids)
+
+    def __len__(self):
+        # Number of embedding rows, including the OOV bucket
+        return len(self.index) + 1
+
+    def __contains__(self, station_id):
+        return int(station_id) in self.index
+
+    def extend(self, station_ids):
+        """Append unseen ids (in sorted order) and return how many were added."""
+        added = 0
+        for sid in sorted({int(s) for s in station_ids}):
+            if sid not in self.index:
+                self.index[sid] = len(self.index) + 1
+                added += 1
+        return added
+
+    def lookup(self, station_id):
+        return self.index.get(int(station_id), self.OOV_INDEX)
+
+    def map(self, station_ids):
+        """Vectorized lookup for a Series/array of raw ids; unknown ids map to the OOV bucket."""
+        mapped = pd.Series(np.asarray(station_ids)).map(self.index)
+        return mapped.fillna(self.OOV_INDEX).astype('int64').to_numpy()
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        ids = sorted(self.index, key=self.index.get)
+        with open(path, 'w') as f:
+            json.dump({'oov_index': self.OOV_INDEX, 'station_ids': ids}, f)
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            data = json.load(f)
+        vocab = cls()
+        # Preserve the stored order rather than re-sorting, so indices stay stable
+        for sid in data['station_ids']:
+            vocab.index[int(sid)] = len(vocab.index) + 1
+        return vocab
@@ -95,18 +95,20 @@ def check_model():
     """Test if model can be loaded"""
     try:
         import torch
-        from src.model import EVChargingLSTM
+        from src.model import build_model
         from src.config import Config
         
-        model = EVChargingLSTM(
+        state = torch.load(Config.MODEL_PATH, map_location='cpu')
+        model = build_model(
             hidden_dim=Config.HIDDEN_DIM,
-            num_layers=Config.NUM_LAYERS
+            num_layers=Config.NUM_LAYERS,
+            station_emb_dim=Config.STATION_EMBED_DIM,
+            num_stations=state['station_embedding.weight'].shape[0] if 'station_embedding.weight' in state else None
         )
-        state = torch.load(Config.MODEL_PATH, map_location='cpu')
         model.load_state_dict(state)
         model.eval()
         
-        print_status("Model Loading", True, "LSTM model loaded successfully")
+        print_status("Model Loading", True, f"{Config.MODEL_ARCH} model loaded successfully")
         return True
     except Exception as e:
         print_status("Model Loading", False, str(e))